@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import asyncio
+import hmac
+import os
+
+from app.models.schemas import RuntimeSettings, RuntimeSettingsUpdate
+from app.services.monitoring import sample_stacks
+from app.services.settings import current_settings, reset_settings, update_settings
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+async def require_admin(
+    authorization: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Accept `Authorization: Bearer <ADMIN_TOKEN>` or `X-Admin-Token: <ADMIN_TOKEN>`"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled: set ADMIN_TOKEN")
+    token = x_admin_token or ""
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[len("bearer "):]
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_process(
+    seconds: float = Query(10.0, gt=0, le=120, description="How long to sample"),
+    interval_ms: float = Query(10.0, ge=1, le=1000, description="Time between stack samples")
+):
+    """
+    Sample all thread stacks of this worker for `seconds`
+
+    Returns collapsed stacks (`frame;frame;frame count` per line), ready for
+    flamegraph.pl or speedscope. Requests keep being served while sampling.
+    """
+    try:
+        return await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/settings", response_model=RuntimeSettings)
+async def get_settings():
+    """Runtime settings in effect on this worker"""
+    return current_settings().settings
+
+@router.patch("/settings", response_model=RuntimeSettings)
+async def patch_settings(update: RuntimeSettingsUpdate):
+    """
+    Change runtime settings without a restart
+
+    Omitted fields keep their value. The result is validated as a whole and
+    applied atomically: requests already running finish with the old settings,
+    new ones use the new settings. Other workers follow through the shared
+    state backend.
+    """
+    try:
+        return await update_settings(update)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/settings", response_model=RuntimeSettings)
+async def delete_settings():
+    """Discard runtime changes and go back to the environment and models config values"""
+    return await reset_settings()
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
 import asyncio
+import hashlib
+import json
+import logging
+import orjson
 
 from app.models.schemas import (
     PageContentRequest, 
@@ -8,20 +13,139 @@ from app.models.schemas import (
     MCQQuestion,
     ProcessingMode,
     AnswerRequest,
-    AnswerResponse
+    AnswerResponse,
+    ExplainRequest,
+    ExplainResponse
 )
 from app.services.ai_service import AIService
+from app.services.anchors import match_anchors
+from app.services.difficulty import reasoning_stats
+from app.services.monitoring import runtime_prometheus, runtime_snapshot, start_request_profile
+from app.services.settings import current_settings, request_limiter
+from app.services.shared_state import single_flight, get_state_backend
+from app.services.telemetry import set_span_attributes, span, traced
+from app.services.usage import (
+    CLIENT_TOKEN_BUDGET,
+    start_usage_tracking,
+    client_tokens_used,
+    charge_client,
+    usage_metrics
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+T = TypeVar("T")
+
 async def get_ai_service():
     """Dependency to get AI service instance"""
     return AIService()
 
+def _cache_key(kind: str, *parts: Any) -> str:
+    """Stable shared-cache key for a request payload"""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"{kind}:{digest}"
+
+def _is_cacheable(result) -> bool:
+    """Only cache results where every question got a valid answer"""
+    if isinstance(result, MCQDetectionResponse):
+        return all(q.correct_option >= 0 for q in result.questions)
+    if isinstance(result, ExplainResponse):
+        return bool(result.reasoning) and not result.reasoning.startswith("Error occurred")
+    return getattr(result, "correct_option", -1) >= 0
+
+def _client_id(http_request: Request) -> str:
+    """Identify the caller for token budgets: X-Client-Id header, else client address"""
+    return http_request.headers.get("x-client-id") or (http_request.client.host if http_request.client else "unknown")
+
+async def _check_token_budget(client_id: str):
+    if CLIENT_TOKEN_BUDGET > 0 and await client_tokens_used(client_id) >= CLIENT_TOKEN_BUDGET:
+        raise HTTPException(status_code=429, detail=f"Token budget of {CLIENT_TOKEN_BUDGET} exhausted for client {client_id}")
+
+def _serialize(result) -> bytes:
+    with span("result_cache.serialize"):
+        return result.model_dump_json().encode("utf-8")
+
+async def _cached_json(kind: str, key_parts: tuple, producer) -> Tuple[Dict[str, Any], bool]:
+    """Serve a response from the shared cache as a JSON-ready dict, computing it at most once across workers
+
+    Responses are stored as the serialized bytes of their model and decoded
+    with orjson on the way out. Only this service writes the cache, so hits
+    are not validated again; endpoints patch per-request fields into the dict
+    and return it through ORJSONResponse, skipping FastAPI's response_model
+    re-validation and encoding.
+    """
+    settings = current_settings().settings
+    ttl = settings.result_cache_ttl
+    if ttl <= 0:
+        payload, from_cache = _serialize(await producer()), False
+    else:
+        produced = {}
+
+        async def produce() -> bytes:
+            produced["result"] = await producer()
+            return _serialize(produced["result"])
+
+        with span("result_cache", kind=kind):
+            payload, from_cache = await single_flight(
+                _cache_key(kind, *key_parts),
+                produce,
+                ttl=ttl,
+                # Outlast the slowest solve: the answer stage alone may take the whole request timeout
+                lock_ttl=2 * settings.request_timeout + 30,
+                cache_if=lambda _: _is_cacheable(produced["result"])
+            )
+        from_cache = from_cache and "result" not in produced
+    with span("result_cache.decode", bytes=len(payload)):
+        return orjson.loads(payload), from_cache
+
+def _attach_anchors(questions: List[Dict[str, Any]], anchors: Optional[list]) -> None:
+    """Point each question and option at the page block holding it (anchors are per page load, so never cached)"""
+    if not anchors:
+        return
+    with span("anchors.match", anchors=len(anchors)):
+        matches = match_anchors(questions, anchors)
+    for question, match in zip(questions, matches):
+        question["anchor"] = match["anchor"]
+        question["option_anchors"] = match["option_anchors"]
+
+async def _until_disconnected(http_request: Request) -> None:
+    # The body has been read, so the next message is the disconnect. Waiting
+    # for it directly works behind @app.middleware("http"), which hides it
+    # from Request.is_disconnected()
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+async def _cancel_on_disconnect(http_request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it when the client closes the connection first
+
+    The extension aborts requests it no longer needs (superseded, timed out);
+    without this the solve would run to completion for nobody. Raises
+    HTTPException 499 once cancelled. A shared result another request is
+    waiting for is not lost: that request takes over the single-flight lock.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(_until_disconnected(http_request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            # Let it unwind (and release the single-flight lock) before answering
+            await asyncio.gather(task, return_exceptions=True)
+    if not task.cancelled():
+        return task.result()
+    set_span_attributes(client_disconnected=True)
+    raise HTTPException(status_code=499, detail="Client closed request")
+
 @router.post("/detect-mcqs", response_model=MCQDetectionResponse)
 async def detect_mcqs(
     request: PageContentRequest,
-    ai_service: AIService = Depends(get_ai_service)
+    http_request: Request,
+    ai_service: AIService = Depends(get_ai_service),
+    profile: bool = Query(False, description="Attach a stage timing breakdown to the response")
 ):
     """
     Detect and solve MCQs from webpage content
@@ -30,173 +154,243 @@ async def detect_mcqs(
     1. Extracts MCQs from the webpage content
     2. Processes each question through AI model(s)
     3. Returns answers with reasoning and consensus info
+    
+    Identical pages are solved once and served from the shared result cache.
     """
+    request_profile = start_request_profile() if profile else None
     try:
-        processing_mode = ProcessingMode.MULTI if request.useMultiModel else ProcessingMode.SINGLE
-        
-        # Extract MCQs from content
-        print(f"Extracting MCQs from content (length: {len(request.content)})")
-        
-        extracted_mcqs = await ai_service.extract_mcqs_from_content(
-            request.content, 
-            request.layout
+        models = ai_service.resolve_models(request.models, request.useMultiModel)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    client_id = _client_id(http_request)
+    await _check_token_budget(client_id)
+    usage = start_usage_tracking(url=request.url, client_id=client_id)
+    ai_service.thinking_budget, ai_service.search = request.thinkingBudget, request.search
+    
+    try:
+        body, from_cache = await _cancel_on_disconnect(http_request, _cached_json(
+            "page",
+            (request.url, request.content, models, request.fastMode, request.fused, request.thinkingBudget, request.search),
+            lambda: _solve_page(request, ai_service, models)
+        ))
+        body["cached"] = from_cache
+        _attach_anchors(body["questions"], request.layout.get("anchors"))
+        body["usage"] = usage.summary()
+        await charge_client(client_id, usage.totals["total_tokens"])
+        if request_profile:
+            body["profile"] = request_profile.summary()
+        return ORJSONResponse(body)
+
+    except HTTPException as e:
+        if e.status_code == 499:
+            # Bill the provider calls made before the client left
+            logger.info("Client disconnected, page solve cancelled", extra={"client_id": client_id, "url": request.url})
+            await charge_client(client_id, usage.totals["total_tokens"])
+        raise
+    except Exception as e:
+        logger.exception("Error in detect_mcqs", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail=f"Error processing MCQs: {str(e)}")
+
+@traced("solve_page")
+async def _solve_page(request: PageContentRequest, ai_service: AIService, models: List[str]) -> MCQDetectionResponse:
+    """Extract and answer every MCQ on a page with the given model(s)"""
+    use_multi_model = len(models) > 1
+    processing_mode = ProcessingMode.MULTI if use_multi_model else ProcessingMode.SINGLE
+    
+    # Small single-model pages: extract and answer in one round trip
+    use_fused = request.fused if request.fused is not None else ai_service.fits_fused_budget(request.content, models[0])
+    if use_fused and not use_multi_model:
+        logger.info("Using fused extract-and-answer", extra={"content_length": len(request.content)})
+        set_span_attributes(pipeline="fused")
+        fused_results = await ai_service.extract_and_answer_fused(
+            request.content,
+            request.layout,
+            models[0],
+            fast=request.fastMode
         )
-        print(f"Extracted {len(extracted_mcqs)} MCQs from content")
-        
-        if not extracted_mcqs:
-            return MCQDetectionResponse(
-                questions=[],
+        if fused_results is not None:
+            processed_questions = [
+                MCQQuestion(
+                    question=result["question"],
+                    options=result["options"],
+                    correct_option=result["correct_option"],
+                    confidence=result["confidence"],
+                    reasoning=result["reasoning"]
+                )
+                for result in fused_results
+            ]
+            return MCQDetectionResponse.model_construct(
+                questions=processed_questions,
                 processing_mode=processing_mode,
-                consensus=[],
-                total_questions=0,
-                cached=False
+                consensus=[True] * len(processed_questions),
+                total_questions=len(processed_questions)
             )
+    
+    # Extract MCQs from content
+    logger.info("Extracting MCQs from content", extra={"content_length": len(request.content)})
+    set_span_attributes(pipeline="two-stage")
+    
+    extracted_mcqs = await ai_service.extract_mcqs_from_content(
+        request.content, 
+        request.layout
+    )
+    logger.info("Extracted MCQs from content", extra={"mcqs": len(extracted_mcqs)})
+    
+    if not extracted_mcqs:
+        return MCQDetectionResponse.model_construct(
+            questions=[],
+            processing_mode=processing_mode,
+            consensus=[],
+            total_questions=0
+        )
+    
+    # Check if we should use batch processing (more efficient for multiple questions)
+    if len(extracted_mcqs) > 1:
+        logger.info("Using batch processing", extra={"questions": len(extracted_mcqs)})
+        
+        # Prepare batch data
+        questions_batch = []
+        for mcq in extracted_mcqs:
+            question_text = mcq.get("question", "")
+            options = mcq.get("options", [])
+            
+            if question_text and options:
+                questions_batch.append({
+                    "question": question_text,
+                    "options": options,
+                    "passage": mcq.get("passage")
+                })
         
-        # Check if we should use batch processing (more efficient for multiple questions)
-        if len(extracted_mcqs) > 1:
-            print(f"Using batch processing for {len(extracted_mcqs)} questions...")
+        # Process batch
+        if questions_batch:
+            batch_results = await ai_service.answer_multiple_mcqs_batch(
+                questions_batch, 
+                use_multi_model=use_multi_model,
+                models=models,
+                fast=request.fastMode
+            )
+            
+            # Convert batch results to MCQQuestion objects
+            processed_questions = []
+            consensus_results = []
             
-            # Prepare batch data
-            questions_batch = []
-            for mcq in extracted_mcqs:
+            for i, (mcq, result) in enumerate(zip(extracted_mcqs, batch_results)):
                 question_text = mcq.get("question", "")
                 options = mcq.get("options", [])
                 
-                if question_text and options:
-                    questions_batch.append({
-                        "question": question_text,
-                        "options": options
-                    })
-            
-            # Process batch
-            if questions_batch:
-                batch_results = await ai_service.answer_multiple_mcqs_batch(
-                    questions_batch, 
-                    use_multi_model=request.useMultiModel
-                )
+                if not question_text or not options:
+                    continue
+                
+                if use_multi_model:
+                    mcq_question = MCQQuestion(
+                        question=question_text,
+                        options=options,
+                        correct_option=result.get("correct_option", -1),
+                        confidence=result.get("confidence", 0),
+                        reasoning=result.get("reasoning", ""),
+                        model_responses=result.get("model_responses", []),
+                        passage_id=mcq.get("passage_id")
+                    )
+                    consensus_results.append(result.get("consensus", False))
+                else:
+                    mcq_question = MCQQuestion(
+                        question=question_text,
+                        options=options,
+                        correct_option=result.get("correct_option", -1),
+                        confidence=result.get("confidence", 0),
+                        reasoning=result.get("reasoning", ""),
+                        passage_id=mcq.get("passage_id")
+                    )
+                    consensus_results.append(True)
                 
-                # Convert batch results to MCQQuestion objects
-                processed_questions = []
-                consensus_results = []
+                processed_questions.append(mcq_question)
+    
+    else:
+        # Single question - use individual processing
+        async def process_single_mcq(mcq):
+            """Process a single MCQ and return the result"""
+            try:
+                question_text = mcq.get("question", "")
+                options = mcq.get("options", [])
                 
-                for i, (mcq, result) in enumerate(zip(extracted_mcqs, batch_results)):
-                    question_text = mcq.get("question", "")
-                    options = mcq.get("options", [])
-                    
-                    if not question_text or not options:
-                        continue
-                    
-                    if request.useMultiModel:
-                        mcq_question = MCQQuestion(
-                            question=question_text,
-                            options=options,
-                            correct_option=result.get("correct_option", -1),
-                            confidence=result.get("confidence", 0),
-                            reasoning=result.get("reasoning", ""),
-                            model_responses=result.get("model_responses", [])
-                        )
-                        consensus_results.append(result.get("consensus", False))
-                    else:
-                        mcq_question = MCQQuestion(
-                            question=question_text,
-                            options=options,
-                            correct_option=result.get("correct_option", -1),
-                            confidence=result.get("confidence", 0),
-                            reasoning=result.get("reasoning", "")
-                        )
-                        consensus_results.append(True)
+                if not question_text or not options:
+                    return None
+                
+                logger.info("Processing question with AI", extra={"question_chars": len(question_text)})
+                
+                if use_multi_model:
+                    answer_result = await ai_service.answer_mcq_multi_model(question_text, options, models, fast=request.fastMode, passage=mcq.get("passage"))
                     
-                    processed_questions.append(mcq_question)
-        
-        else:
-            # Single question - use individual processing
-            async def process_single_mcq(mcq):
-                """Process a single MCQ and return the result"""
-                try:
-                    question_text = mcq.get("question", "")
-                    options = mcq.get("options", [])
+                    mcq_question = MCQQuestion(
+                        question=question_text,
+                        options=options,
+                        correct_option=answer_result.get("correct_option", -1),
+                        confidence=answer_result.get("confidence", 0),
+                        reasoning=answer_result.get("reasoning", ""),
+                        model_responses=answer_result.get("model_responses", []),
+                        passage_id=mcq.get("passage_id")
+                    )
                     
-                    if not question_text or not options:
-                        return None
+                    consensus = answer_result.get("consensus", False)
                     
-                    print(f"Processing question with AI: {question_text[:50]}...")
+                else:
+                    answer_result = await ai_service.answer_mcq_single_model(question_text, options, models[0], fast=request.fastMode, passage=mcq.get("passage"))
                     
-                    if request.useMultiModel:
-                        answer_result = await ai_service.answer_mcq_multi_model(question_text, options)
-                        
-                        mcq_question = MCQQuestion(
-                            question=question_text,
-                            options=options,
-                            correct_option=answer_result.get("correct_option", -1),
-                            confidence=answer_result.get("confidence", 0),
-                            reasoning=answer_result.get("reasoning", ""),
-                            model_responses=answer_result.get("model_responses", [])
-                        )
-                        
-                        consensus = answer_result.get("consensus", False)
-                        
-                    else:
-                        answer_result = await ai_service.answer_mcq_single_model(question_text, options)
-                        
-                        mcq_question = MCQQuestion(
-                            question=question_text,
-                            options=options,
-                            correct_option=answer_result.get("correct_option", -1),
-                            confidence=answer_result.get("confidence", 0),
-                            reasoning=answer_result.get("reasoning", "")
-                        )
-                        
-                        consensus = True  # Single model always has "consensus"
+                    mcq_question = MCQQuestion(
+                        question=question_text,
+                        options=options,
+                        correct_option=answer_result.get("correct_option", -1),
+                        confidence=answer_result.get("confidence", 0),
+                        reasoning=answer_result.get("reasoning", ""),
+                        passage_id=mcq.get("passage_id")
+                    )
                     
-                    return (mcq_question, consensus)
+                    consensus = True  # Single model always has "consensus"
                 
-                except Exception as e:
-                    print(f"Error in process_single_mcq: {e}")
-                    return None
+                return (mcq_question, consensus)
             
-            # Process all MCQs concurrently
-            print(f"Processing {len(extracted_mcqs)} MCQs in parallel...")
-            mcq_tasks = [process_single_mcq(mcq) for mcq in extracted_mcqs]
-            mcq_results = await asyncio.gather(*mcq_tasks, return_exceptions=True)
-            
-            # Filter out None results and exceptions
-            processed_questions = []
-            consensus_results = []
-            
-            for result in mcq_results:
-                if isinstance(result, Exception):
-                    print(f"Error processing MCQ: {result}")
-                    continue
-                
-                if result is None:
-                    continue
-                
-                if isinstance(result, tuple) and len(result) == 2:
-                    mcq_question, consensus = result
-                    processed_questions.append(mcq_question)
-                    consensus_results.append(consensus)
-                else:
-                    print(f"Unexpected result format: {type(result)} - {result}")
-                    continue
+            except Exception as e:
+                logger.exception("Error in process_single_mcq", extra={"error": str(e)})
+                return None
         
-        # Prepare final response
-        response_data = {
-            "questions": processed_questions,
-            "processing_mode": processing_mode,
-            "consensus": consensus_results,
-            "total_questions": len(processed_questions),
-            "cached": False
-        }
+        # Process all MCQs concurrently
+        logger.info("Processing MCQs in parallel", extra={"questions": len(extracted_mcqs)})
+        mcq_tasks = [process_single_mcq(mcq) for mcq in extracted_mcqs]
+        mcq_results = await asyncio.gather(*mcq_tasks, return_exceptions=True)
         
-        return MCQDetectionResponse(**response_data)
+        # Filter out None results and exceptions
+        processed_questions = []
+        consensus_results = []
         
-    except Exception as e:
-        print(f"Error in detect_mcqs: {e}")
-        raise HTTPException(status_code=500, detail=f"Error processing MCQs: {str(e)}")
+        for result in mcq_results:
+            if isinstance(result, Exception):
+                logger.error("Error processing MCQ", extra={"error": str(result)})
+                continue
+            
+            if result is None:
+                continue
+            
+            if isinstance(result, tuple) and len(result) == 2:
+                mcq_question, consensus = result
+                processed_questions.append(mcq_question)
+                consensus_results.append(consensus)
+            else:
+                logger.warning("Unexpected result format", extra={"result_type": type(result).__name__})
+                continue
+    
+    # Questions were validated as they were built; assemble the envelope without a second pass
+    return MCQDetectionResponse.model_construct(
+        questions=processed_questions,
+        processing_mode=processing_mode,
+        consensus=consensus_results,
+        total_questions=len(processed_questions)
+    )
 
 @router.post("/answer-question", response_model=AnswerResponse)
 async def answer_single_question(
     request: AnswerRequest,
+    http_request: Request,
     ai_service: AIService = Depends(get_ai_service)
 ):
     """
@@ -205,24 +399,91 @@ async def answer_single_question(
     This endpoint processes a single question through AI model(s)
     """
     try:
+        models = ai_service.resolve_models(request.models, request.useMultiModel)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    client_id = _client_id(http_request)
+    await _check_token_budget(client_id)
+    usage = start_usage_tracking(client_id=client_id)
+    ai_service.thinking_budget, ai_service.search = request.thinkingBudget, request.search
+
+    async def answer() -> AnswerResponse:
         # Process with AI
-        if request.useMultiModel:
+        if len(models) > 1:
             result = await ai_service.answer_mcq_multi_model(
                 request.question, 
-                request.options
+                request.options,
+                models,
+                fast=request.fastMode
             )
         else:
             result = await ai_service.answer_mcq_single_model(
                 request.question, 
-                request.options
+                request.options,
+                models[0],
+                fast=request.fastMode
             )
         
         return AnswerResponse(**result)
+
+    try:
+        body, _ = await _cached_json(
+            "answer",
+            (request.question, request.options, models, request.fastMode, request.thinkingBudget, request.search),
+            answer
+        )
+        body["usage"] = usage.summary()
+        await charge_client(client_id, usage.totals["total_tokens"])
+        return ORJSONResponse(body)
         
     except Exception as e:
-        print(f"Error answering question: {e}")
+        logger.exception("Error answering question", extra={"error": str(e)})
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
 
+@router.post("/explain", response_model=ExplainResponse)
+async def explain_answer(
+    request: ExplainRequest,
+    http_request: Request,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Generate reasoning for one question on demand
+    
+    Used when results were produced in fast mode and the user expands a
+    question. Explanations are cached like answers.
+    """
+    model_key = request.model or ai_service.default_single_model
+    if model_key not in ai_service.models:
+        raise HTTPException(status_code=400, detail=f"Unknown or disabled models: {model_key}")
+
+    client_id = _client_id(http_request)
+    await _check_token_budget(client_id)
+    usage = start_usage_tracking(client_id=client_id)
+
+    async def explain() -> ExplainResponse:
+        result = await ai_service.explain_answer(
+            request.question,
+            request.options,
+            request.correct_option,
+            model_key
+        )
+        return ExplainResponse(**result)
+
+    try:
+        body, from_cache = await _cached_json(
+            "explain",
+            (request.question, request.options, request.correct_option, model_key),
+            explain
+        )
+        body["cached"] = from_cache
+        await charge_client(client_id, usage.totals["total_tokens"])
+        return ORJSONResponse(body)
+        
+    except Exception as e:
+        logger.exception("Error explaining question", extra={"error": str(e)})
+        raise HTTPException(status_code=500, detail=f"Error explaining question: {str(e)}")
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -239,13 +500,22 @@ async def get_performance_stats():
     try:
         ai_service = AIService()
         
-        # Basic configuration info
+        # Basic configuration info, from the settings in effect
         stats = {
             "max_concurrent_requests": ai_service.max_concurrent_requests,
             "request_timeout": ai_service.request_timeout,
             "available_models": list(ai_service.models.keys()),
             "multi_model_enabled": len(ai_service.models) > 1,
             "batch_processing_enabled": True,
+            "state_backend": get_state_backend().name,
+            "result_cache_ttl": ai_service.settings.result_cache_ttl,
+            "provider_rate_limits": ai_service.provider_rate_limits,
+            "client_token_budget": CLIENT_TOKEN_BUDGET,
+            "settings": ai_service.settings.model_dump(),
+            "concurrency": request_limiter.snapshot(),
+            "usage": usage_metrics.snapshot(),
+            "reasoning_settings": reasoning_stats.snapshot(),
+            "runtime": runtime_snapshot(),
             "retry_configuration": {
                 model_key: {
                     "max_retries": config.get("max_retries", 3),
@@ -260,6 +530,11 @@ async def get_performance_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting performance stats: {str(e)}")
 
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Token and cost totals per model and per page host plus runtime gauges, in Prometheus text format"""
+    return usage_metrics.prometheus() + runtime_prometheus()
+
 @router.get("/models")
 async def get_available_models():
     """Get list of available AI models"""
@@ -267,8 +542,9 @@ async def get_available_models():
         ai_service = AIService()
         return {
             "models": list(ai_service.models.keys()),
-            "default_single": "gpt-4.1",
-            "multi_model_set": ["gpt-4.1", "gemini-2.5-pro"]
+            "default_single": ai_service.default_single_model,
+            "multi_model_set": ai_service.default_ensemble,
+            "extraction_model": ai_service.extraction_model
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting models: {str(e)}")
\ No newline at end of file
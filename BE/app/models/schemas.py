@@ -8,9 +8,14 @@ class ProcessingMode(str, Enum):
 
 class PageContentRequest(BaseModel):
     content: str = Field(..., description="Text content of the webpage")
-    layout: Dict[str, Any] = Field(..., description="Layout information of the webpage")
+    layout: Dict[str, Any] = Field(..., description="Layout information of the webpage; `anchors` lists the page's text blocks as {id, text} in document order")
     url: str = Field(..., description="URL of the webpage")
     useMultiModel: bool = Field(False, description="Whether to use multi-model processing")
+    models: Optional[List[str]] = Field(None, description="Model keys to use instead of the configured defaults; more than one runs a consensus ensemble")
+    fastMode: bool = Field(False, description="Return only the answer and confidence; fetch reasoning later from /api/explain")
+    fused: Optional[bool] = Field(None, description="Extract and answer in one call (single-model only); unset decides by page size")
+    thinkingBudget: Optional[int] = Field(None, ge=-1, description="Thinking budget in tokens for models with adaptive reasoning (-1 = unbounded); unset picks one per question")
+    search: Optional[bool] = Field(None, description="Force search grounding on or off for models that support it; unset decides per question")
 
 class MCQOption(BaseModel):
     text: str
@@ -25,6 +30,9 @@ class MCQQuestion(BaseModel):
     confidence: float
     reasoning: str
     model_responses: Optional[List[Dict[str, Any]]] = None
+    passage_id: Optional[str] = Field(None, description="Shared reading passage this question belongs to")
+    anchor: Optional[str] = Field(None, description="Id of the page anchor (from layout.anchors) holding the question text")
+    option_anchors: Optional[List[Optional[str]]] = Field(None, description="Page anchor id per option, None where no block matched")
 
 class ModelResponse(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
@@ -34,6 +42,18 @@ class ModelResponse(BaseModel):
     confidence: float
     reasoning: str
 
+class UsageCounts(BaseModel):
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = Field(0, description="Prompt tokens served from a provider cache (included in prompt_tokens)")
+    completion_tokens: int = 0
+    thinking_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float = 0.0
+
+class UsageSummary(UsageCounts):
+    per_model: Dict[str, UsageCounts] = Field(default_factory=dict, description="Usage broken down by model key")
+
 class MCQDetectionResponse(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
     
@@ -42,6 +62,8 @@ class MCQDetectionResponse(BaseModel):
     consensus: List[bool]
     total_questions: int
     cached: bool = False
+    usage: Optional[UsageSummary] = Field(None, description="Tokens and estimated cost spent serving this request")
+    profile: Optional[Dict[str, Any]] = Field(None, description="Stage timing breakdown, when requested with ?profile=1")
 
 class ExtractedMCQ(BaseModel):
     question: str
@@ -56,6 +78,10 @@ class AnswerRequest(BaseModel):
     question: str
     options: List[str]
     useMultiModel: bool = False
+    models: Optional[List[str]] = None
+    fastMode: bool = False
+    thinkingBudget: Optional[int] = Field(None, ge=-1)
+    search: Optional[bool] = None
 
 class AnswerResponse(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
@@ -64,4 +90,55 @@ class AnswerResponse(BaseModel):
     confidence: float
     reasoning: str
     model_responses: Optional[List[ModelResponse]] = None
-    consensus: bool = False
\ No newline at end of file
+    consensus: bool = False
+    usage: Optional[UsageSummary] = None
+
+class ExplainRequest(BaseModel):
+    question: str
+    options: List[str]
+    correct_option: Optional[int] = Field(None, description="Answer to explain; omit to let the model pick")
+    model: Optional[str] = Field(None, description="Model key to explain with; defaults to the single-model default")
+
+class ExplainResponse(BaseModel):
+    correct_option: Optional[int] = None
+    reasoning: str
+    model: str
+    cached: bool = False
+
+
+class ModelSettings(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = True
+    temperature: Optional[float] = Field(None, ge=0, le=2, description="Sampling temperature; unset uses the task temperature, then the provider default")
+    max_retries: int = Field(3, ge=0, le=10)
+    retry_delay: float = Field(1.0, ge=0, le=60, description="Base delay in seconds, doubled per retry")
+
+class RuntimeSettings(BaseModel):
+    max_concurrent_requests: int = Field(..., ge=1, le=1000, description="Provider calls in flight at once per worker")
+    request_timeout: float = Field(..., gt=0, le=3600, description="Seconds before an ensemble answer gives up")
+    result_cache_ttl: float = Field(..., ge=0, description="Seconds a solved page/question stays cached (0 disables caching)")
+    memory_cache_max_entries: int = Field(..., ge=0, description="Cached results kept by the memory state backend (0 = unlimited)")
+    provider_rate_limits: Dict[str, float] = Field(..., description="Requests per minute per provider across workers (0 = unlimited)")
+    task_temperatures: Dict[str, Optional[float]] = Field(..., description="Temperature per task (extract, answer, explain) for models without their own; null uses the provider default")
+    default_single: str
+    default_ensemble: List[str]
+    extraction_model: str
+    models: Dict[str, ModelSettings]
+    version: int = Field(0, description="Increases with every change")
+    updated_at: Optional[float] = None
+
+class RuntimeSettingsUpdate(BaseModel):
+    """Partial settings change; omitted fields keep their current value"""
+    model_config = ConfigDict(extra="forbid")
+
+    max_concurrent_requests: Optional[int] = None
+    request_timeout: Optional[float] = None
+    result_cache_ttl: Optional[float] = None
+    memory_cache_max_entries: Optional[int] = None
+    provider_rate_limits: Optional[Dict[str, float]] = None
+    task_temperatures: Optional[Dict[str, Optional[float]]] = None
+    default_single: Optional[str] = None
+    default_ensemble: Optional[List[str]] = None
+    extraction_model: Optional[str] = None
+    models: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Per-model changes, e.g. {\"gpt-4.1\": {\"max_retries\": 1}}")
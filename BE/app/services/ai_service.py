@@ -1,56 +1,103 @@
-import openai
-from google import genai
-from google.genai import types
 import asyncio
+import hashlib
 import json
+import logging
 import os
 from typing import List, Dict, Optional, Any
-from dotenv import load_dotenv
 import time
 
-load_dotenv()
-_gemini_client: Optional[genai.Client] = None
+from app.services.answer_key import ANSWER_KEY_RECORD, get_answer_key
+from app.services.difficulty import plan_reasoning, reasoning_stats
+from app.services.providers import get_provider
+from app.services.settings import current_settings, request_limiter
+from app.services.telemetry import current_span, sample_payload, set_span_attributes, span, traced
+from app.services.usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Output-token cap for answer-only (fast mode) replies, which are a tiny JSON object
+FAST_MODE_MAX_TOKENS = int(os.getenv("FAST_MODE_MAX_TOKENS", "40"))
+
+FAST_ANSWER_SYSTEM_PROMPT = """You are an expert at answering multiple choice questions. Pick the correct option.
+
+Return ONLY this JSON, with no reasoning or other text:
+{"correct_option": 0, "confidence": 85}
+
+correct_option is the 0-based option index; confidence is 0-100."""
+
+# Pages whose content fits this many tokens are extracted and answered in one call
+FUSED_TOKEN_BUDGET = int(os.getenv("FUSED_TOKEN_BUDGET", "3000"))
+
+FUSED_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "question": {"type": "string"},
+                    "options": {"type": "array", "items": {"type": "string"}},
+                    "correct_option": {"type": "integer"},
+                    "confidence": {"type": "number"},
+                    "reasoning": {"type": "string"}
+                },
+                "required": ["question", "options", "correct_option", "confidence", "reasoning"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["questions"],
+    "additionalProperties": False
+}
+
+# Reading-comprehension groups: answer one question first so the provider caches the
+# passage prefix before the rest of the group runs concurrently against it. Only
+# worthwhile for passages long enough to be cached (OpenAI needs a 1024-token prefix).
+PASSAGE_CACHE_WARMUP = os.getenv("PASSAGE_CACHE_WARMUP", "true").lower() == "true"
+PASSAGE_CACHE_MIN_TOKENS = int(os.getenv("PASSAGE_CACHE_MIN_TOKENS", "1024"))
 
 class AIService:
     def __init__(self):
-        # OpenAI configuration
-        self.openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not self.openai_api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
-        
-        openai.api_key = self.openai_api_key
-        self.openai_client = openai.OpenAI(api_key=self.openai_api_key)
-        
-        # Google Gemini configuration
-        self.google_api_key = os.getenv("GOOGLE_API_KEY")
+        # Runtime settings are read once, so a change made through the admin API
+        # mid-request applies from the next request on
+        snapshot = current_settings()
+        self.settings = snapshot.settings
         
         # Concurrency settings
-        self.max_concurrent_requests = int(os.getenv("MAX_CONCURRENT_REQUESTS", "20"))
-        self.request_timeout = int(os.getenv("REQUEST_TIMEOUT", "300"))
-        
-        # Semaphore to limit concurrent API requests
-        self._request_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
-        
-        # Available models from different providers
-        self.models = {
-            "gpt-4.1": {
-                "model_name": "GPT-4.1",
-                "provider": "openai",
-                "model_id": "gpt-4.1",
-                "temperature": 0.3,
-                "max_retries": 3,
-                "retry_delay": 1.0
-            },
-            "gemini-2.5-pro": {
-                "model_name": "Gemini 2.5 Pro",
-                "provider": "google",
-                "model_id": "gemini-2.5-pro",
-                "temperature": 0.3,
-                "max_retries": 3,
-                "retry_delay": 1.0
-            }
-        }
-
+        self.max_concurrent_requests = self.settings.max_concurrent_requests
+        self.request_timeout = self.settings.request_timeout
+        
+        # Limits concurrent API requests across all requests of this worker
+        self._request_semaphore = request_limiter
+        
+        # Enabled models (models config plus runtime changes) and the defaults
+        self.models = snapshot.models
+        self.default_single_model = self.settings.default_single
+        self.default_ensemble = self.settings.default_ensemble
+        self.extraction_model = self.settings.extraction_model
+        
+        # Per-request overrides of adaptive reasoning (None lets each question decide)
+        self.thinking_budget: Optional[int] = None
+        self.search: Optional[bool] = None
+        # System prompt for full answers in place of the built-in ones (prompt evaluation)
+        self.answer_prompt: Optional[str] = None
+
+    def resolve_models(self, requested: Optional[List[str]], use_multi_model: bool) -> List[str]:
+        """Pick the models for a request: an explicit list, else the configured defaults"""
+        if requested:
+            unknown = [model_key for model_key in requested if model_key not in self.models]
+            if unknown:
+                raise ValueError(f"Unknown or disabled models: {', '.join(unknown)}")
+            return list(dict.fromkeys(requested))
+        return list(self.default_ensemble) if use_multi_model else [self.default_single_model]
+
+    @property
+    def provider_rate_limits(self) -> Dict[str, float]:
+        providers = {config["provider"] for config in self.models.values()}
+        return {name: get_provider(name).requests_per_minute for name in sorted(providers)}
+
+    @traced("extract_mcqs")
     async def extract_mcqs_from_content(self, content: str, layout_info: Dict) -> List[Dict]:
         """Extract MCQ questions from webpage content using AI"""
         
@@ -66,14 +113,25 @@ class AIService:
             - Options may be formatted as: A) option, (A) option, A. option, or similar
             - Questions may be numbered or unnumbered
             - Include all context necessary to understand the question
-            - If no MCQs are found, return an empty list
+            - When several questions refer to the same reading passage, text or case study,
+              put it once in "passages" and reference it by id instead of copying it into each question
+            - If no MCQs are found, return empty lists
 
-            Return a JSON array where each object has:
+            Return a JSON object:
             {
-                "question": "The complete question text",
-                "options": ["Option A text", "Option B text", "Option C text", "Option D text"],
-                "question_index": 0
-            }"""
+                "passages": [
+                    {"id": "p1", "text": "The full shared passage text"}
+                ],
+                "questions": [
+                    {
+                        "question": "The complete question text",
+                        "options": ["Option A text", "Option B text", "Option C text", "Option D text"],
+                        "passage_id": "p1",
+                        "question_index": 0
+                    }
+                ]
+            }
+            Use "passage_id": null for questions that do not depend on a shared passage."""
 
         user_prompt = f"""Analyze this webpage content and extract all MCQ questions:
 
@@ -87,76 +145,192 @@ class AIService:
             Extract all multiple choice questions with their options."""
 
         try:
-            response = await self._make_openai_request(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2
+            content_text = await self._generate(
+                self.extraction_model,
+                system_prompt,
+                user_prompt,
+                task="extract",
+                context={"content": content, "layout": layout_info}
             )
             
-            if response and response.choices:
-                content_text = response.choices[0].message.content
-                
-                if content_text:
-                    # Try to parse JSON from the response
-                    try:
-                        # Look for JSON in the response
-                        start_idx = content_text.find('[')
-                        end_idx = content_text.rfind(']') + 1
+            if content_text:
+                # Try to parse JSON from the response
+                try:
+                    # Look for JSON in the response
+                    mcqs = self._parse_extraction(content_text)
+                    
+                    if mcqs is not None:
+                        # Validate the structure
+                        validated_mcqs = []
+                        for i, mcq in enumerate(mcqs):
+                            if isinstance(mcq, dict) and 'question' in mcq and 'options' in mcq:
+                                mcq['question_index'] = i
+                                validated_mcqs.append(mcq)
                         
-                        if start_idx != -1 and end_idx != 0:
-                            json_str = content_text[start_idx:end_idx]
-                            mcqs = json.loads(json_str)
-                            
-                            # Validate the structure
-                            validated_mcqs = []
-                            for i, mcq in enumerate(mcqs):
-                                if isinstance(mcq, dict) and 'question' in mcq and 'options' in mcq:
-                                    mcq['question_index'] = i
-                                    validated_mcqs.append(mcq)
-                            
-                            return validated_mcqs
-                        else:
-                            print("No JSON structure found in AI response")
-                            return []
-                            
-                    except json.JSONDecodeError as e:
-                        print(f"Failed to parse JSON from AI response: {e}")
-                        print(f"Response content: {content_text}")
+                        set_span_attributes(model=self.extraction_model, content_length=len(content), mcqs=len(validated_mcqs))
+                        return validated_mcqs
+                    else:
+                        logger.warning("No JSON structure found in extraction response")
                         return []
-                else:
-                    print("Empty response from AI")
+                        
+                except json.JSONDecodeError as e:
+                    logger.warning("Failed to parse JSON from extraction response", extra={"error": str(e), "payload": sample_payload(content_text)})
                     return []
             else:
-                print("No valid response from AI")
+                logger.warning("Empty extraction response")
                 return []
                 
         except Exception as e:
-            print(f"Error extracting MCQs: {e}")
+            logger.error("Error extracting MCQs", extra={"error": str(e)})
             return []
 
-    async def answer_multiple_mcqs_batch(self, questions_batch: List[Dict], use_multi_model: bool = False) -> List[Dict]:
+    def _parse_extraction(self, content_text: str) -> Optional[List[Dict]]:
+        """Parse an extraction reply into MCQ dicts, resolving passage references
+        
+        Accepts the {"passages", "questions"} object as well as a bare array of
+        questions. Questions that reference a passage get its text as "passage".
+        """
+        adapter = self._adapter(self.extraction_model)
+        array_start, object_start = content_text.find("["), content_text.find("{")
+        if array_start != -1 and (object_start == -1 or array_start < object_start):
+            return adapter.parse_json(content_text, expect="array")
+        
+        parsed = adapter.parse_json(content_text)
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("questions"), list):
+            return None
+        passages = {
+            str(passage.get("id")): passage.get("text", "")
+            for passage in parsed.get("passages") or []
+            if isinstance(passage, dict) and passage.get("text")
+        }
+        mcqs = parsed["questions"]
+        for mcq in mcqs:
+            if isinstance(mcq, dict) and str(mcq.get("passage_id")) in passages:
+                mcq["passage_id"] = str(mcq["passage_id"])
+                mcq["passage"] = passages[mcq["passage_id"]]
+            elif isinstance(mcq, dict):
+                mcq["passage_id"] = None
+        return mcqs
+
+    def fits_fused_budget(self, content: str, model_key: Optional[str] = None) -> bool:
+        """Whether a page is small enough to extract and answer in a single call"""
+        model_key = model_key or self.default_single_model
+        return self._adapter(model_key).estimate_tokens(content) <= FUSED_TOKEN_BUDGET
+
+    @traced("extract_and_answer_fused")
+    async def extract_and_answer_fused(self, content: str, layout_info: Dict, model_key: Optional[str] = None, fast: bool = False) -> Optional[List[Dict]]:
+        """Extract and answer every MCQ on a small page with one structured-output call
+        
+        Returns None when the call fails or its reply cannot be used, so the
+        caller can fall back to the two-stage extract-then-answer pipeline.
+        """
+        
+        model_key = model_key or self.default_single_model
+        reasoning_rule = (
+            'Set "reasoning" to an empty string.' if fast
+            else 'Give brief reasoning for each answer in "reasoning".'
+        )
+        
+        system_prompt = f"""You are an expert at identifying and answering multiple choice questions (MCQs) on webpages.
+
+            Your task is to:
+            1. Identify all multiple choice questions in the provided content
+            2. Extract the question text and all available options, in page order
+            3. Answer each question with the 0-based index of the correct option and your confidence (0-100)
+
+            Guidelines:
+            - Options may be formatted as: A) option, (A) option, A. option, or similar
+            - Include all context necessary to understand the question
+            - {reasoning_rule}
+            - If no MCQs are found, return an empty list
+
+            Return a JSON object:
+            {{
+                "questions": [
+                    {{
+                        "question": "The complete question text",
+                        "options": ["Option A text", "Option B text", "Option C text", "Option D text"],
+                        "correct_option": 0,
+                        "confidence": 85,
+                        "reasoning": "Why this option is correct"
+                    }}
+                ]
+            }}"""
+
+        user_prompt = f"""Analyze this webpage content, extract all MCQ questions and answer them:
+
+            Content:
+            {content}
+
+            Layout Info:
+            URL: {layout_info.get('url', 'Unknown')}
+            Title: {layout_info.get('title', 'Unknown')}"""
+
+        try:
+            content_text = await self._generate(
+                model_key,
+                system_prompt,
+                user_prompt,
+                task="extract_answer",
+                context={"content": content, "layout": layout_info},
+                json_schema=FUSED_RESPONSE_SCHEMA
+            )
+            parsed = self._adapter(model_key).parse_json(content_text) if content_text else None
+        except Exception as e:
+            logger.warning("Fused extract-and-answer failed, falling back to two-stage", extra={"error": str(e)})
+            return None
+        
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("questions"), list):
+            logger.warning("Fused extract-and-answer returned no usable JSON, falling back to two-stage")
+            return None
+        
+        results = []
+        for i, mcq in enumerate(parsed["questions"]):
+            if not isinstance(mcq, dict) or not mcq.get("question") or not mcq.get("options"):
+                continue
+            correct_option = mcq.get("correct_option", -1)
+            if not isinstance(correct_option, int) or not 0 <= correct_option < len(mcq["options"]):
+                correct_option = -1
+            result = {
+                "question": mcq["question"],
+                "options": mcq["options"],
+                "question_index": i,
+                "correct_option": correct_option,
+                "confidence": mcq.get("confidence", 0) if correct_option >= 0 else 0,
+                "reasoning": "" if fast else mcq.get("reasoning", "")
+            }
+            # The answer key overrides the model for questions it knows
+            result.update(self._verified_answer(mcq["question"], mcq["options"]) or {})
+            results.append(result)
+        return results
+
+    @traced("answer_batch")
+    async def answer_multiple_mcqs_batch(self, questions_batch: List[Dict], use_multi_model: bool = False, models: Optional[List[str]] = None, fast: bool = False) -> List[Dict]:
         """
         Process multiple MCQs in optimized batches for better performance
         
         Args:
             questions_batch: List of dicts with 'question' and 'options' keys
             use_multi_model: Whether to use multi-model consensus
+            models: Model keys to use instead of the configured defaults
+            fast: Answer-only mode (no reasoning, tiny output budget)
             
         Returns:
-            List of answer results
+            List of answer results, in question order
         """
         
         if not questions_batch:
             return []
         
         start_time = time.time()
-        print(f"Processing batch of {len(questions_batch)} questions in parallel...")
+        logger.info("Processing question batch", extra={"questions": len(questions_batch), "multi_model": use_multi_model})
         
-        # Create tasks for all questions
+        # Create tasks for all questions; questions sharing a reading passage become
+        # one group task so the passage prefix is cached once and reused
         tasks = []
+        task_positions: List[List[int]] = []
+        passage_tasks: Dict[str, int] = {}
+        passage_groups: Dict[str, List[Dict]] = {}
         for i, mcq_data in enumerate(questions_batch):
             question = mcq_data.get("question", "")
             options = mcq_data.get("options", [])
@@ -164,56 +338,76 @@ class AIService:
             if not question or not options:
                 continue
             
+            position = sum(len(positions) for positions in task_positions)
+            passage = mcq_data.get("passage")
+            if passage:
+                if passage not in passage_tasks:
+                    passage_groups[passage] = []
+                    passage_tasks[passage] = len(tasks)
+                    tasks.append(self.answer_passage_group(passage_groups[passage], passage, use_multi_model, models, fast))
+                    task_positions.append([])
+                passage_groups[passage].append(mcq_data)
+                task_positions[passage_tasks[passage]].append(position)
+                continue
+            
             if use_multi_model:
-                task = self.answer_mcq_multi_model(question, options)
+                task = self.answer_mcq_multi_model(question, options, models, fast=fast)
             else:
-                task = self.answer_mcq_single_model(question, options)
+                task = self.answer_mcq_single_model(question, options, models[0] if models else None, fast=fast)
             
             tasks.append(task)
+            task_positions.append([position])
         
         # Process all questions concurrently
         try:
             results = await asyncio.gather(*tasks, return_exceptions=True)
         except Exception as e:
-            print(f"Error in batch processing: {e}")
+            logger.error("Error in batch processing", extra={"error": str(e)})
             return []
         
-        # Filter and process results
-        processed_results = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                print(f"Error processing question {i}: {result}")
-                # Add error result
-                processed_results.append({
-                    "correct_option": -1,
-                    "confidence": 0,
-                    "reasoning": f"Error processing question: {str(result)}",
-                    "consensus": False
-                })
-            else:
-                processed_results.append(result)
+        # Filter and process results, restoring question order
+        processed_results: List[Dict] = [None] * sum(len(positions) for positions in task_positions)
+        for result, positions in zip(results, task_positions):
+            group_results = result if isinstance(result, list) else [result] * len(positions)
+            for position, question_result in zip(positions, group_results):
+                if isinstance(question_result, Exception):
+                    logger.error("Error processing question", extra={"position": position, "error": str(question_result)})
+                    # Add error result
+                    processed_results[position] = {
+                        "correct_option": -1,
+                        "confidence": 0,
+                        "reasoning": f"Error processing question: {str(question_result)}",
+                        "consensus": False
+                    }
+                else:
+                    processed_results[position] = question_result
         
         processing_time = time.time() - start_time
-        print(f"Batch processing completed in {processing_time:.2f} seconds "
-              f"({len(processed_results)} questions, {processing_time/len(processed_results):.2f}s per question)")
+        logger.info("Batch processing completed", extra={
+            "questions": len(processed_results),
+            "seconds": round(processing_time, 3),
+            "seconds_per_question": round(processing_time / len(processed_results), 3)
+        })
         
         return processed_results
 
-    async def answer_mcq_single_model(self, question: str, options: List[str]) -> Dict:
-        """Answer an MCQ using a single AI model (GPT-4.1)"""
+    @traced("answer_question", mode="single")
+    async def answer_mcq_single_model(self, question: str, options: List[str], model_key: Optional[str] = None, fast: bool = False, passage: Optional[str] = None, context_handles: Optional[Dict[str, Any]] = None) -> Dict:
+        """Answer an MCQ using a single AI model (the configured default, GPT-4.1 out of the box)
         
-        system_prompt = """You are an expert at answering multiple choice questions. Analyze the question and options carefully, then provide:
-
-1. The correct answer (as option index: 0, 1, 2, or 3)
-2. Your confidence level (0-100%)
-3. Detailed reasoning for your choice
-
-Return your response in this exact JSON format:
-{
-    "correct_option": 0,
-    "confidence": 85,
-    "reasoning": "Detailed explanation of why this option is correct"
-}"""
+        In fast mode only the option and confidence are requested; reasoning is
+        left empty and can be generated later with explain_answer. A shared
+        reading passage goes at the end of the system prompt so it forms a
+        cacheable prefix across the questions that use it.
+        """
+        
+        model_key = model_key or self.default_single_model
+        
+        verified = self._verified_answer(question, options)
+        if verified:
+            return verified
+        
+        system_prompt = self._answer_system_prompt(None, fast, passage)
 
         options_text = "\n".join([f"{chr(65 + i)}. {option}" for i, option in enumerate(options)])
         
@@ -224,74 +418,73 @@ Options:
 
 Analyze this question and provide the correct answer with reasoning."""
 
+        if fast:
+            user_prompt = f"""Question: {question}
+
+Options:
+{options_text}"""
+
+        plan = self._reasoning_plan(model_key, question, options, passage)
         try:
-            response = await self._make_openai_request(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3
+            start_time = time.time()
+            content_text = await self._generate(
+                model_key,
+                system_prompt,
+                user_prompt,
+                max_tokens=FAST_MODE_MAX_TOKENS if fast else None,
+                context={"question": question, "options": options},
+                **self._passage_cache_kwargs(model_key, passage, context_handles),
+                **self._plan_kwargs(plan)
             )
+            if plan:
+                reasoning_stats.record_call(model_key, plan, time.time() - start_time)
             
-            if response and response.choices:
-                content_text = response.choices[0].message.content
-                
-                if content_text:
-                    # Parse JSON response
-                    try:
-                        start_idx = content_text.find('{')
-                        end_idx = content_text.rfind('}') + 1
-                        
-                        if start_idx != -1 and end_idx != 0:
-                            json_str = content_text[start_idx:end_idx]
-                            result = json.loads(json_str)
-                            
-                            # Validate required fields
-                            if all(key in result for key in ['correct_option', 'confidence', 'reasoning']):
-                                # Ensure correct_option is within valid range
-                                if 0 <= result['correct_option'] < len(options):
-                                    return result
-                        
-                        # If parsing fails, return default response
-                        return {
-                            "correct_option": -1,
-                            "confidence": 0,
-                            "reasoning": "Could not parse AI response properly"
-                        }
-                        
-                    except json.JSONDecodeError:
-                        return {
-                            "correct_option": -1,
-                            "confidence": 0,
-                            "reasoning": "Failed to parse AI response as JSON"
+            if content_text:
+                # Parse JSON response
+                try:
+                    result = self._parse_answer(model_key, content_text, options, fast)
+                    if result is not None:
+                        await self._record_candidate(question, options, result, [model_key], consensus=False)
+                        return result
+                    
+                    # If parsing fails, return default response
+                    return {
+                        "correct_option": -1,
+                        "confidence": 0,
+                        "reasoning": "Could not parse AI response properly"
                     }
-                else:
+                    
+                except json.JSONDecodeError:
                     return {
                         "correct_option": -1,
                         "confidence": 0,
-                        "reasoning": "Empty response from AI"
+                        "reasoning": "Failed to parse AI response as JSON"
                     }
             else:
                 return {
                     "correct_option": -1,
                     "confidence": 0,
-                    "reasoning": "No valid response from AI"
+                    "reasoning": "Empty response from AI"
                 }
                 
         except Exception as e:
-            print(f"Error answering MCQ: {e}")
+            logger.error("Error answering MCQ", extra={"model": model_key, "error": str(e)})
             return {
                 "correct_option": -1,
                 "confidence": 0,
                 "reasoning": f"Error occurred: {str(e)}"
             }
 
-    async def answer_mcq_multi_model(self, question: str, options: List[str]) -> Dict:
-        """Answer an MCQ using multiple AI services (OpenAI GPT-4 + Google Gemini) and check for consensus"""
+    @traced("answer_question", mode="multi")
+    async def answer_mcq_multi_model(self, question: str, options: List[str], models: Optional[List[str]] = None, fast: bool = False, passage: Optional[str] = None, context_handles: Optional[Dict[str, Any]] = None) -> Dict:
+        """Answer an MCQ using an ensemble of AI models (configured default: GPT-4.1 + Gemini) and check for consensus"""
         
-        # Use different AI providers
-        models_to_use = ["gpt-4.1", "gemini-2.5-pro"]
+        verified = self._verified_answer(question, options)
+        if verified:
+            return {**verified, "model_responses": [], "consensus": True, "total_processing_time": 0.0}
+        
+        # Use the requested ensemble or the configured default
+        models_to_use = [model_key for model_key in (models or self.default_ensemble) if model_key in self.models]
         
         # Record start time for performance monitoring
         start_time = time.time()
@@ -299,9 +492,8 @@ Analyze this question and provide the correct answer with reasoning."""
         # Get responses from all models concurrently with rate limiting
         tasks = []
         for model_key in models_to_use:
-            if model_key in self.models:
-                task = self._answer_with_specific_model_limited(question, options, model_key)
-                tasks.append(task)
+            task = self._answer_with_specific_model_limited(question, options, model_key, fast, passage, context_handles)
+            tasks.append(task)
         
         # Wait for all responses with timeout
         try:
@@ -310,12 +502,12 @@ Analyze this question and provide the correct answer with reasoning."""
                 timeout=self.request_timeout
             )
         except asyncio.TimeoutError:
-            print(f"Multi-model request timed out after {self.request_timeout} seconds")
+            logger.warning("Multi-model request timed out", extra={"timeout": self.request_timeout})
             responses = [Exception("Request timed out")] * len(tasks)
         
         # Record processing time
         processing_time = time.time() - start_time
-        print(f"Multi-model processing completed in {processing_time:.2f} seconds")
+        logger.info("Multi-model processing completed", extra={"models": models_to_use, "seconds": round(processing_time, 3)})
         
         # Process responses
         model_responses = []
@@ -323,7 +515,7 @@ Analyze this question and provide the correct answer with reasoning."""
         
         for i, response in enumerate(responses):
             if isinstance(response, Exception):
-                print(f"Error from model {models_to_use[i]}: {response}")
+                logger.warning("Model returned an error", extra={"model": models_to_use[i], "error": str(response)})
                 continue
                 
             if response and isinstance(response, dict):
@@ -371,6 +563,12 @@ Analyze this question and provide the correct answer with reasoning."""
             else:
                 final_confidence = 50
         
+        # Score adaptive reasoning settings by agreement with the ensemble answer
+        if final_answer >= 0 and len(model_responses) > 1:
+            for model_key, response in zip(models_to_use, responses):
+                if isinstance(response, dict) and response.get("reasoning_plan"):
+                    reasoning_stats.record_agreement(model_key, response["reasoning_plan"], response.get("correct_option") == final_answer)
+        
         # Create comprehensive reasoning
         reasoning_parts = []
         if consensus_achieved:
@@ -388,6 +586,11 @@ Analyze this question and provide the correct answer with reasoning."""
             )
         
         final_reasoning = "\n".join(reasoning_parts)
+        set_span_attributes(consensus=consensus_achieved, final_option=final_answer, models=len(model_responses))
+        if final_answer >= 0:
+            await self._record_candidate(
+                question, options, {"correct_option": final_answer, "confidence": final_confidence}, models_to_use, consensus_achieved
+            )
         
         return {
             "correct_option": final_answer,
@@ -398,12 +601,12 @@ Analyze this question and provide the correct answer with reasoning."""
             "total_processing_time": processing_time
         }
 
-    async def _answer_with_specific_model_limited(self, question: str, options: List[str], model_key: str) -> Dict:
+    async def _answer_with_specific_model_limited(self, question: str, options: List[str], model_key: str, fast: bool = False, passage: Optional[str] = None, context_handles: Optional[Dict[str, Any]] = None) -> Dict:
         """Answer MCQ with a specific AI service using rate limiting"""
         
         async with self._request_semaphore:  # Limit concurrent requests
             start_time = time.time()
-            result = await self._answer_with_specific_model(question, options, model_key)
+            result = await self._answer_with_specific_model(question, options, model_key, fast, passage, context_handles)
             processing_time = time.time() - start_time
             
             # Add processing time to result
@@ -412,26 +615,19 @@ Analyze this question and provide the correct answer with reasoning."""
             
             return result
 
-    async def _answer_with_specific_model(self, question: str, options: List[str], model_key: str) -> Dict:
-        """Answer MCQ with a specific AI service (OpenAI or Google) with retry logic"""
+    @traced("answer_with_model")
+    async def _answer_with_specific_model(self, question: str, options: List[str], model_key: str, fast: bool = False, passage: Optional[str] = None, context_handles: Optional[Dict[str, Any]] = None) -> Dict:
+        """Answer MCQ with a specific AI model through its provider adapter, with retry logic"""
         
         model_config = self.models[model_key]
-        provider = model_config["provider"]
         max_retries = model_config.get("max_retries", 3)
         retry_delay = model_config.get("retry_delay", 1.0)
         
+        set_span_attributes(model=model_key)
         for attempt in range(max_retries + 1):
             try:
-                if provider == "openai":
-                    result = await self._answer_with_openai(question, options, model_config)
-                elif provider == "google":
-                    result = await self._answer_with_gemini(question, options, model_config)
-                else:
-                    return {
-                        "correct_option": 0,
-                        "confidence": 0,
-                        "reasoning": f"Unknown provider: {provider}"
-                    }
+                with span("model_attempt", model=model_key, attempt=attempt + 1):
+                    result = await self._answer_with_model(question, options, model_key, fast, passage, context_handles)
                 
                 # If we get a successful result, return it
                 if result and result.get("confidence", 0) > 0:
@@ -440,11 +636,12 @@ Analyze this question and provide the correct answer with reasoning."""
             except Exception as e:
                 if attempt < max_retries:
                     wait_time = retry_delay * (2 ** attempt)  # Exponential backoff
-                    print(f"Attempt {attempt + 1} failed for {model_config['model_name']}, retrying in {wait_time}s: {e}")
+                    logger.warning("Model attempt failed, retrying", extra={"model": model_key, "attempt": attempt + 1, "wait": wait_time, "error": str(e)})
+                    current_span().add_event("retry", attempt=attempt + 1, wait=wait_time, error=str(e))
                     await asyncio.sleep(wait_time)
                     continue
                 else:
-                    print(f"All {max_retries + 1} attempts failed for {model_config['model_name']}: {e}")
+                    logger.error("All model attempts failed", extra={"model": model_key, "attempts": max_retries + 1, "error": str(e)})
                     return {
                         "correct_option": -1,
                         "confidence": 0,
@@ -458,21 +655,20 @@ Analyze this question and provide the correct answer with reasoning."""
             "reasoning": f"Failed to get valid response from {model_config['model_name']} after {max_retries + 1} attempts"
         }
 
-    async def _answer_with_openai(self, question: str, options: List[str], model_config: Dict) -> Dict:
-        """Answer MCQ using OpenAI GPT model"""
+    async def _answer_with_model(self, question: str, options: List[str], model_key: str, fast: bool = False, passage: Optional[str] = None, context_handles: Optional[Dict[str, Any]] = None) -> Dict:
+        """Answer MCQ with one model; provider errors are returned as zero-confidence results"""
         
-        system_prompt = f"""You are {model_config['model_name']}, an expert at answering multiple choice questions. Analyze the question and options carefully, then provide:
-
-            1. The correct answer (as option index: 0, 1, 2, or 3)
-            2. Your confidence level (0-100%)
-            3. Detailed reasoning for your choice
-
-            Return your response in this exact JSON format:
-            {{
-                "correct_option": 0,
-                "confidence": 85,
-                "reasoning": "Detailed explanation of why this option is correct"
-            }}"""
+        model_config = self.models[model_key]
+        adapter = self._adapter(model_key)
+        
+        if not adapter.is_configured():
+            return {
+                "correct_option": -1,
+                "confidence": 0,
+                "reasoning": f"{model_config['model_name']} provider ({adapter.name}) is not configured"
+            }
+        
+        system_prompt = self._answer_system_prompt(model_key, fast, passage)
 
         options_text = "\n".join([f"{chr(65 + i)}. {option}" for i, option in enumerate(options)])
         
@@ -483,213 +679,301 @@ Analyze this question and provide the correct answer with reasoning."""
 
             Analyze this question and provide the correct answer with reasoning."""
 
+        if fast:
+            user_prompt = f"""Question: {question}
+
+            Options:
+            {options_text}"""
+
+        plan = self._reasoning_plan(model_key, question, options, passage)
         try:
-            response = await self._make_openai_request(
-                model=model_config["model_id"],
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=model_config["temperature"]
+            start_time = time.time()
+            content_text = await self._generate(
+                model_key,
+                system_prompt,
+                user_prompt,
+                max_tokens=FAST_MODE_MAX_TOKENS if fast else None,
+                context={"question": question, "options": options},
+                **self._passage_cache_kwargs(model_key, passage, context_handles),
+                **self._plan_kwargs(plan)
             )
+            if plan:
+                reasoning_stats.record_call(model_key, plan, time.time() - start_time)
             
-            if response and response.choices:
-                content_text = response.choices[0].message.content
-                
-                if content_text:
-                    # Parse JSON response
-                    try:
-                        start_idx = content_text.find('{')
-                        end_idx = content_text.rfind('}') + 1
-                        
-                        if start_idx != -1 and end_idx != 0:
-                            json_str = content_text[start_idx:end_idx]
-                            result = json.loads(json_str)
-                            
-                            if all(key in result for key in ['correct_option', 'confidence', 'reasoning']):
-                                if 0 <= result['correct_option'] < len(options):
-                                    return result
-                        
-                        return {
-                            "correct_option": -1,
-                            "confidence": 0,
-                            "reasoning": f"Could not parse {model_config['model_name']} response properly"
-                        }
-                        
-                    except json.JSONDecodeError:
-                        return {
-                            "correct_option": -1,
-                            "confidence": 0,
-                            "reasoning": f"Failed to parse {model_config['model_name']} response as JSON"
-                        }
-                else:
+            if content_text:
+                # Parse JSON response
+                try:
+                    result = self._parse_answer(model_key, content_text, options, fast)
+                    if result is not None:
+                        # Kept so the ensemble can score this setting against the consensus
+                        result["reasoning_plan"] = plan
+                        return result
+                    
+                    return {
+                        "correct_option": -1,
+                        "confidence": 0,
+                        "reasoning": f"Could not parse {model_config['model_name']} response properly"
+                    }
+                    
+                except json.JSONDecodeError:
                     return {
                         "correct_option": -1,
                         "confidence": 0,
-                        "reasoning": f"Empty response from {model_config['model_name']}"
+                        "reasoning": f"Failed to parse {model_config['model_name']} response as JSON"
                     }
+            else:
+                return {
+                    "correct_option": -1,
+                    "confidence": 0,
+                    "reasoning": f"Empty response from {model_config['model_name']}"
+                }
                 
         except Exception as e:
             return {
-                "correct_option": 0,
+                "correct_option": -1,
                 "confidence": 0,
                 "reasoning": f"Error from {model_config['model_name']}: {str(e)}"
             }
+
+    @traced("answer_passage_group")
+    async def answer_passage_group(self, questions: List[Dict], passage: str, use_multi_model: bool = False, models: Optional[List[str]] = None, fast: bool = False) -> List[Dict]:
+        """Answer questions that share one reading passage, reusing the cached passage prefix
         
-        # Fallback return in case none of the above conditions are met
-        return {
-            "correct_option": -1,
-            "confidence": 0,
-            "reasoning": f"Unexpected error in {model_config['model_name']} processing"
-        }
-    
-    def get_gemini_client(self) -> genai.Client:
-        """Get or create Gemini client with lazy initialization"""
-        global _gemini_client
-        if _gemini_client is None:
-            api_key = os.getenv("GOOGLE_API_KEY")
-            location = os.getenv("GOOGLE_CLOUD_LOCATION")
-            project = os.getenv("GOOGLE_CLOUD_PROJECT")
-
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY environment variable is required")
-            
-            _gemini_client = genai.Client(
-                # api_key=api_key,
-                vertexai=True,
-                project=project,
-                location=location,
+        Providers with explicit context caches (Gemini) get the passage uploaded
+        once per model; for providers with automatic prefix caching (OpenAI) the
+        first question runs alone so the later ones hit the warm cache.
+        """
+        
+        if use_multi_model:
+            model_keys = [model_key for model_key in (models or self.default_ensemble) if model_key in self.models]
+        else:
+            model_keys = [models[0] if models else self.default_single_model]
+        
+        def planned_search(model_key: str) -> Optional[bool]:
+            # Build the cache with the tools the group's calls will ask for;
+            # with a passage the plan's search setting is the same for every question
+            plan = self._reasoning_plan(model_key, questions[0]["question"], questions[0]["options"], passage) if questions else None
+            return plan["search"] if plan else None
+
+        opened = await asyncio.gather(*[
+            self._adapter(model_key).open_context(
+                self.models[model_key],
+                self._answer_system_prompt(model_key if use_multi_model else None, fast, passage),
+                search=planned_search(model_key)
             )
-            print("Gemini client initialized")
+            for model_key in model_keys
+        ], return_exceptions=True)
+        context_handles = {}
+        for model_key, handle in zip(model_keys, opened):
+            if isinstance(handle, Exception):
+                logger.warning("Could not cache passage context", extra={"model": model_key, "error": str(handle)})
+            elif handle:
+                context_handles[model_key] = handle
+        
+        def answer(mcq_data: Dict):
+            if use_multi_model:
+                return self.answer_mcq_multi_model(mcq_data["question"], mcq_data["options"], models, fast=fast, passage=passage, context_handles=context_handles)
+            return self.answer_mcq_single_model(mcq_data["question"], mcq_data["options"], model_keys[0], fast=fast, passage=passage, context_handles=context_handles)
+        
+        warm_up_first = (
+            PASSAGE_CACHE_WARMUP
+            and len(questions) > 1
+            and any(model_key not in context_handles for model_key in model_keys)
+            and self._adapter(model_keys[0]).estimate_tokens(passage) >= PASSAGE_CACHE_MIN_TOKENS
+        )
+        try:
+            results = [await answer(questions[0])] if warm_up_first else []
+            results += await asyncio.gather(*[answer(mcq_data) for mcq_data in questions[len(results):]], return_exceptions=True)
+            set_span_attributes(questions=len(questions), context_caches=len(context_handles), warm_up=warm_up_first)
+            return results
+        finally:
+            for model_key, handle in context_handles.items():
+                try:
+                    await self._adapter(model_key).close_context(self.models[model_key], handle)
+                except Exception as e:
+                    logger.warning("Could not release passage context", extra={"model": model_key, "error": str(e)})
+
+    def _answer_system_prompt(self, model_key: Optional[str], fast: bool, passage: Optional[str] = None) -> str:
+        """System prompt for answering; model_key names the model in ensemble prompts
         
-        return _gemini_client
+        The passage is appended last so prompts for one passage share a long,
+        byte-identical prefix that providers can cache.
+        """
+        if fast:
+            system_prompt = FAST_ANSWER_SYSTEM_PROMPT
+        elif self.answer_prompt:
+            system_prompt = self.answer_prompt
+        elif model_key is None:
+            system_prompt = """You are an expert at answering multiple choice questions. Analyze the question and options carefully, then provide:
 
+1. The correct answer (as option index: 0, 1, 2, or 3)
+2. Your confidence level (0-100%)
+3. Detailed reasoning for your choice
 
-    async def _answer_with_gemini(self, question: str, options: List[str], model_config: Dict) -> Dict:
-        """Answer MCQ using Google Gemini model"""
-        
-        if not self.google_api_key:
-            return {
-                "correct_option": -1,
-                "confidence": 0,
-                "reasoning": "Google API key not configured"
-            }
-        
-        prompt = f"""You are {model_config['model_name']}, an expert at answering multiple choice questions. Analyze the question and options carefully, then provide:
+Return your response in this exact JSON format:
+{
+    "correct_option": 0,
+    "confidence": 85,
+    "reasoning": "Detailed explanation of why this option is correct"
+}"""
+        else:
+            system_prompt = f"""You are {self.models[model_key]['model_name']}, an expert at answering multiple choice questions. Analyze the question and options carefully, then provide:
 
             1. The correct answer (as option index: 0, 1, 2, or 3)
             2. Your confidence level (0-100%)
             3. Detailed reasoning for your choice
 
-            Question: {question}
-
-            Options:
-            {chr(10).join([f"{chr(65 + i)}. {option}" for i, option in enumerate(options)])}
-
             Return your response in this exact JSON format:
             {{
                 "correct_option": 0,
                 "confidence": 85,
                 "reasoning": "Detailed explanation of why this option is correct"
-            }}
-
-            Analyze this question and provide the correct answer with reasoning."""
+            }}"""
+        if passage:
+            system_prompt += f"\n\nThe question refers to this passage:\n{passage}"
+        return system_prompt
+
+    def _verified_answer(self, question: str, options: List[str]) -> Optional[Dict]:
+        """Answer from the verified answer key, skipping the models entirely"""
+        store = get_answer_key()
+        entry = store.lookup(question, options) if store else None
+        if entry is None:
+            return None
+        set_span_attributes(answer_key="hit")
+        return {
+            "correct_option": entry["correct_option"],
+            "confidence": 100,
+            "reasoning": entry["explanation"] or f"Verified answer key ({entry['source'] or 'imported'})"
+        }
 
+    async def _record_candidate(self, question: str, options: List[str], result: Dict, models: List[str], consensus: bool) -> None:
+        """Queue a model answer for review and promotion into the answer key"""
+        store = get_answer_key()
+        if not store or not ANSWER_KEY_RECORD:
+            return
         try:
-            # Create the model
-            gemini_client = self.get_gemini_client()
-            
-            # Generate response
-            response = await asyncio.to_thread(
-                gemini_client.models.generate_content,
-                model=model_config["model_id"],
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(thinking_budget=-1),
-                    tools=[types.Tool(google_search=types.GoogleSearch())],
-                    temperature=0.1,
-                )
+            await asyncio.to_thread(
+                store.record_candidate, question, options, result["correct_option"], result.get("confidence", 0), models, consensus
             )
-            
-            if response:
-                content_text = ""
-                try:
-                    # The 'response.text' quick accessor fails for multi-part responses.
-                    print("Falling back to text accessor")
-                    print(response.text)
-                    content_text = response.text
-                except ValueError:
-                    # Fallback to iterating over parts for multi-part responses.
-                    print("Falling back to parts iteration")
-                    print(response.parts)
-                    if response.parts:
-                        content_text = "".join(part.text for part in response.parts)
-
-                if content_text:
-                    # Parse JSON response
-                    try:
-                        start_idx = content_text.find('{')
-                        end_idx = content_text.rfind('}') + 1
-                        
-                        if start_idx != -1 and end_idx != 0:
-                            json_str = content_text[start_idx:end_idx]
-                            result = json.loads(json_str)
-                            
-                            if all(key in result for key in ['correct_option', 'confidence', 'reasoning']):
-                                if 0 <= result['correct_option'] < len(options):
-                                    return result
-                        
-                        return {
-                            "correct_option": -1,
-                            "confidence": 50,
-                            "reasoning": f"Could not parse {model_config['model_name']} response properly"
-                        }
-                        
-                    except json.JSONDecodeError:
-                        return {
-                            "correct_option": -1,
-                            "confidence": 50,
-                            "reasoning": f"Failed to parse {model_config['model_name']} response as JSON"
-                        }
-                else:
-                    return {
-                        "correct_option": -1,
-                        "confidence": 0,
-                        "reasoning": f"Empty content from {model_config['model_name']}"
-                    }
-            else:
-                return {
-                    "correct_option": -1,
-                    "confidence": 0,
-                    "reasoning": f"No response from {model_config['model_name']}"
-                }
-                
         except Exception as e:
-            return {
-                "correct_option": -1,
-                "confidence": 0,
-                "reasoning": f"Error from {model_config['model_name']}: {str(e)}"
-            }
+            logger.warning("Could not record answer candidate", extra={"error": str(e)})
+
+    def _reasoning_plan(self, model_key: str, question: str, options: List[str], passage: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Adaptive thinking budget and search setting for one question, if the model has them"""
+        return plan_reasoning(
+            self.models[model_key],
+            question,
+            options,
+            passage,
+            thinking_budget=self.thinking_budget,
+            search=self.search
+        )
+
+    @staticmethod
+    def _plan_kwargs(plan: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not plan:
+            return {}
+        return {"thinking_budget": plan["thinking_budget"], "search": plan["search"]}
+
+    def _passage_cache_kwargs(self, model_key: str, passage: Optional[str], context_handles: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Prompt-cache hints for a call whose system prompt ends with a shared passage"""
+        if not passage:
+            return {}
+        return {
+            "cache_key": "passage-" + hashlib.sha256(passage.encode("utf-8")).hexdigest()[:16],
+            "cache_handle": (context_handles or {}).get(model_key)
+        }
+
+    @traced("explain_answer")
+    async def explain_answer(self, question: str, options: List[str], correct_option: Optional[int] = None, model_key: Optional[str] = None) -> Dict:
+        """Generate reasoning on demand for a question answered in fast mode"""
+        
+        model_key = model_key or self.default_single_model
+        options_text = "\n".join([f"{chr(65 + i)}. {option}" for i, option in enumerate(options)])
+        
+        system_prompt = """You are an expert tutor explaining answers to multiple choice questions.
+Explain concisely why the correct option is right and why the others are wrong. Reply in plain text."""
+
+        if correct_option is not None and 0 <= correct_option < len(options):
+            instruction = f"The correct answer is option {chr(65 + correct_option)}. Explain why."
+        else:
+            instruction = "Identify the correct answer and explain why."
+        
+        user_prompt = f"""Question: {question}
+
+Options:
+{options_text}
+
+{instruction}"""
 
-    async def _make_openai_request(self, model: str, messages: List[Dict[str, Any]], temperature: float = 0.3):
-        """Make an OpenAI API request with error handling"""
         try:
-            # Convert messages to proper format for OpenAI
-            formatted_messages = []
-            for msg in messages:
-                formatted_messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-            
-            response = await asyncio.to_thread(
-                self.openai_client.chat.completions.create,
-                model=model,
-                messages=formatted_messages,  # type: ignore
-                temperature=temperature,
-                max_tokens=2000
+            reasoning = await self._generate(
+                model_key,
+                system_prompt,
+                user_prompt,
+                task="explain",
+                context={"question": question, "options": options, "correct_option": correct_option}
             )
-            return response
+            return {"correct_option": correct_option, "reasoning": reasoning.strip(), "model": model_key}
         except Exception as e:
-            print(f"OpenAI API request failed: {e}")
-            raise
\ No newline at end of file
+            logger.error("Error explaining MCQ", extra={"model": model_key, "error": str(e)})
+            return {"correct_option": correct_option, "reasoning": f"Error occurred: {str(e)}", "model": model_key}
+
+    def _parse_answer(self, model_key: str, content_text: str, options: List[str], fast: bool) -> Optional[Dict]:
+        """Parse a full answer, or an answer-only reply in fast mode (reasoning left empty)"""
+        if not fast:
+            return self._adapter(model_key).parse_answer(content_text, options)
+        result = self._adapter(model_key).parse_answer(content_text, options, required_keys=("correct_option", "confidence"))
+        if result is not None:
+            result["reasoning"] = ""
+        return result
+
+    def _adapter(self, model_key: str):
+        """Provider adapter serving a model"""
+        return get_provider(self.models[model_key]["provider"])
+
+    def _temperature(self, model_key: str, task: str) -> Optional[float]:
+        """Sampling temperature for a call: the model's own, else the task's, else None for the provider default"""
+        temperature = self.models[model_key].get("temperature")
+        if temperature is None:
+            temperature = self.settings.task_temperatures.get("extract" if task == "extract_answer" else task)
+        return temperature
+
+    async def _generate(self, model_key: str, system_prompt: str, user_prompt: str, **kwargs) -> str:
+        """Run one completion on a configured model, record its token usage and return the reply text"""
+        model_config = self.models[model_key]
+        adapter = self._adapter(model_key)
+        kwargs["temperature"] = self._temperature(model_key, kwargs.get("task", "answer"))
+        # Attribute names follow the OpenTelemetry GenAI semantic conventions
+        with span(
+            "gen_ai.generate",
+            **{
+                "gen_ai.system": adapter.name,
+                "gen_ai.request.model": model_config["model_id"],
+                "task": kwargs.get("task", "answer"),
+                "thinking_budget": kwargs.get("thinking_budget"),
+                "search": kwargs.get("search")
+            }
+        ) as generate_span:
+            result = await adapter.generate(model_config, system_prompt, user_prompt, **kwargs)
+            
+            usage = result.get("usage") or {}
+            cost = adapter.cost(
+                model_config,
+                usage.get("prompt_tokens", 0),
+                usage.get("completion_tokens", 0) + usage.get("thinking_tokens", 0),
+                cached_tokens=usage.get("cached_tokens", 0)
+            )
+            record_usage(model_key, usage, cost)
+            generate_span.attributes.update({
+                "gen_ai.usage.input_tokens": usage.get("prompt_tokens", 0),
+                "gen_ai.usage.output_tokens": usage.get("completion_tokens", 0),
+                "thinking_tokens": usage.get("thinking_tokens", 0),
+                "cached_tokens": usage.get("cached_tokens", 0),
+                "cost_usd": round(cost, 6)
+            })
+        
+        payload = sample_payload(result["text"])
+        if payload:
+            logger.info("Sampled model reply", extra={"model": model_key, "payload": payload, "prompt_chars": len(system_prompt) + len(user_prompt)})
+        return result["text"]
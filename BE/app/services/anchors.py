@@ -0,0 +1,113 @@
+"""
+DOM anchors for highlighting.
+
+The content script records one anchor per text block it extracts
+(`layout.anchors`: `{"id", "text"}` in document order). After solving, each
+question and option is mapped back to the anchor holding its text so the
+extension can highlight answers by id instead of searching the page.
+
+Questions appear on the page in the order they are extracted, so matching
+walks the anchors forward once: a question is looked for after the previous
+question's anchor, and its options between it and the next question.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.services.answer_key import normalize_option, normalize_text
+
+# Longest question prefix compared when a question spans several blocks
+_QUESTION_PREFIX_CHARS = 80
+# Extra characters an option block may carry (labels, "(correct)" markers, ...)
+_OPTION_SLACK_CHARS = 12
+
+
+class AnchorIndex:
+    """Normalized anchor texts in document order"""
+
+    def __init__(self, anchors: Sequence[Dict[str, Any]]):
+        self.ids: List[str] = []
+        self.questions: List[str] = []
+        self.options: List[str] = []
+        for anchor in anchors:
+            if not isinstance(anchor, dict) or not anchor.get("id") or not anchor.get("text"):
+                continue
+            self.ids.append(str(anchor["id"]))
+            self.questions.append(normalize_text(anchor["text"]))
+            self.options.append(normalize_option(anchor["text"]))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def find_question(self, question: str, start: int) -> Optional[int]:
+        """Position of the first anchor at or after `start` holding the question"""
+        target = normalize_text(question)
+        if not target:
+            return None
+        prefix = target[:_QUESTION_PREFIX_CHARS]
+        for position in range(start, len(self.ids)):
+            text = self.questions[position]
+            if text == target or (len(text) >= min(len(prefix), 20) and (text.startswith(prefix) or prefix.startswith(text))):
+                return position
+        return None
+
+    def find_option(self, option: str, start: int, end: int) -> Optional[int]:
+        """Position of the anchor in [start, end) holding the option text, exact matches first"""
+        target = normalize_option(option)
+        if not target:
+            return None
+        for position in range(start, end):
+            if self.options[position] == target:
+                return position
+        for position in range(start, end):
+            text = self.options[position]
+            if target in text and len(text) <= len(target) + _OPTION_SLACK_CHARS:
+                return position
+        return None
+
+
+def match_anchors(questions: List[Dict[str, Any]], anchors: Optional[Sequence[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Anchor ids per question: `{"anchor": id or None, "option_anchors": [id or None, ...]}`
+
+    Returns an empty list when the page sent no anchors.
+    """
+    index = AnchorIndex(anchors or [])
+    if not index:
+        return []
+
+    positions: List[Optional[int]] = []
+    cursor = 0
+    for question in questions:
+        position = index.find_question(question.get("question", ""), cursor)
+        positions.append(position)
+        if position is not None:
+            cursor = position + 1
+
+    # Option search window per question: after its anchor (or the previous
+    # matched question when its own is missing) up to the next matched question
+    starts, ends = [0] * len(questions), [len(index)] * len(questions)
+    last = -1
+    for i, position in enumerate(positions):
+        starts[i] = (position if position is not None else last) + 1
+        if position is not None:
+            last = position
+    upcoming = len(index)
+    for i in range(len(questions) - 1, -1, -1):
+        ends[i] = upcoming
+        if positions[i] is not None:
+            upcoming = positions[i]
+
+    matches = []
+    for i, question in enumerate(questions):
+        start, end = starts[i], ends[i]
+        option_anchors = []
+        used = set()
+        for option in question.get("options", []):
+            position = index.find_option(option, start, end)
+            if position in used:
+                position = None
+            used.add(position)
+            option_anchors.append(index.ids[position] if position is not None else None)
+        matches.append({
+            "anchor": index.ids[positions[i]] if positions[i] is not None else None,
+            "option_anchors": option_anchors
+        })
+    return matches
@@ -0,0 +1,272 @@
+"""
+Verified answer keys.
+
+A local SQLite store of question -> correct answer mappings imported from
+instructors' answer keys. Entries are keyed by a hash of the normalized
+question and its sorted, normalized options, so the same question matches
+regardless of numbering, spacing, case or option order; the answer is stored
+as option text and mapped back to the option order on the page.
+
+Model answers are recorded as candidates that can be exported for review and
+promoted into the store.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER_KEY_ENABLED = os.getenv("ANSWER_KEY_ENABLED", "false").lower() == "true"
+ANSWER_KEY_PATH = os.getenv("ANSWER_KEY_PATH", os.path.join(BE_DIR, "answer_key.db"))
+# Record model answers as review candidates
+ANSWER_KEY_RECORD = os.getenv("ANSWER_KEY_RECORD", "false").lower() == "true"
+
+_answer_key: Optional["AnswerKeyStore"] = None
+
+_QUESTION_PREFIX = re.compile(r"^\s*(q(uestion)?\s*)?\d+\s*[\.\):]\s*", re.I)
+_OPTION_PREFIX = re.compile(r"^\s*\(?[a-h1-8]\s*[\.\)\]:]\s+", re.I)
+_NON_WORD = re.compile(r"[^\w%$.+-]+")
+
+
+def normalize_text(text: str, prefix: re.Pattern = _QUESTION_PREFIX) -> str:
+    """Case-, width-, spacing- and punctuation-insensitive form of a question or option"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = prefix.sub("", text)
+    return " ".join(_NON_WORD.sub(" ", text).split()).strip(" .")
+
+
+def normalize_option(text: str) -> str:
+    return normalize_text(text, _OPTION_PREFIX)
+
+
+def question_key(question: str, options: List[str]) -> str:
+    normalized = normalize_text(question) + "\x1f" + "\x1e".join(sorted(normalize_option(option) for option in options))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def match_option(text: str, options: List[str]) -> Optional[int]:
+    """Index of the option whose normalized text equals `text`"""
+    normalized = normalize_option(text)
+    for index, option in enumerate(options):
+        if normalize_option(option) == normalized:
+            return index
+    return None
+
+
+def resolve_answer(answer: Any, options: List[str]) -> Optional[int]:
+    """Index of the correct option from the option text, a letter ("B") or a 0-based index
+
+    Option text wins, so an answer of "4" among numeric options means the option "4".
+    """
+    if isinstance(answer, bool) or answer is None:
+        return None
+    if isinstance(answer, int):
+        return answer if 0 <= answer < len(options) else None
+    text = str(answer).strip()
+    index = match_option(text, options)
+    if index is not None:
+        return index
+    if len(text) == 1 and text.isalpha():
+        index = ord(text.upper()) - ord("A")
+        return index if index < len(options) else None
+    if text.isdigit():
+        return resolve_answer(int(text), options)
+    return None
+
+
+class AnswerKeyStore:
+    """SQLite-backed verified answers plus model-answer candidates for review
+
+    Lookups are a single primary-key probe on a WITHOUT ROWID table, cheap
+    enough (tens of microseconds at a million entries) to run inline on the
+    event loop. They use their own read-only connection, which WAL mode lets
+    read while a write or import is in progress; writes share the writer
+    connection and should go through a thread.
+    """
+
+    def __init__(self, path: str = ANSWER_KEY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                answer_text TEXT NOT NULL,
+                explanation TEXT,
+                source TEXT,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS candidates (
+                key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                options TEXT NOT NULL,
+                answer_text TEXT NOT NULL,
+                confidence REAL,
+                models TEXT,
+                consensus INTEGER,
+                seen INTEGER NOT NULL DEFAULT 1,
+                updated_at REAL NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        self._read_lock = threading.Lock()
+        self._read_conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._read_conn.execute("PRAGMA query_only=ON")
+
+    def close(self) -> None:
+        with self._read_lock:
+            self._read_conn.close()
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, question: str, options: List[str]) -> Optional[Dict[str, Any]]:
+        """Verified answer for a question as presented, or None"""
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT answer_text, explanation, source FROM answers WHERE key = ?",
+                (question_key(question, options),)
+            ).fetchone()
+        if row is None:
+            return None
+        correct_option = match_option(row[0], options)
+        if correct_option is None:
+            return None
+        return {"correct_option": correct_option, "explanation": row[1], "source": row[2]}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def import_entries(self, entries: Iterable[Dict[str, Any]], source: str = "import", batch_size: int = 1000) -> Tuple[int, int]:
+        """Upsert entries with question, options and answer; returns (imported, skipped)"""
+        imported = skipped = 0
+        now = time.time()
+        batch: List[tuple] = []
+
+        def flush():
+            with self._lock:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO answers (key, question, options, answer_text, explanation, source, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                self._conn.execute("COMMIT")
+            batch.clear()
+
+        for entry in entries:
+            question, options = entry.get("question"), entry.get("options")
+            answer = entry.get("correct_option", entry.get("answer"))
+            index = resolve_answer(answer, options) if question and isinstance(options, list) and options else None
+            if index is None:
+                skipped += 1
+                continue
+            batch.append((
+                question_key(question, options),
+                question,
+                json.dumps(options, ensure_ascii=False),
+                options[index],
+                entry.get("explanation"),
+                entry.get("source") or source,
+                now
+            ))
+            imported += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return imported, skipped
+
+    def record_candidate(self, question: str, options: List[str], correct_option: int, confidence: float, models: List[str], consensus: bool) -> None:
+        """Remember a model answer for later review (no-op for questions already verified)"""
+        key = question_key(question, options)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO candidates (key, question, options, answer_text, confidence, models, consensus, updated_at) "
+                "SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM answers WHERE key = ?) "
+                "ON CONFLICT(key) DO UPDATE SET answer_text = excluded.answer_text, confidence = excluded.confidence, "
+                "models = excluded.models, consensus = excluded.consensus, seen = seen + 1, updated_at = excluded.updated_at",
+                (key, question, json.dumps(options, ensure_ascii=False), options[correct_option], confidence,
+                 ",".join(models), int(consensus), time.time(), key)
+            )
+
+    def export_candidates(self, min_confidence: float = 0.0, consensus_only: bool = False) -> Iterator[Dict[str, Any]]:
+        """Model answers awaiting review, in the import format"""
+        query = "SELECT question, options, answer_text, confidence, models, consensus, seen FROM candidates WHERE confidence >= ?"
+        if consensus_only:
+            query += " AND consensus = 1"
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY seen DESC, confidence DESC", (min_confidence,)).fetchall()
+        for question, options, answer_text, confidence, models, consensus, seen in rows:
+            yield {
+                "question": question,
+                "options": json.loads(options),
+                "answer": answer_text,
+                "confidence": confidence,
+                "models": models,
+                "consensus": bool(consensus),
+                "seen": seen
+            }
+
+    def promote(self, entries: Iterable[Dict[str, Any]], source: str = "reviewed") -> Tuple[int, int]:
+        """Import reviewed candidates as verified answers and drop them from the review queue"""
+        entries = list(entries)
+        imported, skipped = self.import_entries(entries, source=source)
+        keys = [(question_key(entry["question"], entry["options"]),) for entry in entries if entry.get("question") and entry.get("options")]
+        with self._lock:
+            self._conn.executemany("DELETE FROM candidates WHERE key = ?", keys)
+        return imported, skipped
+
+
+def read_entries(path: str) -> Iterator[Dict[str, Any]]:
+    """Entries from a .jsonl or .csv answer key
+
+    CSV files need a `question` column, options either as an `options` column
+    (a JSON list or "|"-separated) or as `option_a`, `option_b`, ... columns,
+    and an `answer` column (letter, 0-based index or option text).
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            if row.get("options"):
+                raw = row["options"]
+                options = json.loads(raw) if raw.startswith("[") else [option.strip() for option in raw.split("|")]
+            else:
+                options = [row[key] for key in sorted(row) if key.startswith("option_") and row[key]]
+            yield {"question": row.get("question"), "options": options, "answer": row.get("answer"),
+                   "explanation": row.get("explanation") or None, "source": row.get("source") or None}
+
+
+def get_answer_key() -> Optional[AnswerKeyStore]:
+    """Get or open the process-wide answer key store (None when disabled)"""
+    global _answer_key
+    if _answer_key is None and ANSWER_KEY_ENABLED:
+        _answer_key = AnswerKeyStore(ANSWER_KEY_PATH)
+        logger.info("Answer key store opened", extra={"path": ANSWER_KEY_PATH})
+    return _answer_key
+
+
+def close_answer_key() -> None:
+    global _answer_key
+    if _answer_key is not None:
+        _answer_key.close()
+        _answer_key = None
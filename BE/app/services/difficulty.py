@@ -0,0 +1,137 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+# Used when a model's "adaptive_reasoning" config does not list its own budgets
+DEFAULT_THINKING_BUDGETS = {"easy": 128, "medium": 1024, "hard": 8192}
+
+_ARITHMETIC = re.compile(r"\d\s*[-+*/x×÷^%]\s*\d|\b(sum|product|difference|quotient|multipl\w*|divided|squared|percent)\b", re.I)
+_HARD_CUES = re.compile(
+    r"\b(except|not|least|best (explains|describes|supports)|most likely|infer\w*|implies?|"
+    r"assum\w*|strongest|weakest|primary|evaluate|compare|which statements?|all of the above|none of the above)\b",
+    re.I
+)
+_TIME_SENSITIVE = re.compile(
+    r"\b(current(ly)?|latest|recent(ly)?|as of|today|this year|now|newest|incumbent|20[2-9]\d)\b", re.I
+)
+_LOOKUP_CUES = re.compile(
+    r"\b(who (is|was|won|founded|invented|wrote|discovered)|when (did|was)|where (is|was)|"
+    r"capital|population|ceo|president|prime minister|headquarter\w*|released|launched)\b",
+    re.I
+)
+_YEAR = re.compile(r"\b1[5-9]\d\d\b|\b20\d\d\b")
+_PROPER_NOUN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*")
+
+
+def estimate_difficulty(question: str, options: List[str], passage: Optional[str] = None) -> str:
+    """Rough difficulty bucket ("easy", "medium" or "hard") from the question text alone
+
+    Cheap by design: it runs on every question before any model call.
+    """
+    words = len(question.split())
+    option_words = sum(len(option.split()) for option in options) / max(len(options), 1)
+    score = 0
+    if words > 40 or option_words > 12:
+        score += 1
+    if passage:
+        score += 1
+    score += min(len(_HARD_CUES.findall(question)), 2)
+    if words <= 15 and option_words <= 4:
+        score -= 1
+    if _ARITHMETIC.search(question) and words <= 25:
+        score -= 1
+    if score <= -1:
+        return "easy"
+    return "hard" if score >= 2 else "medium"
+
+
+def needs_search(question: str, options: List[str], passage: Optional[str] = None) -> bool:
+    """Whether search grounding is likely to help: time-sensitive or factual-lookup questions
+
+    Questions about a supplied passage, and arithmetic, are answerable from the prompt.
+    """
+    if passage or (_ARITHMETIC.search(question) and not _LOOKUP_CUES.search(question)):
+        return False
+    if _TIME_SENSITIVE.search(" ".join([question] + options)):
+        return True
+    # Lookups about specific entities or dates; well-known single-entity facts need no search
+    specific = len(_PROPER_NOUN.findall(question)) >= 2 or bool(_YEAR.search(question))
+    return bool(_LOOKUP_CUES.search(question)) and specific
+
+
+def plan_reasoning(
+    model_config: Dict[str, Any],
+    question: str,
+    options: List[str],
+    passage: Optional[str] = None,
+    thinking_budget: Optional[int] = None,
+    search: Optional[bool] = None
+) -> Optional[Dict[str, Any]]:
+    """Pick the thinking budget and search grounding for one question on one model
+
+    Returns None for models without an "adaptive_reasoning" config, which keep
+    their static settings. Explicit `thinking_budget` / `search` values (the
+    per-request overrides) win over the heuristics.
+    """
+    adaptive = model_config.get("adaptive_reasoning")
+    if not adaptive:
+        return None
+    difficulty = estimate_difficulty(question, options, passage)
+    if thinking_budget is None:
+        thinking_budget = {**DEFAULT_THINKING_BUDGETS, **adaptive.get("thinking_budgets", {})}[difficulty]
+    if search is None:
+        search_mode = adaptive.get("search", "auto")
+        search = needs_search(question, options, passage) if search_mode == "auto" else bool(search_mode)
+    return {"difficulty": difficulty, "thinking_budget": thinking_budget, "search": search}
+
+
+class ReasoningStats:
+    """Per-setting latency and ensemble agreement, to tune budgets against accuracy
+
+    Agreement with the multi-model consensus stands in for accuracy, since
+    correct answers are not known at request time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _key(model_key: str, plan: Dict[str, Any]) -> str:
+        return f"{model_key}|{plan['difficulty']}|budget={plan['thinking_budget']}|search={plan['search']}"
+
+    def _entry(self, model_key: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+        return self._stats.setdefault(self._key(model_key, plan), {
+            "model": model_key,
+            **plan,
+            "calls": 0,
+            "total_latency": 0.0,
+            "compared": 0,
+            "agreed": 0
+        })
+
+    def record_call(self, model_key: str, plan: Dict[str, Any], latency: float) -> None:
+        with self._lock:
+            entry = self._entry(model_key, plan)
+            entry["calls"] += 1
+            entry["total_latency"] += latency
+
+    def record_agreement(self, model_key: str, plan: Dict[str, Any], agreed: bool) -> None:
+        with self._lock:
+            entry = self._entry(model_key, plan)
+            entry["compared"] += 1
+            entry["agreed"] += int(agreed)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    **{key: value for key, value in entry.items() if key != "total_latency"},
+                    "avg_latency": round(entry["total_latency"] / entry["calls"], 3) if entry["calls"] else None,
+                    "agreement_rate": round(entry["agreed"] / entry["compared"], 3) if entry["compared"] else None
+                }
+                for entry in self._stats.values()
+            ]
+
+
+reasoning_stats = ReasoningStats()
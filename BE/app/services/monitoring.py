@@ -0,0 +1,248 @@
+"""
+Runtime monitors: event-loop lag, default thread-pool saturation, per-request
+stage timings and an on-demand sampling profiler.
+
+Provider SDK calls run through `asyncio.to_thread`, i.e. the loop's default
+executor, so a saturated pool shows up as queue wait here rather than as
+provider latency.
+"""
+import asyncio
+import bisect
+import collections
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.services.telemetry import Span, add_span_listener
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+LOOP_LAG_WARN_MS = float(os.getenv("LOOP_LAG_WARN_MS", "100"))
+# Default executor size; None keeps Python's default of min(32, cpu_count + 4)
+EXECUTOR_MAX_WORKERS = int(os.getenv("EXECUTOR_MAX_WORKERS", "0")) or None
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("current_profile", default=None)
+
+
+class EventLoopMonitor:
+    """Measures how late a periodic sleep wakes up, i.e. time the loop spent blocked"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, window: int = 1200):
+        self.interval = interval
+        self.samples: Deque[Tuple[float, float]] = collections.deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0.0)
+            self.samples.append((time.time(), lag))
+            if lag * 1000 >= LOOP_LAG_WARN_MS:
+                logger.warning("Event loop lag", extra={"lag_ms": round(lag * 1000, 1)})
+
+    def max_lag_since(self, since: float) -> float:
+        return max((lag for at, lag in list(self.samples) if at >= since), default=0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lags = sorted(lag * 1000 for _, lag in list(self.samples))
+        if not lags:
+            return {"samples": 0}
+        return {
+            "samples": len(lags),
+            "current_ms": round(self.samples[-1][1] * 1000, 2),
+            "mean_ms": round(sum(lags) / len(lags), 2),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 2),
+            "max_ms": round(lags[-1], 2),
+            "over_threshold": len(lags) - bisect.bisect_left(lags, LOOP_LAG_WARN_MS)
+        }
+
+
+class MonitoredThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that tracks queued and running work items and queue wait"""
+
+    def __init__(self, max_workers: Optional[int] = None, **kwargs):
+        super().__init__(max_workers=max_workers, thread_name_prefix="asyncio-worker", **kwargs)
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, fn, /, *args, **kwargs):
+        queued_at = time.perf_counter()
+        profile = _current_profile.get()
+        with self._stats_lock:
+            self.queued += 1
+
+        def run():
+            wait = time.perf_counter() - queued_at
+            with self._stats_lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            if profile is not None:
+                profile.add("executor_wait", wait)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        return super().submit(run)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            started = self.completed + self.active
+            return {
+                "max_workers": self._max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2)
+            }
+
+
+class RequestProfile:
+    """Stage timings for one request, built from its finished spans
+
+    Stages that run concurrently (e.g. one provider call per question) are
+    summed, so stage totals can exceed the request's wall time.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.start_perf = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += seconds * 1000
+            entry["max_ms"] = max(entry["max_ms"], seconds * 1000)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {
+                name: {"count": int(entry["count"]), "total_ms": round(entry["total_ms"], 2), "max_ms": round(entry["max_ms"], 2)}
+                for name, entry in self.stages.items()
+            }
+        return {
+            "wall_ms": round((time.perf_counter() - self.start_perf) * 1000, 2),
+            "stages": stages,
+            "max_event_loop_lag_ms": round(loop_monitor.max_lag_since(self.started) * 1000, 2)
+        }
+
+
+def _record_span(span: Span) -> None:
+    profile = _current_profile.get()
+    if profile is not None and span.end_ns:
+        profile.add(span.name, (span.end_ns - span.start_ns) / 1e9)
+
+
+add_span_listener(_record_span)
+
+loop_monitor = EventLoopMonitor()
+_executor: Optional[MonitoredThreadPoolExecutor] = None
+
+
+def start_monitoring() -> None:
+    """Install the monitored default executor and start the lag monitor (call on the running loop)"""
+    global _executor
+    if _executor is None:
+        _executor = MonitoredThreadPoolExecutor(max_workers=EXECUTOR_MAX_WORKERS)
+        asyncio.get_running_loop().set_default_executor(_executor)
+    loop_monitor.start()
+
+
+async def stop_monitoring() -> None:
+    await loop_monitor.stop()
+
+
+def start_request_profile() -> RequestProfile:
+    """Collect stage timings for the current request (and the tasks it spawns)"""
+    profile = RequestProfile()
+    _current_profile.set(profile)
+    return profile
+
+
+def runtime_snapshot() -> Dict[str, Any]:
+    return {
+        "event_loop_lag": loop_monitor.snapshot(),
+        "executor": _executor.snapshot() if _executor else None
+    }
+
+
+def runtime_prometheus() -> str:
+    """Runtime gauges in the Prometheus text exposition format"""
+    snapshot = runtime_snapshot()
+    lag = snapshot["event_loop_lag"]
+    lines = [
+        "# HELP quiz_solver_event_loop_lag_ms Event loop lag over the recent window",
+        "# TYPE quiz_solver_event_loop_lag_ms gauge",
+    ]
+    for stat in ("current_ms", "p99_ms", "max_ms"):
+        lines.append(f'quiz_solver_event_loop_lag_ms{{stat="{stat[:-3]}"}} {lag.get(stat, 0)}')
+    if snapshot["executor"]:
+        lines += [
+            "# HELP quiz_solver_executor_work_items Default executor work items by state",
+            "# TYPE quiz_solver_executor_work_items gauge",
+            f'quiz_solver_executor_work_items{{state="active"}} {snapshot["executor"]["active"]}',
+            f'quiz_solver_executor_work_items{{state="queued"}} {snapshot["executor"]["queued"]}',
+        ]
+    return "\n".join(lines) + "\n"
+
+
+_profiler_lock = threading.Lock()
+
+
+def sample_stacks(seconds: float, interval: float = 0.01) -> str:
+    """Sample every thread's stack for `seconds` and return collapsed stacks
+
+    Output is one `thread;outer;...;inner count` line per distinct stack, the
+    input format of flamegraph.pl and speedscope. Blocks the calling thread,
+    so run it off the event loop. Raises RuntimeError if a profile is already running.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        counts: collections.Counter = collections.Counter()
+        me = threading.get_ident()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                counts[";".join([names.get(ident, str(ident))] + stack[::-1])] += 1
+            time.sleep(interval)
+        return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+    finally:
+        _profiler_lock.release()
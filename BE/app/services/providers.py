@@ -0,0 +1,524 @@
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from app.services.shared_state import wait_for_token
+
+if TYPE_CHECKING:
+    import openai
+    from google import genai
+
+BE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_MODELS_CONFIG = os.path.join(BE_DIR, "models.json")
+
+logger = logging.getLogger(__name__)
+
+_provider_types: Dict[str, type] = {}
+_providers: Dict[str, "ProviderAdapter"] = {}
+_model_registry: Optional[Dict[str, Any]] = None
+
+
+def register_provider(name: str) -> Callable[[type], type]:
+    """Class decorator that makes an adapter available to the models config under `name`"""
+    def decorator(cls: type) -> type:
+        cls.name = name
+        _provider_types[name] = cls
+        return cls
+    return decorator
+
+
+class ProviderAdapter(abc.ABC):
+    """Interface between AIService and one AI provider.
+
+    The SDK is imported and the client built on first use, so deployments
+    that never call a provider never pay for importing it. Subclasses
+    implement `_create_client` and `generate`; parsing, token estimates and
+    cost have shared defaults that adapters may override.
+    """
+
+    name = "base"
+    rate_limit_env: Optional[str] = None
+
+    def __init__(self):
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+        # Requests per minute (0 disables), enforced through the shared state
+        # backend so the budget holds across all workers
+        self.requests_per_minute = float(os.getenv(self.rate_limit_env, "0")) if self.rate_limit_env else 0.0
+
+    def is_configured(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def _create_client(self) -> Any:
+        ...
+
+    def get_client(self) -> Any:
+        """Get or create the provider client with lazy initialization"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+                    logger.info("Provider client initialized", extra={"provider": self.name})
+        return self._client
+
+    def _open_connection(self) -> None:
+        """Issue a cheap request so the connection pool is warm for the first real call"""
+
+    def warm_up(self) -> float:
+        """Import the SDK, build the client and open a connection; returns seconds taken"""
+        start_time = time.time()
+        self.get_client()
+        if os.getenv("WARMUP_CONNECT", "true").lower() == "true":
+            self._open_connection()
+        return time.time() - start_time
+
+    async def wait_for_rate_limit(self) -> None:
+        """Wait for a slot in this provider's shared token bucket"""
+        if self.requests_per_minute > 0:
+            await wait_for_token(f"provider:{self.name}", self.requests_per_minute / 60.0)
+
+    @abc.abstractmethod
+    async def generate(
+        self,
+        model_config: Dict[str, Any],
+        system_prompt: str,
+        user_prompt: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        task: str = "answer",
+        context: Optional[Dict[str, Any]] = None,
+        json_schema: Optional[Dict[str, Any]] = None,
+        cache_key: Optional[str] = None,
+        cache_handle: Any = None,
+        thinking_budget: Optional[int] = None,
+        search: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Run one completion.
+
+        Returns {"text": str, "usage": {"prompt_tokens", "completion_tokens",
+        "thinking_tokens"}, "response": raw provider response}; completion
+        tokens exclude thinking tokens, both are billed as output.
+
+        `task` and `context` describe the request in structured form
+        ("extract" with the page content, "answer" with question and options)
+        for adapters that do not read prompts, such as the local mock.
+        `json_schema` requests structured output where the provider supports it.
+        `cache_key` groups calls that share a prompt prefix (a routing hint for
+        automatic prompt caching) and `cache_handle` comes from `open_context`,
+        in which case the system prompt is already held by the provider.
+        `thinking_budget` and `search` override the model config's reasoning
+        budget and search grounding for this call where the provider has them.
+        """
+
+    def parse_json(self, text: str, expect: str = "object") -> Any:
+        """Pull the outermost JSON object (or array) out of a model reply"""
+        open_char, close_char = ("[", "]") if expect == "array" else ("{", "}")
+        start_idx = text.find(open_char)
+        end_idx = text.rfind(close_char) + 1
+        if start_idx == -1 or end_idx == 0:
+            return None
+        return json.loads(text[start_idx:end_idx])
+
+    def parse_answer(self, text: str, options: List[str], required_keys: tuple = ("correct_option", "confidence", "reasoning")) -> Optional[Dict]:
+        """Parse an answer reply; returns None unless it is complete and in range.
+
+        Raises json.JSONDecodeError when the reply is not JSON at all.
+        """
+        result = self.parse_json(text)
+        if isinstance(result, dict) and all(key in result for key in required_keys):
+            if isinstance(result["correct_option"], int) and 0 <= result["correct_option"] < len(options):
+                return result
+        return None
+
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token count (about 4 characters per token)"""
+        return len(text) // 4 + 1
+
+    def estimated_usage(self, prompt_text: str, completion_text: str) -> Dict[str, int]:
+        """Usage for providers that do not report token counts"""
+        return {
+            "prompt_tokens": self.estimate_tokens(prompt_text),
+            "completion_tokens": self.estimate_tokens(completion_text),
+            "thinking_tokens": 0
+        }
+
+    def cost(self, model_config: Dict[str, Any], prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        """USD cost of a call given the per-million-token prices in the models config
+
+        `completion_tokens` should include thinking tokens, which are billed as
+        output; `cached_tokens` (part of `prompt_tokens`) use the cached-input price.
+        """
+        input_price = model_config.get("input_cost_per_1m", 0.0)
+        cached_price = model_config.get("cached_input_cost_per_1m", input_price)
+        return (
+            (prompt_tokens - cached_tokens) * input_price
+            + cached_tokens * cached_price
+            + completion_tokens * model_config.get("output_cost_per_1m", 0.0)
+        ) / 1_000_000
+
+    async def open_context(self, model_config: Dict[str, Any], system_prompt: str, search: Optional[bool] = None) -> Any:
+        """Cache a long shared prompt prefix (e.g. a reading passage) for reuse.
+
+        `search` is the search grounding the calls sharing the prefix will use
+        (None for the model config's default). Returns a handle to pass to
+        `generate` as `cache_handle`, or None when the provider caches prefixes
+        implicitly or the prefix is too short; callers must then keep sending
+        the prefix first and unchanged.
+        """
+        return None
+
+    async def close_context(self, model_config: Dict[str, Any], handle: Any) -> None:
+        """Release a handle returned by `open_context`"""
+
+
+@register_provider("openai")
+class OpenAIProvider(ProviderAdapter):
+    rate_limit_env = "OPENAI_REQUESTS_PER_MINUTE"
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    def _create_client(self) -> "openai.OpenAI":
+        import openai
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is required")
+        return openai.OpenAI(api_key=api_key)
+
+    def _open_connection(self) -> None:
+        self.get_client().with_options(timeout=10, max_retries=0).models.list()
+
+    def estimate_tokens(self, text: str) -> int:
+        try:
+            import tiktoken
+        except ImportError:
+            return super().estimate_tokens(text)
+        return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+    async def generate(self, model_config, system_prompt, user_prompt, temperature=None, max_tokens=None, task="answer", context=None, json_schema=None, cache_key=None, cache_handle=None, thinking_budget=None, search=None):
+        extra = {}
+        if cache_key:
+            # Prompts sharing a prefix are routed to the same cache shard
+            extra["extra_body"] = {"prompt_cache_key": cache_key}
+        if json_schema:
+            extra["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": task, "schema": json_schema, "strict": True}
+            }
+
+        try:
+            await self.wait_for_rate_limit()
+            response = await asyncio.to_thread(
+                self.get_client().chat.completions.create,
+                model=model_config["model_id"],
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],  # type: ignore
+                temperature=model_config.get("temperature", 0.3) if temperature is None else temperature,
+                max_tokens=max_tokens or model_config.get("max_tokens", 2000),
+                **extra
+            )
+        except Exception as e:
+            logger.warning("OpenAI API request failed", extra={"model": model_config["model_id"], "error": str(e)})
+            raise
+
+        text = ""
+        if response and response.choices:
+            text = response.choices[0].message.content or ""
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "thinking_tokens": 0}
+        if getattr(response, "usage", None):
+            details = getattr(response.usage, "completion_tokens_details", None)
+            reasoning_tokens = getattr(details, "reasoning_tokens", 0) or 0
+            prompt_details = getattr(response.usage, "prompt_tokens_details", None)
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens or 0,
+                "cached_tokens": getattr(prompt_details, "cached_tokens", 0) or 0,
+                "completion_tokens": (response.usage.completion_tokens or 0) - reasoning_tokens,
+                "thinking_tokens": reasoning_tokens
+            }
+        return {"text": text, "usage": usage, "response": response}
+
+
+@register_provider("google")
+class GeminiProvider(ProviderAdapter):
+    rate_limit_env = "GOOGLE_REQUESTS_PER_MINUTE"
+
+    def __init__(self):
+        super().__init__()
+        # Search grounding baked into each open context cache, by cache name
+        self._context_search: Dict[str, bool] = {}
+
+    def is_configured(self) -> bool:
+        return bool(os.getenv("GOOGLE_API_KEY"))
+
+    def _create_client(self) -> "genai.Client":
+        from google import genai
+
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError("GOOGLE_API_KEY environment variable is required")
+        return genai.Client(
+            vertexai=True,
+            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+            location=os.getenv("GOOGLE_CLOUD_LOCATION"),
+        )
+
+    @property
+    def types(self) -> Any:
+        """The google.genai.types module, imported on first use"""
+        from google.genai import types
+        return types
+
+    def _open_connection(self) -> None:
+        self.get_client().models.get(model=os.getenv("GEMINI_WARMUP_MODEL", "gemini-2.5-pro"))
+
+    @staticmethod
+    def _search_enabled(model_config: Dict[str, Any], search: Optional[bool] = None) -> bool:
+        return bool(model_config.get("google_search", False)) if search is None else search
+
+    def _tools(self, model_config: Dict[str, Any], search: Optional[bool] = None) -> List[Any]:
+        types = self.types
+        tools = []
+        if self._search_enabled(model_config, search):
+            tools.append(types.Tool(google_search=types.GoogleSearch()))
+        return tools
+
+    async def open_context(self, model_config, system_prompt, search=None):
+        """Create an explicit context cache holding the shared prefix and the tools.
+
+        Prefixes under `context_cache_min_tokens` (the API minimum) are left to
+        Gemini's implicit caching instead.
+        """
+        if self.estimate_tokens(system_prompt) < model_config.get("context_cache_min_tokens", 4096):
+            return None
+        types = self.types
+        await self.wait_for_rate_limit()
+        cache = await asyncio.to_thread(
+            self.get_client().caches.create,
+            model=model_config["model_id"],
+            config=types.CreateCachedContentConfig(
+                contents=[types.Content(role="user", parts=[types.Part(text=system_prompt)])],
+                tools=self._tools(model_config, search) or None,
+                ttl=f"{model_config.get('context_cache_ttl', 600)}s",
+            )
+        )
+        self._context_search[cache.name] = self._search_enabled(model_config, search)
+        return cache.name
+
+    async def close_context(self, model_config, handle):
+        if handle:
+            self._context_search.pop(handle, None)
+            await asyncio.to_thread(self.get_client().caches.delete, name=handle)
+
+    async def generate(self, model_config, system_prompt, user_prompt, temperature=None, max_tokens=None, task="answer", context=None, json_schema=None, cache_key=None, cache_handle=None, thinking_budget=None, search=None):
+        types = self.types
+        cached_search = self._context_search.get(cache_handle, self._search_enabled(model_config))
+        if cache_handle and search is not None and search != cached_search:
+            # Requests cannot change the tools baked into a context cache; a
+            # call planned with a different search setting sends the full prompt
+            cache_handle = None
+        # Tools live in the context cache when one is used; requests may not repeat them
+        tools = [] if cache_handle else self._tools(model_config, search)
+
+        # Gemini counts thinking against max_output_tokens, so a reply cap only
+        # applies on top of a bounded thinking budget
+        if thinking_budget is None:
+            thinking_budget = model_config.get("thinking_budget", -1)
+        max_output_tokens = max_tokens + thinking_budget if max_tokens and thinking_budget >= 0 else None
+
+        await self.wait_for_rate_limit()
+        response = await asyncio.to_thread(
+            self.get_client().models.generate_content,
+            model=model_config["model_id"],
+            contents=user_prompt if cache_handle else f"{system_prompt}\n\n{user_prompt}",
+            config=types.GenerateContentConfig(
+                cached_content=cache_handle,
+                thinking_config=types.ThinkingConfig(thinking_budget=thinking_budget),
+                tools=tools or None,
+                temperature=model_config.get("temperature", 0.1) if temperature is None else temperature,
+                max_output_tokens=max_output_tokens,
+                # JSON mode cannot be combined with tools such as search grounding
+                response_mime_type="application/json" if json_schema and not tools and not cache_handle else None,
+            )
+        )
+
+        text = ""
+        if response:
+            try:
+                # The 'response.text' quick accessor fails for multi-part responses.
+                text = response.text or ""
+            except ValueError:
+                # Fallback to iterating over parts for multi-part responses.
+                logger.debug("Gemini multi-part response, joining parts")
+                if response.parts:
+                    text = "".join(part.text for part in response.parts)
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "thinking_tokens": 0}
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata:
+            usage = {
+                "prompt_tokens": (metadata.prompt_token_count or 0) + (metadata.tool_use_prompt_token_count or 0),
+                "cached_tokens": metadata.cached_content_token_count or 0,
+                "completion_tokens": metadata.candidates_token_count or 0,
+                "thinking_tokens": metadata.thoughts_token_count or 0
+            }
+        return {"text": text, "usage": usage, "response": response}
+
+
+@register_provider("mock")
+class MockProvider(ProviderAdapter):
+    """Local stand-in that answers without any network call.
+
+    Answers are deterministic per question (`answer_strategy`: "hash" or
+    "first") and `latency_ms` simulates provider latency, which makes the
+    full pipeline usable for tests and benchmarks.
+    """
+
+    def _create_client(self) -> Any:
+        return None
+
+    def warm_up(self) -> float:
+        return 0.0
+
+    def _extract(self, content: str) -> List[Dict]:
+        """Line-based extraction; a line starting "Passage:" applies to the questions after it"""
+        mcqs: List[Dict] = []
+        option_pattern = re.compile(r"^\(?([A-Ha-h])[\.\):]\s*(.+)$")
+        question: Optional[str] = None
+        options: List[str] = []
+        passage: Optional[Dict[str, str]] = None
+        for line in [line.strip() for line in content.splitlines()] + [""]:
+            match = option_pattern.match(line)
+            if match and question:
+                options.append(match.group(2).strip())
+                continue
+            if question and len(options) >= 2:
+                mcq = {"question": question, "options": options, "question_index": len(mcqs)}
+                if passage:
+                    mcq.update({"passage_id": passage["id"], "passage": passage["text"]})
+                mcqs.append(mcq)
+            if line.lower().startswith("passage:"):
+                passage = {"id": f"p{len(mcqs) + 1}", "text": line[len("passage:"):].strip()}
+                question, options = None, []
+            elif line:
+                question, options = re.sub(r"^(Q(uestion)?\s*)?\d+[\.\):]\s*", "", line), []
+            else:
+                question, options = None, []
+        return mcqs
+
+    async def generate(self, model_config, system_prompt, user_prompt, temperature=None, max_tokens=None, task="answer", context=None, json_schema=None, cache_key=None, cache_handle=None, thinking_budget=None, search=None):
+        context = context or {}
+        latency_ms = model_config.get("latency_ms", 0)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000.0)
+
+        prompt_text = f"{system_prompt}\n\n{user_prompt}"
+        if task == "extract":
+            text = json.dumps(self._extract(context.get("content", "")))
+            return {"text": text, "usage": self.estimated_usage(prompt_text, text), "response": None}
+        if task == "explain":
+            text = f"Mock explanation from {model_config.get('model_name', 'mock')} for: {context.get('question', '')}"
+            return {"text": text, "usage": self.estimated_usage(prompt_text, text), "response": None}
+
+        if task == "extract_answer":
+            questions = [
+                {"question": mcq["question"], "options": mcq["options"], **self._answer(model_config, mcq["question"], mcq["options"])}
+                for mcq in self._extract(context.get("content", ""))
+            ]
+            text = json.dumps({"questions": questions})
+            return {"text": text, "usage": self.estimated_usage(prompt_text, text), "response": None}
+
+        text = json.dumps(self._answer(model_config, context.get("question", ""), context.get("options") or []))
+        return {"text": text, "usage": self.estimated_usage(prompt_text, text), "response": None}
+
+    def _answer(self, model_config: Dict[str, Any], question: str, options: List[str]) -> Dict[str, Any]:
+        if model_config.get("answer_strategy", "hash") == "first" or not options:
+            correct_option = 0
+        else:
+            digest = hashlib.sha256(question.encode("utf-8")).digest()
+            correct_option = digest[0] % len(options)
+        return {
+            "correct_option": correct_option,
+            "confidence": model_config.get("confidence", 75),
+            "reasoning": f"Mock answer from {model_config.get('model_name', 'mock')}"
+        }
+
+
+def get_provider(name: str) -> ProviderAdapter:
+    """Get the shared adapter instance for a provider type"""
+    if name not in _providers:
+        if name not in _provider_types:
+            raise ValueError(f"Unknown provider: {name}")
+        _providers[name] = _provider_types[name]()
+    return _providers[name]
+
+
+def load_model_registry(path: Optional[str] = None, reload: bool = False) -> Dict[str, Any]:
+    """Load the models config (MODELS_CONFIG, default BE/models.json) once per process.
+
+    Returns {"models": {key: config}, "default_single": key,
+    "default_ensemble": [keys], "extraction_model": key} with only enabled
+    models kept, after checking every model names a registered provider.
+    "all_models" also holds disabled models, which can be enabled at runtime.
+    """
+    global _model_registry
+    if _model_registry is not None and not reload and path is None:
+        return _model_registry
+
+    config_path = path or os.getenv("MODELS_CONFIG", DEFAULT_MODELS_CONFIG)
+    with open(config_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    models, all_models = {}, {}
+    for key, model_config in raw.get("models", {}).items():
+        enabled = model_config.get("enabled", True)
+        if model_config.get("provider") not in _provider_types:
+            if not enabled:
+                continue
+            raise ValueError(f"Model {key} uses unknown provider: {model_config.get('provider')}")
+        all_models[key] = {"model_name": key, "model_id": key, **model_config}
+        if enabled:
+            models[key] = all_models[key]
+
+    registry = {
+        "models": models,
+        "all_models": all_models,
+        "default_single": raw.get("default_single", next(iter(models), None)),
+        "default_ensemble": [key for key in raw.get("default_ensemble", list(models)) if key in models],
+        "extraction_model": raw.get("extraction_model", raw.get("default_single")),
+    }
+    for role in ("default_single", "extraction_model"):
+        if registry[role] not in models:
+            raise ValueError(f"{role} '{registry[role]}' is not an enabled model in {config_path}")
+
+    if path is None:
+        _model_registry = registry
+    return registry
+
+
+def warm_up_providers(names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Build clients for every provider used by an enabled model; errors are reported, not raised"""
+    if names is None:
+        names = sorted({config["provider"] for config in load_model_registry()["models"].values()})
+
+    results: Dict[str, Any] = {}
+    for name in names:
+        provider = get_provider(name)
+        if not provider.is_configured():
+            results[name] = "skipped (not configured)"
+            continue
+        try:
+            results[name] = round(provider.warm_up(), 3)
+        except Exception as e:
+            results[name] = f"failed: {e}"
+    return results
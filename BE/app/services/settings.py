@@ -0,0 +1,278 @@
+"""
+Runtime-tunable settings.
+
+Concurrency, timeouts, retry policy, temperatures, enabled models and cache
+limits start from the environment and the models config, and can be changed
+live through the admin API without restarting workers.
+
+A change is merged into the current settings, validated as a whole and
+installed by replacing one snapshot reference, so readers never see half an
+update. AIService takes the snapshot once per request: work already in
+flight finishes with the settings it started with. With a shared state
+backend the new settings are published there and the other workers install
+them within SETTINGS_SYNC_INTERVAL seconds.
+"""
+import asyncio
+import collections
+import logging
+import os
+import time
+from typing import Any, Deque, Dict, Optional
+
+from pydantic import ValidationError
+
+from app.models.schemas import ModelSettings, RuntimeSettings, RuntimeSettingsUpdate
+from app.services.providers import get_provider, load_model_registry
+from app.services.shared_state import MEMORY_CACHE_MAX_ENTRIES, MemoryStateBackend, get_state_backend
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "20"))
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "300"))
+# Seconds a solved page/question stays in the shared result cache (0 disables caching)
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+SETTINGS_SYNC_INTERVAL = float(os.getenv("SETTINGS_SYNC_INTERVAL", "2"))
+
+# Temperatures used per task before any change; None defers to the model config
+DEFAULT_TASK_TEMPERATURES = {"extract": 0.2, "answer": 0.3, "explain": 0.3}
+
+_SETTINGS_KEY = "settings:runtime"
+_VERSION_KEY = "settings:version"
+
+
+class ResizableSemaphore:
+    """asyncio semaphore whose limit can be changed while permits are held
+
+    Raising the limit admits waiters immediately; lowering it lets running
+    holders finish and admits nobody new until usage drops below the limit.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = collections.deque()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # admitted just as the caller was cancelled
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass  # already popped by _wake, which skips cancelled waiters
+            raise
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    def set_limit(self, limit: int) -> None:
+        self.limit = limit
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.active < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"limit": self.limit, "active": self.active, "waiting": sum(1 for w in self._waiters if not w.done())}
+
+
+class SettingsSnapshot:
+    """One consistent set of settings plus the model configs derived from it"""
+
+    def __init__(self, settings: RuntimeSettings, all_models: Dict[str, Dict[str, Any]]):
+        self.settings = settings
+        self.models: Dict[str, Dict[str, Any]] = {}
+        for key, overrides in settings.models.items():
+            if overrides.enabled:
+                # A null temperature defers to the task temperature, so it replaces the config value too
+                self.models[key] = {
+                    **all_models[key],
+                    "temperature": overrides.temperature,
+                    "max_retries": overrides.max_retries,
+                    "retry_delay": overrides.retry_delay
+                }
+
+
+# Provider calls in flight across all requests of this worker
+request_limiter = ResizableSemaphore(MAX_CONCURRENT_REQUESTS)
+_snapshot: Optional[SettingsSnapshot] = None
+_sync_task: Optional[asyncio.Task] = None
+
+
+def default_settings() -> RuntimeSettings:
+    """Settings as configured by the environment and the models config"""
+    registry = load_model_registry()
+    providers = sorted({config["provider"] for config in registry["all_models"].values()})
+    return RuntimeSettings(
+        max_concurrent_requests=MAX_CONCURRENT_REQUESTS,
+        request_timeout=REQUEST_TIMEOUT,
+        result_cache_ttl=RESULT_CACHE_TTL,
+        memory_cache_max_entries=MEMORY_CACHE_MAX_ENTRIES,
+        provider_rate_limits={name: get_provider(name).requests_per_minute for name in providers},
+        task_temperatures=dict(DEFAULT_TASK_TEMPERATURES),
+        default_single=registry["default_single"],
+        default_ensemble=registry["default_ensemble"],
+        extraction_model=registry["extraction_model"],
+        models={
+            key: ModelSettings(
+                enabled=key in registry["models"],
+                temperature=config.get("temperature"),
+                max_retries=config.get("max_retries", 3),
+                retry_delay=config.get("retry_delay", 1.0)
+            )
+            for key, config in registry["all_models"].items()
+        }
+    )
+
+
+def _validated_snapshot(settings: RuntimeSettings) -> SettingsSnapshot:
+    """Check references between settings; raises ValueError"""
+    all_models = load_model_registry()["all_models"]
+    unknown = sorted(set(settings.models) - set(all_models))
+    if unknown:
+        raise ValueError(f"Unknown models: {', '.join(unknown)}")
+    enabled = {key for key, model in settings.models.items() if model.enabled}
+    if not enabled:
+        raise ValueError("At least one model must stay enabled")
+    for role in ("default_single", "extraction_model"):
+        if getattr(settings, role) not in enabled:
+            raise ValueError(f"{role} '{getattr(settings, role)}' is not an enabled model")
+    if not settings.default_ensemble or not set(settings.default_ensemble) <= enabled:
+        raise ValueError(f"default_ensemble must be a non-empty list of enabled models: {', '.join(sorted(enabled))}")
+    providers = {config["provider"] for config in all_models.values()}
+    unknown = sorted(set(settings.provider_rate_limits) - providers)
+    if unknown:
+        raise ValueError(f"Unknown providers: {', '.join(unknown)}")
+    if any(rate < 0 for rate in settings.provider_rate_limits.values()):
+        raise ValueError("provider_rate_limits must not be negative")
+    unknown = sorted(set(settings.task_temperatures) - set(DEFAULT_TASK_TEMPERATURES))
+    if unknown:
+        raise ValueError(f"Unknown tasks in task_temperatures: {', '.join(unknown)}")
+    if any(value is not None and not 0 <= value <= 2 for value in settings.task_temperatures.values()):
+        raise ValueError("task_temperatures must be between 0 and 2")
+    return SettingsSnapshot(settings, all_models)
+
+
+def _install(snapshot: SettingsSnapshot) -> None:
+    """Make a validated snapshot current and resize the limits it controls"""
+    global _snapshot
+    _snapshot = snapshot
+    settings = snapshot.settings
+    request_limiter.set_limit(settings.max_concurrent_requests)
+    for name, rate in settings.provider_rate_limits.items():
+        get_provider(name).requests_per_minute = rate
+    backend = get_state_backend()
+    if isinstance(backend, MemoryStateBackend):
+        backend.set_max_entries(settings.memory_cache_max_entries)
+
+
+def current_settings() -> SettingsSnapshot:
+    """The settings in effect; read it once and keep it for the whole unit of work"""
+    if _snapshot is None:
+        _install(_validated_snapshot(default_settings()))
+    return _snapshot
+
+
+def merge_settings(current: RuntimeSettings, update: RuntimeSettingsUpdate) -> RuntimeSettings:
+    """Apply a partial change (per-model changes merge field by field); raises ValueError"""
+    merged = current.model_dump()
+    changes = update.model_dump(exclude_unset=True)
+    for key, fields in (changes.pop("models", None) or {}).items():
+        if key not in merged["models"]:
+            raise ValueError(f"Unknown model: {key}")
+        merged["models"][key].update(fields)
+    for field in ("provider_rate_limits", "task_temperatures"):
+        if field in changes:
+            merged[field].update(changes.pop(field))
+    merged.update(changes)
+    try:
+        return RuntimeSettings.model_validate(merged)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())) from None
+
+
+async def _publish(settings: RuntimeSettings) -> RuntimeSettings:
+    """Stamp a new version, install it here and share it with the other workers"""
+    backend = get_state_backend()
+    version = int(await backend.incr(_VERSION_KEY))
+    settings = settings.model_copy(update={"version": max(version, current_settings().settings.version + 1), "updated_at": time.time()})
+    _install(_validated_snapshot(settings))
+    await backend.set(_SETTINGS_KEY, settings.model_dump_json().encode("utf-8"))
+    logger.info("Runtime settings changed", extra={"version": settings.version})
+    return settings
+
+
+async def update_settings(update: RuntimeSettingsUpdate) -> RuntimeSettings:
+    """Validate and apply a change everywhere; raises ValueError and changes nothing if invalid"""
+    settings = merge_settings(current_settings().settings, update)
+    _validated_snapshot(settings)
+    return await _publish(settings)
+
+
+async def reset_settings() -> RuntimeSettings:
+    """Go back to the environment and models config values"""
+    return await _publish(default_settings())
+
+
+async def sync_settings() -> bool:
+    """Install settings another worker published, if newer; returns whether anything changed"""
+    payload = await get_state_backend().get(_SETTINGS_KEY)
+    if payload is None:
+        return False
+    settings = RuntimeSettings.model_validate_json(payload)
+    if settings.version <= current_settings().settings.version:
+        return False
+    try:
+        _install(_validated_snapshot(settings))
+    except ValueError as e:
+        logger.warning("Ignoring published settings", extra={"version": settings.version, "error": str(e)})
+        return False
+    logger.info("Runtime settings synced", extra={"version": settings.version})
+    return True
+
+
+async def _sync_loop() -> None:
+    while True:
+        await asyncio.sleep(SETTINGS_SYNC_INTERVAL)
+        try:
+            await sync_settings()
+        except Exception as e:
+            logger.warning("Settings sync failed", extra={"error": str(e)})
+
+
+async def start_settings_sync() -> None:
+    """Pick up settings already published and follow later changes (shared backends only)"""
+    global _sync_task
+    # Re-apply limits, e.g. to a state backend created since the last install
+    _install(current_settings())
+    if isinstance(get_state_backend(), MemoryStateBackend):
+        return
+    await sync_settings()
+    if _sync_task is None:
+        _sync_task = asyncio.get_running_loop().create_task(_sync_loop())
+
+
+async def stop_settings_sync() -> None:
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        _sync_task = None
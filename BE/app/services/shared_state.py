@@ -0,0 +1,487 @@
+import abc
+import asyncio
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Cached results kept by the memory state backend (0 = unlimited)
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", "1000"))
+# Seconds between sweeps of expired entries
+EXPIRY_SWEEP_INTERVAL = float(os.getenv("EXPIRY_SWEEP_INTERVAL", "60"))
+# Seconds a result that was not cached stays available to the requests that waited for it
+SINGLE_FLIGHT_HANDOFF_TTL = 5.0
+
+_state_backend: Optional["SharedStateBackend"] = None
+
+
+class SharedStateBackend(abc.ABC):
+    """Shared storage for caches, coalescing locks and token buckets.
+
+    Every method is async so backends that talk to another process (SQLite
+    file, Redis) can be swapped in without touching the callers.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        """Atomically add to a numeric counter and return the new value"""
+
+    @abc.abstractmethod
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        """Try to take a lock; returns an ownership token or None if already held"""
+
+    @abc.abstractmethod
+    async def release_lock(self, name: str, token: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def take_token(self, bucket: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        """Try to take `cost` tokens from a bucket refilled at `rate` tokens/second.
+
+        Returns 0 when the tokens were granted, otherwise the number of seconds
+        to wait before enough tokens will be available.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryStateBackend(SharedStateBackend):
+    """In-process backend; only correct for a single worker"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self._values: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        # Expiring entries (cached results) in insertion order; the oldest are
+        # evicted beyond max_entries (0 = unlimited). Counters are never evicted.
+        self._expiring: Dict[str, None] = {}
+        self.max_entries = max_entries
+        self._swept_at = time.time()
+
+    def set_max_entries(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._evict()
+
+    def _evict(self) -> None:
+        while self.max_entries and len(self._expiring) > self.max_entries:
+            key = next(iter(self._expiring))
+            del self._expiring[key]
+            self._values.pop(key, None)
+
+    def _sweep(self) -> None:
+        """Drop expired values and locks, at most once per EXPIRY_SWEEP_INTERVAL"""
+        now = time.time()
+        if now - self._swept_at < EXPIRY_SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        for key in [key for key, (_, expires_at) in self._values.items() if expires_at is not None and expires_at <= now]:
+            del self._values[key]
+            self._expiring.pop(key, None)
+        for name in [name for name, (_, expires_at) in self._locks.items() if expires_at <= now]:
+            del self._locks[name]
+
+    def _live_value(self, key: str) -> Any:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._values[key]
+            self._expiring.pop(key, None)
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._live_value(key)
+        return value if isinstance(value, bytes) else None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._sweep()
+        self._values[key] = (value, time.time() + ttl if ttl else None)
+        self._expiring.pop(key, None)
+        if ttl:
+            self._expiring[key] = None
+            self._evict()
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+        self._expiring.pop(key, None)
+
+    async def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        self._sweep()
+        current = self._live_value(key)
+        new_value = (current if isinstance(current, (int, float)) else 0) + amount
+        expires_at = self._values[key][1] if key in self._values else (time.time() + ttl if ttl else None)
+        self._values[key] = (new_value, expires_at)
+        return new_value
+
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        now = time.time()
+        held = self._locks.get(name)
+        if held and held[1] > now:
+            return None
+        token = uuid.uuid4().hex
+        self._locks[name] = (token, now + ttl)
+        return token
+
+    async def release_lock(self, name: str, token: str) -> None:
+        held = self._locks.get(name)
+        if held and held[0] == token:
+            del self._locks[name]
+
+    async def take_token(self, bucket: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        now = time.time()
+        tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        if tokens >= cost:
+            self._buckets[bucket] = (tokens - cost, now)
+            return 0.0
+        self._buckets[bucket] = (tokens, now)
+        return (cost - tokens) / rate
+
+
+class SQLiteStateBackend(SharedStateBackend):
+    """Local-file backend shared by every worker process on one host.
+
+    Each mutation runs inside `BEGIN IMMEDIATE`, which takes SQLite's write
+    lock, so read-modify-write sequences stay atomic across processes. Plain
+    reads run outside a transaction, so polling never contends for that lock.
+    Expired rows are swept during writes every EXPIRY_SWEEP_INTERVAL seconds.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires_at REAL);
+            CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT, expires_at REAL);
+            CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL);
+            CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at);
+            """
+        )
+        self._swept_at = 0.0
+
+    def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._sweep(self._conn)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _sweep(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        if now - self._swept_at < EXPIRY_SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        conn.execute("DELETE FROM kv WHERE expires_at < ?", (now,))
+        conn.execute("DELETE FROM locks WHERE expires_at < ?", (now,))
+        # An idle bucket has refilled to capacity, which is also what a missing row means
+        conn.execute("DELETE FROM buckets WHERE updated_at < ?", (now - 3600,))
+
+    def _read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            return fn(self._conn)
+
+    async def _call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await asyncio.to_thread(self._run, fn)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        def op(conn):
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time())
+            ).fetchone()
+            return bytes(row[0]) if row and isinstance(row[0], (bytes, memoryview)) else None
+        return await asyncio.to_thread(self._read, op)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        await self._call(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, sqlite3.Binary(value), expires_at)
+        ))
+
+    async def delete(self, key: str) -> None:
+        await self._call(lambda conn: conn.execute("DELETE FROM kv WHERE key = ?", (key,)))
+
+    async def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        def op(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now)
+            ).fetchone()
+            if row and isinstance(row[0], (int, float)):
+                new_value, expires_at = row[0] + amount, row[1]
+            else:
+                new_value, expires_at = amount, (now + ttl if ttl else None)
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, new_value, expires_at)
+            )
+            return new_value
+        return await self._call(op)
+
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+
+        def op(conn):
+            now = time.time()
+            row = conn.execute("SELECT expires_at FROM locks WHERE name = ?", (name,)).fetchone()
+            if row and row[0] > now:
+                return None
+            conn.execute(
+                "INSERT OR REPLACE INTO locks (name, token, expires_at) VALUES (?, ?, ?)",
+                (name, token, now + ttl)
+            )
+            return token
+        return await self._call(op)
+
+    async def release_lock(self, name: str, token: str) -> None:
+        await self._call(lambda conn: conn.execute(
+            "DELETE FROM locks WHERE name = ? AND token = ?", (name, token)
+        ))
+
+    async def take_token(self, bucket: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        def op(conn):
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (bucket, tokens, now)
+            )
+            return wait
+        return await self._call(op)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Token bucket evaluated server-side so concurrent workers never race on refill
+_REDIS_TAKE_TOKEN = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+_REDIS_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_REDIS_INCR = """
+local value = redis.call('INCRBYFLOAT', KEYS[1], ARGV[1])
+if tonumber(ARGV[2]) > 0 and redis.call('PTTL', KEYS[1]) < 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return value
+"""
+
+
+class RedisStateBackend(SharedStateBackend):
+    """Backend for any server speaking the Redis protocol (Redis, Valkey, fakeredis)"""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "quiz-solver:"):
+        import redis.asyncio as redis_asyncio
+
+        self.url = url
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(self._key(key))
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self._client.set(self._key(key), value, px=int(ttl * 1000) if ttl else None)
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self._key(key))
+
+    async def incr(self, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        value = await self._client.eval(
+            _REDIS_INCR, 1, self._key(key), amount, int(ttl * 1000) if ttl else 0
+        )
+        return float(value)
+
+    async def acquire_lock(self, name: str, ttl: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        acquired = await self._client.set(f"{self._key('lock:')}{name}", token, nx=True, px=int(ttl * 1000))
+        return token if acquired else None
+
+    async def release_lock(self, name: str, token: str) -> None:
+        await self._client.eval(_REDIS_RELEASE_LOCK, 1, f"{self._key('lock:')}{name}", token)
+
+    async def take_token(self, bucket: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        wait = await self._client.eval(
+            _REDIS_TAKE_TOKEN, 1, f"{self._key('bucket:')}{bucket}", rate, capacity, cost
+        )
+        return float(wait)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_state_backend(kind: Optional[str] = None) -> SharedStateBackend:
+    """Build the backend selected by STATE_BACKEND (memory, sqlite or redis)"""
+    kind = (kind or os.getenv("STATE_BACKEND", "memory")).lower()
+
+    if kind == "memory":
+        return MemoryStateBackend(MEMORY_CACHE_MAX_ENTRIES)
+    if kind == "sqlite":
+        return SQLiteStateBackend(os.getenv("STATE_SQLITE_PATH", "quiz_solver_state.db"))
+    if kind == "redis":
+        return RedisStateBackend(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            prefix=os.getenv("REDIS_KEY_PREFIX", "quiz-solver:")
+        )
+    raise ValueError(f"Unknown STATE_BACKEND: {kind}")
+
+
+def get_state_backend() -> SharedStateBackend:
+    """Get or create the process-wide shared state backend"""
+    global _state_backend
+    if _state_backend is None:
+        _state_backend = create_state_backend()
+        logger.info("Shared state backend initialized", extra={"backend": _state_backend.name})
+    return _state_backend
+
+
+async def close_state_backend() -> None:
+    global _state_backend
+    if _state_backend is not None:
+        await _state_backend.close()
+        _state_backend = None
+
+
+async def wait_for_token(bucket: str, rate: float, capacity: Optional[float] = None, cost: float = 1.0) -> None:
+    """Block until the shared token bucket grants `cost` tokens"""
+    if rate <= 0:
+        return
+    backend = get_state_backend()
+    capacity = capacity if capacity is not None else max(rate, cost)
+    while True:
+        wait = await backend.take_token(bucket, rate, capacity, cost)
+        if wait <= 0:
+            return
+        await asyncio.sleep(wait)
+
+
+async def single_flight(
+    key: str,
+    producer: Callable[[], Awaitable[bytes]],
+    ttl: float,
+    lock_ttl: float,
+    poll_interval: float = 0.1,
+    cache_if: Optional[Callable[[bytes], bool]] = None
+) -> Tuple[bytes, bool]:
+    """Return the cached value for `key`, or compute it exactly once across workers.
+
+    The first caller takes the shared lock and runs `producer`; concurrent
+    callers (in this or any other process) poll the cache until the result
+    lands. `lock_ttl` must outlast the slowest producer, or another worker
+    starts the same work. `cache_if` can veto caching a result (e.g. a failed
+    answer); callers that were already waiting for it still get it, through a
+    key that lives for SINGLE_FLIGHT_HANDOFF_TTL seconds and is stamped with
+    the time it was produced, instead of each retrying it. Callers arriving
+    later ignore it and run the producer again. Returns `(value, from_cache)`.
+    """
+    backend = get_state_backend()
+    handoff_key = f"{key}:handoff"
+    waiting_since: Optional[float] = None
+
+    while True:
+        cached = await backend.get(key)
+        if cached is not None:
+            return cached, True
+        if waiting_since is not None:
+            handoff = await backend.get(handoff_key)
+            if handoff is not None and struct.unpack("!d", handoff[:8])[0] >= waiting_since:
+                return handoff[8:], True
+
+        attempted_at = time.time()
+        token = await backend.acquire_lock(key, lock_ttl)
+        if token is not None:
+            try:
+                # Another worker may have finished between our get and lock
+                cached = await backend.get(key)
+                if cached is not None:
+                    return cached, True
+                value = await producer()
+                if ttl > 0 and (cache_if is None or cache_if(value)):
+                    await backend.set(key, value, ttl)
+                else:
+                    await backend.set(handoff_key, struct.pack("!d", time.time()) + value, SINGLE_FLIGHT_HANDOFF_TTL)
+                return value, False
+            finally:
+                await backend.release_lock(key, token)
+
+        if waiting_since is None:
+            waiting_since = attempted_at
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,314 @@
+"""
+Structured logging and request tracing.
+
+Log records go through a queue to a background listener thread, so the event
+loop never blocks on stdout. Each record is one JSON object carrying the trace
+and span id of the request that produced it.
+
+Spans follow the OpenTelemetry data model (W3C trace ids, parent/child spans,
+attributes, events) and are exported in batches by a background thread, either
+as OTLP/JSON lines to a file or over OTLP/HTTP to a collector:
+
+    TRACE_EXPORTER=file   TRACE_FILE=traces.jsonl
+    TRACE_EXPORTER=otlp   OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318
+"""
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Model prompts/replies are only logged for a sample of calls, and truncated
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ai-quiz-solver")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_span_exporter: Optional["SpanExporter"] = None
+_span_listeners: List[Callable[["Span"], None]] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the active trace context and any `extra` fields"""
+
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in self._RESERVED})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _TraceContextFilter(logging.Filter):
+    """Stamp records with the trace context while still on the emitting task"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+def setup_logging() -> None:
+    """Route all logging through a queue drained by a background thread (idempotent)"""
+    global _log_listener
+    if _log_listener is not None:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(_TraceContextFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    _log_listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _log_listener.start()
+
+
+def shutdown_telemetry() -> None:
+    """Flush pending spans and log records"""
+    global _log_listener, _span_exporter
+    if _span_exporter is not None:
+        _span_exporter.shutdown()
+        _span_exporter = None
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def sample_payload(text: Optional[str]) -> Optional[str]:
+    """A truncated copy of a large payload for a sample of calls, else None"""
+    if not text or random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return None
+    if len(text) <= LOG_PAYLOAD_MAX_CHARS:
+        return text
+    return f"{text[:LOG_PAYLOAD_MAX_CHARS]}... [{len(text) - LOG_PAYLOAD_MAX_CHARS} more chars]"
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes)
+        self.events: List[Dict[str, Any]] = []
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": [
+                {"name": event["name"], "timeUnixNano": str(event["time_ns"]), "attributes": _otlp_attributes(event["attributes"])}
+                for event in self.events
+            ],
+            # STATUS_CODE_ERROR = 2, STATUS_CODE_OK = 1
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    converted = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        converted.append({"key": key, "value": typed})
+    return converted
+
+
+class SpanExporter:
+    """Batches finished spans on a background thread and writes them as OTLP/JSON"""
+
+    def __init__(self, kind: str, batch_size: int = 256, flush_interval: float = 2.0):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._client = None
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Drop spans rather than slow requests down
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        batch: List[Span] = []
+        flush_at = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            try:
+                span = self._queue.get(timeout=max(flush_at - time.monotonic(), 0.0))
+                if span is None:
+                    stopping = True
+                else:
+                    batch.append(span)
+            except queue.Empty:
+                pass
+            if stopping or len(batch) >= self.batch_size or time.monotonic() >= flush_at:
+                if batch:
+                    self._export(batch)
+                    batch = []
+                flush_at = time.monotonic() + self.flush_interval
+
+    def _export(self, spans: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{"scope": {"name": "quiz-solver"}, "spans": [span.to_otlp() for span in spans]}]
+            }]
+        }
+        try:
+            if self.kind == "file":
+                with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload) + "\n")
+            elif self.kind == "otlp":
+                if self._client is None:
+                    import httpx
+                    self._client = httpx.Client(timeout=5.0)
+                self._client.post(f"{OTLP_ENDPOINT}/v1/traces", json=payload).raise_for_status()
+        except Exception as e:
+            logging.getLogger(__name__).warning("Span export failed", extra={"error": str(e), "spans": len(spans)})
+
+
+def _exporter() -> Optional[SpanExporter]:
+    global _span_exporter
+    if _span_exporter is None and TRACE_EXPORTER in ("file", "otlp"):
+        _span_exporter = SpanExporter(TRACE_EXPORTER)
+    return _span_exporter
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace id, parent span id) from a W3C `traceparent` header, so traces continue across services"""
+    parts = (header or "").split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[1] != "0" * 32:
+        return parts[1], parts[2]
+    return None
+
+
+@contextmanager
+def span(name: str, remote_parent: Optional[Tuple[str, str]] = None, **attributes: Any) -> Iterator[Span]:
+    """Time a block as a child of the current span (or start a new trace)
+
+    Works across `await`s: asyncio tasks inherit the span as their parent.
+    `remote_parent` (from parse_traceparent) starts the request's root span.
+    Exceptions are recorded on the span and re-raised.
+    """
+    parent = _current_span.get()
+    if remote_parent:
+        trace_id, parent_span_id = remote_parent
+    elif parent:
+        trace_id, parent_span_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_span_id = secrets.token_hex(16), None
+    current = Span(name, trace_id, parent_span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        for listener in _span_listeners:
+            listener(current)
+        exporter = _exporter()
+        if exporter is not None:
+            exporter.submit(current)
+
+
+def add_span_listener(listener: Callable[[Span], None]) -> None:
+    """Call `listener` with every finished span, on the thread that finished it"""
+    _span_listeners.append(listener)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def traced(name: str, **static_attributes: Any):
+    """Decorator running an async function inside a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name, **static_attributes):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """Add attributes to the current span, if any"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
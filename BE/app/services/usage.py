@@ -0,0 +1,129 @@
+import contextvars
+import os
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from app.services.shared_state import get_state_backend
+
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "thinking_tokens")
+
+# Per-client token budget across all workers (0 disables) and its window in seconds
+CLIENT_TOKEN_BUDGET = int(os.getenv("CLIENT_TOKEN_BUDGET", "0"))
+CLIENT_BUDGET_WINDOW = float(os.getenv("CLIENT_BUDGET_WINDOW", "86400"))
+
+_current_usage: contextvars.ContextVar[Optional["UsageTracker"]] = contextvars.ContextVar("current_usage", default=None)
+
+
+def _empty_counts() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "thinking_tokens": 0, "total_tokens": 0, "cost_usd": 0.0}
+
+
+def _add_counts(counts: Dict[str, Any], usage: Dict[str, int], cost: float) -> None:
+    counts["calls"] += 1
+    for field in TOKEN_FIELDS:
+        counts[field] += usage.get(field, 0)
+        counts["total_tokens"] += usage.get(field, 0)
+    # Prompt tokens served from a provider prompt/context cache (a subset of prompt_tokens)
+    counts["cached_tokens"] += usage.get("cached_tokens", 0)
+    counts["cost_usd"] += cost
+
+
+class UsageTracker:
+    """Token and cost totals for one API request, broken down per model"""
+
+    def __init__(self, url: str = "", client_id: str = ""):
+        self.url = url
+        self.client_id = client_id
+        self.totals = _empty_counts()
+        self.per_model: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, model_key: str, usage: Dict[str, int], cost: float) -> None:
+        _add_counts(self.totals, usage, cost)
+        _add_counts(self.per_model.setdefault(model_key, _empty_counts()), usage, cost)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.totals,
+            "cost_usd": round(self.totals["cost_usd"], 6),
+            "per_model": {
+                model_key: {**counts, "cost_usd": round(counts["cost_usd"], 6)}
+                for model_key, counts in self.per_model.items()
+            }
+        }
+
+
+class UsageMetrics:
+    """Process-wide usage totals per model and per page host, exported as metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.per_model: Dict[str, Dict[str, Any]] = {}
+        self.per_host: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, model_key: str, host: str, usage: Dict[str, int], cost: float) -> None:
+        with self._lock:
+            _add_counts(self.per_model.setdefault(model_key, _empty_counts()), usage, cost)
+            _add_counts(self.per_host.setdefault(host or "unknown", _empty_counts()), usage, cost)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "per_model": {key: dict(counts) for key, counts in self.per_model.items()},
+                "per_host": {key: dict(counts) for key, counts in self.per_host.items()}
+            }
+
+    def prometheus(self) -> str:
+        """Render totals in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            "# HELP quiz_solver_model_calls_total Provider calls per model",
+            "# TYPE quiz_solver_model_calls_total counter",
+        ]
+        lines += [f'quiz_solver_model_calls_total{{model="{model}"}} {counts["calls"]}' for model, counts in snapshot["per_model"].items()]
+        lines += [
+            "# HELP quiz_solver_tokens_total Tokens used per model and kind",
+            "# TYPE quiz_solver_tokens_total counter",
+        ]
+        for model, counts in snapshot["per_model"].items():
+            for field in TOKEN_FIELDS + ("cached_tokens",):
+                lines.append(f'quiz_solver_tokens_total{{model="{model}",kind="{field[:-len("_tokens")]}"}} {counts[field]}')
+        lines += [
+            "# HELP quiz_solver_cost_usd_total Estimated provider cost per model in USD",
+            "# TYPE quiz_solver_cost_usd_total counter",
+        ]
+        lines += [f'quiz_solver_cost_usd_total{{model="{model}"}} {counts["cost_usd"]:.6f}' for model, counts in snapshot["per_model"].items()]
+        lines += [
+            "# HELP quiz_solver_host_tokens_total Tokens used per quiz page host",
+            "# TYPE quiz_solver_host_tokens_total counter",
+        ]
+        lines += [f'quiz_solver_host_tokens_total{{host="{host}"}} {counts["total_tokens"]}' for host, counts in snapshot["per_host"].items()]
+        return "\n".join(lines) + "\n"
+
+
+usage_metrics = UsageMetrics()
+
+
+def start_usage_tracking(url: str = "", client_id: str = "") -> UsageTracker:
+    """Begin collecting usage for the current request (and the tasks it spawns)"""
+    tracker = UsageTracker(url=url, client_id=client_id)
+    _current_usage.set(tracker)
+    return tracker
+
+
+def record_usage(model_key: str, usage: Dict[str, int], cost: float) -> None:
+    """Attribute one provider call to the current request and the global metrics"""
+    tracker = _current_usage.get()
+    if tracker is not None:
+        tracker.record(model_key, usage, cost)
+    usage_metrics.record(model_key, urlparse(tracker.url).netloc if tracker else "", usage, cost)
+
+
+async def client_tokens_used(client_id: str) -> int:
+    """Tokens a client has used in the current budget window, across all workers"""
+    return int(await get_state_backend().incr(f"budget:{client_id}", 0, CLIENT_BUDGET_WINDOW))
+
+
+async def charge_client(client_id: str, tokens: int) -> None:
+    if CLIENT_TOKEN_BUDGET > 0 and tokens > 0:
+        await get_state_backend().incr(f"budget:{client_id}", tokens, CLIENT_BUDGET_WINDOW)
@@ -0,0 +1,67 @@
+"""
+Answer key lookup benchmark.
+
+Builds a store with N synthetic entries in a temporary file, then measures
+bulk import throughput and the latency of hit and miss lookups as served on
+the request path (normalization, hashing and the SQLite probe).
+
+Usage (from the BE directory):
+    python benchmarks/answer_key_benchmark.py --entries 1000000 --lookups 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BE_DIR)
+
+from app.services.answer_key import AnswerKeyStore
+
+
+def make_entry(i: int) -> dict:
+    return {
+        "question": f"{i + 1}. In experiment {i}, which reagent turns the solution blue after {i % 97} minutes?",
+        "options": [f"Reagent {i}-{letter}" for letter in "ABCD"],
+        "answer": "ABCD"[i % 4]
+    }
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnswerKeyStore(os.path.join(tmp, "answer_key.db"))
+        start = time.perf_counter()
+        imported, _ = store.import_entries(make_entry(i) for i in range(args.entries))
+        elapsed = time.perf_counter() - start
+        print(f"import: {imported} entries in {elapsed:.1f}s ({imported / elapsed:,.0f}/s)")
+
+        for label, offset in (("hit", 0), ("miss", args.entries)):
+            latencies = []
+            for _ in range(args.lookups):
+                entry = make_entry(random.randrange(args.entries) + offset)
+                options = entry["options"][::-1]  # presented in a different order
+                start = time.perf_counter()
+                result = store.lookup(entry["question"], options)
+                latencies.append(time.perf_counter() - start)
+                assert (result is not None) == (label == "hit")
+            print(
+                f"lookup {label}: p50 {percentile(latencies, 50) * 1e6:.1f}us  "
+                f"p99 {percentile(latencies, 99) * 1e6:.1f}us  max {max(latencies) * 1e6:.1f}us"
+            )
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Fused vs two-stage latency benchmark for /api/detect-mcqs.
+
+Runs synthetic quiz pages of several sizes through the endpoint with
+`fused: true` (one extract-and-answer call) and `fused: false` (extraction
+call followed by one call per question), single-model mode, result cache off.
+
+By default the local mock provider is used with a simulated per-call latency,
+which isolates the round-trip structure of the two pipelines. Pass --live to
+use the models configured in models.json (needs real API keys).
+
+Usage (from the BE directory):
+    python benchmarks/fused_benchmark.py --sizes 3 5 10 --runs 5 --latency-ms 400
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BE_DIR)
+
+
+def make_page(num_questions: int) -> str:
+    lines = ["Practice Quiz", ""]
+    for i in range(num_questions):
+        lines.append(f"{i + 1}. What is {i + 2} multiplied by {i + 3}?")
+        for letter, offset in zip("ABCD", (0, 1, 2, -1)):
+            lines.append(f"{letter}. {(i + 2) * (i + 3) + offset}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def write_mock_config(latency_ms: int) -> str:
+    with open(os.path.join(BE_DIR, "models.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["models"]["mock"].update({"enabled": True, "latency_ms": latency_ms})
+    config.update({"default_single": "mock", "extraction_model": "mock", "default_ensemble": ["mock"]})
+    handle, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(handle, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=int, default=400, help="Simulated per-call latency for the mock provider")
+    parser.add_argument("--live", action="store_true", help="Use the configured real providers")
+    args = parser.parse_args()
+
+    os.environ["RESULT_CACHE_TTL"] = "0"
+    os.environ["WARMUP_PROVIDERS"] = "false"
+    # Every question must go through the models, and benchmark answers are not worth reviewing
+    os.environ["ANSWER_KEY_ENABLED"] = "false"
+    os.environ["ANSWER_KEY_RECORD"] = "false"
+    if not args.live:
+        os.environ["MODELS_CONFIG"] = write_mock_config(args.latency_ms)
+        os.environ.setdefault("OPENAI_API_KEY", "benchmark-placeholder")
+
+    import main as app_main
+    from fastapi.testclient import TestClient
+
+    print(f"{'questions':>9}  {'pipeline':<9}  {'p50_ms':>8}  {'p90_ms':>8}  {'calls':>5}  {'tokens':>7}")
+    with TestClient(app_main.app) as client:
+        for size in args.sizes:
+            page = make_page(size)
+            for label, fused in (("fused", True), ("two-stage", False)):
+                latencies, calls, tokens = [], 0, 0
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    response = client.post("/api/detect-mcqs", json={
+                        "content": page,
+                        "layout": {"title": "Practice Quiz", "url": "https://example.com/quiz"},
+                        "url": "https://example.com/quiz",
+                        "useMultiModel": False,
+                        "fused": fused
+                    })
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    usage = response.json().get("usage") or {}
+                    calls, tokens = usage.get("calls", 0), usage.get("total_tokens", 0)
+                print(
+                    f"{size:>9}  {label:<9}  {statistics.median(latencies) * 1000:>8.1f}  "
+                    f"{percentile(latencies, 90) * 1000:>8.1f}  {calls:>5}  {tokens:>7}"
+                )
+
+
+if __name__ == "__main__":
+    main()
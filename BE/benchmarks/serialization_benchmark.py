@@ -0,0 +1,111 @@
+"""
+Response serialization benchmark.
+
+Measures the cost of turning a solved page into response bytes, per 100
+questions, for a freshly solved page and for a result cache hit:
+
+- response_model: the model returned to FastAPI, which re-validates it
+  against `response_model` and encodes it with the standard JSON encoder
+  (cache hits additionally parse the cached JSON back into the model)
+- pre-serialized: the model dumped once to the cached bytes, decoded with
+  orjson, patched with per-request fields and encoded by ORJSONResponse
+
+Usage (from the BE directory):
+    python benchmarks/serialization_benchmark.py --questions 100 --iterations 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+BE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BE_DIR)
+
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+
+from app.api.routes import router
+from app.models.schemas import MCQDetectionResponse, MCQQuestion, ProcessingMode, UsageSummary
+
+USAGE = {"calls": 3, "prompt_tokens": 1200, "cached_tokens": 0, "completion_tokens": 300, "thinking_tokens": 0,
+         "total_tokens": 1500, "cost_usd": 0.0012, "per_model": {}}
+
+
+def make_response(questions: int) -> MCQDetectionResponse:
+    return MCQDetectionResponse.model_construct(
+        questions=[
+            MCQQuestion(
+                question=f"{i + 1}. Which of the following statements about sample topic {i} is correct?",
+                options=[f"Statement {letter} about topic {i}, worded as a typical distractor" for letter in "ABCD"],
+                correct_option=i % 4,
+                confidence=90,
+                reasoning="The other statements contradict the definition given in the passage. " * 3,
+                model_responses=[
+                    {"model": model, "selected_option": i % 4, "confidence": 90, "reasoning": "Matches the definition."}
+                    for model in ("gpt-4.1", "gemini-2.5-flash", "o4-mini")
+                ]
+            )
+            for i in range(questions)
+        ],
+        processing_mode=ProcessingMode.MULTI,
+        consensus=[True] * questions,
+        total_questions=questions
+    )
+
+
+def response_field():
+    for route in router.routes:
+        if route.path == "/detect-mcqs":
+            return route.response_field
+    raise RuntimeError("detect-mcqs route not found")
+
+
+async def via_response_model(field, response: MCQDetectionResponse) -> bytes:
+    response.usage = UsageSummary(**USAGE)
+    content = await serialize_response(field=field, response_content=response)
+    return JSONResponse(content).body
+
+
+def via_bytes(payload: bytes) -> bytes:
+    body = orjson.loads(payload)
+    body["usage"] = USAGE
+    return ORJSONResponse(body).body
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    field = response_field()
+    loop = asyncio.new_event_loop()
+    response = make_response(args.questions)
+    payload = response.model_dump_json().encode("utf-8")
+    scale = 100 / args.questions
+    print(f"{args.questions} questions, {len(payload) / 1024:.1f} KiB per response")
+
+    timings = {
+        "fresh, response_model": lambda: loop.run_until_complete(via_response_model(field, response)),
+        "fresh, pre-serialized": lambda: via_bytes(response.model_dump_json().encode("utf-8")),
+        "cache hit, response_model": lambda: loop.run_until_complete(
+            via_response_model(field, MCQDetectionResponse.model_validate_json(payload))
+        ),
+        "cache hit, pre-serialized": lambda: via_bytes(payload),
+    }
+    for label, fn in timings.items():
+        print(f"{label:28s} {per_call_us(fn, args.iterations) * scale:9.0f}us per 100 questions")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
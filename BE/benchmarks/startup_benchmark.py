@@ -0,0 +1,122 @@
+"""
+Startup-time benchmark for the API worker.
+
+Each sample runs in a fresh interpreter so module caches do not hide cold
+import cost. Measures:
+  - import time of `main` (what a worker pays before it can accept requests)
+  - import time of each provider SDK on its own, for reference
+  - latency of the first /api/answer-question call after startup, which
+    builds the provider client on first use
+
+The first request goes to the local mock provider (no SDK import, no network)
+unless --live is given, in which case the configured default model answers it
+and the provider SDK import and connection setup are included (needs real API
+keys).
+
+Usage (from the BE directory):
+    python benchmarks/startup_benchmark.py --runs 5 [--live] [--json startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+FIRST_REQUEST_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+from fastapi.testclient import TestClient
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    response = client.post("/api/answer-question", json={
+        "question": "What is 6 multiplied by 7?",
+        "options": ["36", "42", "48", "54"]
+    })
+    first_request = time.perf_counter()
+    response.raise_for_status()
+print(imported - start, started - imported, first_request - started)
+"""
+
+
+def write_mock_config() -> str:
+    with open(os.path.join(BE_DIR, "models.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["models"]["mock"].update({"enabled": True, "latency_ms": 0})
+    config.update({"default_single": "mock", "extraction_model": "mock", "default_ensemble": ["mock"]})
+    handle, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(handle, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+def run_snippet(code: str, extra_env: dict = None) -> list:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "benchmark-placeholder")
+    env["WARMUP_PROVIDERS"] = "false"
+    env.update(extra_env or {})
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout.strip().splitlines()[-1]
+    return [float(value) for value in output.split()]
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="Answer the first request with the configured real provider")
+    parser.add_argument("--json", help="Write results to this file for tracking over time")
+    args = parser.parse_args()
+
+    # The first request must reach a provider: no cached or verified answers
+    request_env = {"RESULT_CACHE_TTL": "0", "ANSWER_KEY_ENABLED": "false", "ANSWER_KEY_RECORD": "false"}
+    if not args.live:
+        request_env["MODELS_CONFIG"] = write_mock_config()
+
+    results = {}
+    for module in ["main", "openai", "google.genai"]:
+        samples = [run_snippet(IMPORT_SNIPPET.format(module=module))[0] for _ in range(args.runs)]
+        results[f"import {module}"] = summarize(samples)
+
+    startup_samples = [run_snippet(FIRST_REQUEST_SNIPPET, request_env) for _ in range(args.runs)]
+    results["app startup (lifespan)"] = summarize([s[1] for s in startup_samples])
+    results["first answer-question request"] = summarize([s[2] for s in startup_samples])
+    results["import + startup + first request"] = summarize([sum(s) for s in startup_samples])
+
+    width = max(len(name) for name in results)
+    print(f"{'stage'.ljust(width)}  median_ms  min_ms  max_ms")
+    for name, stats in results.items():
+        print(f"{name.ljust(width)}  {stats['median_ms']:>9}  {stats['min_ms']:>6}  {stats['max_ms']:>6}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Evaluate answering configurations against a labeled question set.
+
+Usage (from the BE directory):
+    python evaluate.py eval/sample.jsonl                                   # every config in eval/configs.json
+    python evaluate.py eval/sample.jsonl --only single ensemble --record eval/fixtures.jsonl
+    python evaluate.py eval/sample.jsonl --replay eval/fixtures.jsonl      # offline, no API keys or cost
+
+The dataset uses the answer key formats (.jsonl with question, options and
+answer, or .csv); the answer may be the option text, a letter or a 0-based
+index. Configurations are named in a JSON file:
+
+    {"single-fast": {"models": ["gpt-4.1"], "fast": true},
+     "ensemble": {"multi": true, "temperature": 0.0}}
+
+with the fields models, multi, fast, temperature, thinking_budget, search and
+answer_prompt (a system prompt replacing the built-in full-answer prompt).
+
+Each configuration reports accuracy, calibration of `confidence` (expected
+calibration error and Brier score), per-question latency percentiles,
+tokens and cost per question and the consensus rate, and is marked when it
+is on the Pareto front of accuracy against median latency and cost.
+
+--record saves every provider reply with its latency; --replay answers from
+those recordings, sleeping the recorded latency (scaled by --replay-latency),
+so configurations can be compared again offline. The verified answer key is
+not consulted, and nothing is recorded into it.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIGS = os.path.join(BE_DIR, "eval", "configs.json")
+CONFIG_FIELDS = {"models", "multi", "fast", "temperature", "thinking_budget", "search", "answer_prompt"}
+CALIBRATION_BINS = 10
+
+
+class ResponseFixtures:
+    """Provider replies keyed by request, recorded from live runs and replayed offline"""
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.recorded = self.replayed = 0
+        self.missing: set = set()
+        if mode == "replay" and not os.path.exists(path):
+            raise ValueError(f"No recordings at {path}")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry
+        self._file = open(path, "a", encoding="utf-8") if mode == "record" else None
+
+    @staticmethod
+    def key(provider: str, model_config: Dict[str, Any], system_prompt: str, user_prompt: str, kwargs: Dict[str, Any]) -> str:
+        request = [
+            provider,
+            model_config["model_id"],
+            model_config.get("temperature"),
+            system_prompt,
+            user_prompt,
+            {name: kwargs.get(name) for name in ("temperature", "max_tokens", "task", "thinking_budget", "search")}
+        ]
+        return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def install(self, provider_names: List[str]) -> None:
+        """Route the providers' completions through the recordings"""
+        from app.services.providers import get_provider
+
+        for name in provider_names:
+            adapter = get_provider(name)
+            adapter.generate = self._wrap(name, adapter.generate)
+            if self.mode == "replay":
+                adapter.is_configured = lambda: True
+
+    def _wrap(self, provider: str, live_generate):
+        async def generate(model_config, system_prompt, user_prompt, **kwargs):
+            key = self.key(provider, model_config, system_prompt, user_prompt, kwargs)
+            if self.mode == "replay":
+                entry = self.responses.get(key)
+                if entry is None:
+                    self.missing.add(key)
+                    raise LookupError(f"No recorded reply for {model_config['model_id']} ({kwargs.get('task', 'answer')})")
+                self.replayed += 1
+                await asyncio.sleep(entry["latency"] * self.latency_scale)
+                return {"text": entry["text"], "usage": entry["usage"], "response": None}
+
+            start = time.perf_counter()
+            result = await live_generate(model_config, system_prompt, user_prompt, **kwargs)
+            entry = {
+                "key": key,
+                "provider": provider,
+                "model": model_config["model_id"],
+                "task": kwargs.get("task", "answer"),
+                "latency": round(time.perf_counter() - start, 4),
+                "text": result["text"],
+                "usage": result.get("usage") or {}
+            }
+            self.responses[key] = entry
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            self.recorded += 1
+            return result
+        return generate
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+
+
+def load_dataset(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Labeled questions: entries with a question, two or more options and a resolvable answer"""
+    from app.services.answer_key import read_entries, resolve_answer
+
+    questions, skipped = [], 0
+    for line, entry in enumerate(read_entries(path), 1):
+        options = entry.get("options")
+        label = resolve_answer(entry.get("answer"), options) if isinstance(options, list) and len(options) >= 2 else None
+        if not entry.get("question") or label is None:
+            skipped += 1
+            continue
+        questions.append({"line": line, "id": entry.get("id"), "question": entry["question"], "options": options, "label": label})
+        if limit and len(questions) >= limit:
+            break
+    if skipped:
+        print(f"Skipped {skipped} entries without a question, options or a valid answer", file=sys.stderr)
+    return questions
+
+
+def load_configs(path: str, names: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        configs = json.load(f)
+    for name, config in configs.items():
+        unknown = set(config) - CONFIG_FIELDS
+        if unknown:
+            raise ValueError(f"Config {name}: unknown fields {', '.join(sorted(unknown))}")
+    if names:
+        missing = [name for name in names if name not in configs]
+        if missing:
+            raise ValueError(f"Unknown configs: {', '.join(missing)}")
+        configs = {name: configs[name] for name in names}
+    return configs
+
+
+def configured_service(config: Dict[str, Any]):
+    """An AIService with the configuration's overrides applied, and the models it answers with"""
+    from app.services.ai_service import AIService
+
+    ai_service = AIService()
+    models = ai_service.resolve_models(config.get("models"), config.get("multi", False))
+    if config.get("temperature") is not None:
+        ai_service.models = {key: {**model, "temperature": config["temperature"]} for key, model in ai_service.models.items()}
+    ai_service.thinking_budget = config.get("thinking_budget")
+    ai_service.search = config.get("search")
+    ai_service.answer_prompt = config.get("answer_prompt")
+    return ai_service, models
+
+
+async def run_config(name: str, config: Dict[str, Any], questions: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    """Answer every question under one configuration; one record per question"""
+    from app.services.usage import start_usage_tracking
+
+    ai_service, models = configured_service(config)
+    fast = config.get("fast", False)
+    semaphore = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def answer(item: Dict[str, Any]) -> Dict[str, Any]:
+        nonlocal done
+        async with semaphore:
+            usage = start_usage_tracking(client_id=f"evaluate:{name}")
+            start = time.perf_counter()
+            if len(models) > 1:
+                result = await ai_service.answer_mcq_multi_model(item["question"], item["options"], models, fast=fast)
+            else:
+                result = await ai_service.answer_mcq_single_model(item["question"], item["options"], models[0], fast=fast)
+            latency = time.perf_counter() - start
+        done += 1
+        sys.stderr.write(f"\r{name}: {done}/{len(questions)}")
+        sys.stderr.flush()
+        predicted = result.get("correct_option", -1)
+        return {
+            "config": name,
+            "line": item["line"],
+            "id": item["id"],
+            "label": item["label"],
+            "predicted": predicted,
+            "correct": predicted == item["label"],
+            "confidence": float(result.get("confidence") or 0),
+            "consensus": result.get("consensus") if len(models) > 1 else None,
+            "latency": round(latency, 4),
+            "tokens": usage.totals["total_tokens"],
+            "cost_usd": usage.totals["cost_usd"],
+            "error": result.get("reasoning") if predicted < 0 else None
+        }
+
+    records = await asyncio.gather(*(answer(item) for item in questions))
+    sys.stderr.write("\n")
+    return records
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)] if ordered else 0.0
+
+
+def calibration(records: List[Dict[str, Any]], bins: int = CALIBRATION_BINS) -> Dict[str, Any]:
+    """Expected calibration error, Brier score and the reliability table of `confidence`"""
+    table = []
+    ece = 0.0
+    for b in range(bins):
+        low, high = b / bins, (b + 1) / bins
+        members = [r for r in records if low <= r["confidence"] / 100 < high or (b == bins - 1 and r["confidence"] >= 100)]
+        if not members:
+            continue
+        confidence = sum(r["confidence"] for r in members) / len(members) / 100
+        accuracy = sum(r["correct"] for r in members) / len(members)
+        ece += len(members) / len(records) * abs(confidence - accuracy)
+        table.append({"bin": f"{low:.1f}-{high:.1f}", "count": len(members), "confidence": round(confidence, 4), "accuracy": round(accuracy, 4)})
+    brier = sum((r["confidence"] / 100 - r["correct"]) ** 2 for r in records) / len(records)
+    return {"ece": round(ece, 4), "brier": round(brier, 4), "reliability": table}
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    count = len(records)
+    latencies = [r["latency"] for r in records]
+    consensus = [r["consensus"] for r in records if r["consensus"] is not None]
+    return {
+        "questions": count,
+        "accuracy": round(sum(r["correct"] for r in records) / count, 4),
+        "answered": round(sum(r["predicted"] >= 0 for r in records) / count, 4),
+        "mean_confidence": round(sum(r["confidence"] for r in records) / count / 100, 4),
+        **calibration(records),
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p90": round(percentile(latencies, 90), 3),
+        "latency_p99": round(percentile(latencies, 99), 3),
+        "tokens_per_question": round(sum(r["tokens"] for r in records) / count, 1),
+        "cost_per_question": round(sum(r["cost_usd"] for r in records) / count, 6),
+        "total_cost": round(sum(r["cost_usd"] for r in records), 6),
+        "consensus_rate": round(sum(consensus) / len(consensus), 4) if consensus else None
+    }
+
+
+def pareto_front(summaries: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Configs no other config matches or beats on accuracy, median latency and cost at once"""
+    def dominates(a, b):
+        at_least = a["accuracy"] >= b["accuracy"] and a["latency_p50"] <= b["latency_p50"] and a["cost_per_question"] <= b["cost_per_question"]
+        better = a["accuracy"] > b["accuracy"] or a["latency_p50"] < b["latency_p50"] or a["cost_per_question"] < b["cost_per_question"]
+        return at_least and better
+    return [name for name, s in summaries.items() if not any(dominates(other, s) for other in summaries.values() if other is not s)]
+
+
+def print_report(summaries: Dict[str, Dict[str, Any]], front: List[str]) -> None:
+    header = f"{'config':24s} {'acc':>6s} {'answ':>6s} {'conf':>6s} {'ECE':>6s} {'Brier':>6s} {'p50':>7s} {'p90':>7s} {'p99':>7s} {'tok/q':>7s} {'$/q':>9s} {'cons':>6s}"
+    print(header)
+    print("-" * len(header))
+    for name, s in summaries.items():
+        consensus = f"{s['consensus_rate']:6.1%}" if s["consensus_rate"] is not None else f"{'-':>6s}"
+        print(
+            f"{(name + (' *' if name in front else '')):24s} {s['accuracy']:6.1%} {s['answered']:6.1%} {s['mean_confidence']:6.1%} "
+            f"{s['ece']:6.3f} {s['brier']:6.3f} {s['latency_p50']:6.2f}s {s['latency_p90']:6.2f}s {s['latency_p99']:6.2f}s "
+            f"{s['tokens_per_question']:7.0f} {s['cost_per_question']:9.5f} {consensus}"
+        )
+    print("\n* Pareto-optimal: no other config is at least as accurate, fast (p50) and cheap")
+
+
+async def evaluate(args) -> int:
+    # App modules read their configuration on import, after main() has set it
+    from app.services.settings import current_settings
+
+    questions = load_dataset(args.dataset, args.limit)
+    if not questions:
+        raise ValueError(f"No labeled questions in {args.dataset}")
+    configs = load_configs(args.configs, args.names)
+
+    fixtures = None
+    if args.record or args.replay:
+        fixtures = ResponseFixtures(args.record or args.replay, "record" if args.record else "replay", args.replay_latency)
+        fixtures.install(sorted({model["provider"] for model in current_settings().models.values()}))
+    print(f"{len(questions)} questions, {len(configs)} configs", file=sys.stderr)
+
+    summaries: Dict[str, Dict[str, Any]] = {}
+    all_records: List[Dict[str, Any]] = []
+    try:
+        for name, config in configs.items():
+            records = await run_config(name, config, questions, args.concurrency)
+            summaries[name] = summarize(records)
+            all_records += records
+    finally:
+        if fixtures:
+            fixtures.close()
+
+    front = pareto_front(summaries)
+    print_report(summaries, front)
+    if fixtures and fixtures.mode == "record":
+        print(f"Recorded {fixtures.recorded} replies to {fixtures.path}", file=sys.stderr)
+    if fixtures and fixtures.missing:
+        print(f"{len(fixtures.missing)} distinct calls had no recording; record them with --record", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"dataset": args.dataset, "configs": configs, "summary": summaries, "pareto_front": front, "questions": all_records}, f, indent=2)
+        print(f"Full report in {args.output}", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", help="Labeled questions (.jsonl or .csv)")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="Named configurations (default: eval/configs.json)")
+    parser.add_argument("--only", dest="names", nargs="+", help="Run only these configs")
+    parser.add_argument("--limit", type=int, help="Use the first N questions")
+    parser.add_argument("--concurrency", type=int, default=4, help="Questions answered at once per config (default: 4)")
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument("--record", metavar="FIXTURES", help="Save provider replies to this .jsonl")
+    fixtures.add_argument("--replay", metavar="FIXTURES", help="Answer from replies saved with --record")
+    parser.add_argument("--replay-latency", type=float, default=1.0, help="Scale for recorded latencies when replaying (0 = no waiting)")
+    parser.add_argument("--output", help="Write summaries and per-question results to this JSON file")
+    args = parser.parse_args()
+
+    # Scores must come from the models, not from verified answers
+    os.environ["ANSWER_KEY_ENABLED"] = "false"
+    os.environ["ANSWER_KEY_RECORD"] = "false"
+    logging.basicConfig(level=logging.WARNING, format="\n%(levelname)s %(name)s: %(message)s")
+
+    try:
+        return asyncio.run(evaluate(args))
+    except KeyboardInterrupt:
+        print("\nInterrupted", file=sys.stderr)
+        return 130
+    except ValueError as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
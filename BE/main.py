@@ -1,23 +1,55 @@
-from fastapi import FastAPI, HTTPException
+import os
+from dotenv import load_dotenv
+
+# Load environment variables before any app module reads them
+load_dotenv()
+
+import asyncio
+import logging
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
-import os
-from dotenv import load_dotenv
 
 from contextlib import asynccontextmanager
 
+from app.services.telemetry import setup_logging, shutdown_telemetry, span, parse_traceparent
+
+setup_logging()
+
 from app.api.routes import router
+from app.api.admin import router as admin_router
+from app.services.monitoring import start_monitoring, stop_monitoring
+from app.services.settings import start_settings_sync, stop_settings_sync
+from app.services.providers import warm_up_providers
+from app.services.shared_state import close_state_backend
+from app.services.answer_key import close_answer_key
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+async def warm_up():
+    """Import provider SDKs and open connections off the request path"""
+    results = await asyncio.to_thread(warm_up_providers)
+    logger.info("Provider warm-up finished", extra={"seconds": results})
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize services on startup and cleanup on shutdown"""
-    print("✅ AI Quiz Solver API started")
+    start_monitoring()
+    await start_settings_sync()
+    warm_up_task = None
+    if os.getenv("WARMUP_PROVIDERS", "true").lower() == "true":
+        warm_up_task = asyncio.create_task(warm_up())
+    logger.info("AI Quiz Solver API started")
     yield
-    print("✅ AI Quiz Solver API shutdown")
+    if warm_up_task and not warm_up_task.done():
+        warm_up_task.cancel()
+    await stop_monitoring()
+    await stop_settings_sync()
+    await close_state_backend()
+    close_answer_key()
+    logger.info("AI Quiz Solver API shutdown")
+    shutdown_telemetry()
 
 # Create FastAPI app
 app = FastAPI(
@@ -36,8 +68,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span per request; log lines and spans below it share its trace id"""
+    with span(
+        f"{request.method} {request.url.path}",
+        remote_parent=parse_traceparent(request.headers.get("traceparent")),
+        **{"http.request.method": request.method, "url.path": request.url.path}
+    ) as root:
+        response = await call_next(request)
+        root.set_attribute("http.response.status_code", response.status_code)
+        response.headers["X-Trace-Id"] = root.trace_id
+        return response
+
 # Include API routes
 app.include_router(router, prefix="/api")
+app.include_router(admin_router, prefix="/api/admin")
 
 
 @app.get("/")
@@ -48,10 +94,15 @@ if __name__ == "__main__":
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
     debug = os.getenv("DEBUG", "False").lower() == "true"
+    workers = int(os.getenv("WORKERS", "1"))
+    
+    if workers > 1 and os.getenv("STATE_BACKEND", "memory").lower() == "memory":
+        logger.warning("WORKERS > 1 with STATE_BACKEND=memory: caches and rate limits will not be shared between workers")
     
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=debug
+        reload=debug and workers == 1,
+        workers=workers
     )
\ No newline at end of file
@@ -0,0 +1,69 @@
+"""
+Manage the verified answer key store.
+
+Usage (from the BE directory):
+    python manage_answer_key.py import keys.csv [--source "Biology 101"]
+    python manage_answer_key.py export candidates.jsonl [--min-confidence 90] [--consensus-only]
+    python manage_answer_key.py promote candidates.jsonl
+    python manage_answer_key.py stats
+
+`import` accepts .jsonl (question, options, answer or correct_option) or .csv
+(question, options or option_a..option_h, answer). `export` writes model
+answers awaiting review in the same JSONL format; after checking or editing
+the file, `promote` moves its entries into the verified store.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.answer_key import ANSWER_KEY_PATH, AnswerKeyStore, read_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=ANSWER_KEY_PATH, help="Answer key database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Bulk import a verified answer key")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--source", help="Source label stored with each entry (default: file name)")
+
+    export_parser = commands.add_parser("export", help="Export model answers for review")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--min-confidence", type=float, default=0.0)
+    export_parser.add_argument("--consensus-only", action="store_true")
+
+    promote_parser = commands.add_parser("promote", help="Import reviewed answers and clear them from the review queue")
+    promote_parser.add_argument("path")
+
+    commands.add_parser("stats", help="Show store size")
+    args = parser.parse_args()
+
+    store = AnswerKeyStore(args.db)
+    start = time.perf_counter()
+    if args.command == "import":
+        imported, skipped = store.import_entries(read_entries(args.path), source=args.source or os.path.basename(args.path))
+        print(f"Imported {imported} entries, skipped {skipped} without a resolvable answer ({time.perf_counter() - start:.1f}s)")
+    elif args.command == "export":
+        count = 0
+        with open(args.path, "w", encoding="utf-8") as f:
+            for entry in store.export_candidates(args.min_confidence, args.consensus_only):
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                count += 1
+        print(f"Exported {count} candidates to {args.path}")
+    elif args.command == "promote":
+        imported, skipped = store.promote(read_entries(args.path))
+        print(f"Promoted {imported} entries, skipped {skipped}")
+    elif args.command == "stats":
+        print(f"{store.count()} verified entries in {args.db}")
+    store.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
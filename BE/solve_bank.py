@@ -0,0 +1,254 @@
+"""
+Solve a question bank file in bulk.
+
+Usage (from the BE directory):
+    python solve_bank.py bank.jsonl answers.jsonl [--concurrency 8] [--multi] [--models gpt-4.1 gemini-2.5-pro]
+    python solve_bank.py bank.csv answers.jsonl --mock     # offline run against the mock provider
+
+The input uses the answer key formats (.jsonl with question and options, or
+.csv with a question column and options or option_a..option_h columns); any
+answer column is ignored. Results are appended to the output JSONL as they
+complete, one line per input entry tagged with its 1-based input `line`.
+
+The output doubles as the checkpoint: rerunning the same command after a
+crash or Ctrl-C skips every line already written. Repeated questions (same
+normalized text and options, in any order) are solved once.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANSWER_FIELDS = ("correct_option", "answer", "confidence", "reasoning", "models", "consensus")
+
+
+def mock_models_config(latency_ms: float) -> str:
+    """Write a models config with only the offline mock provider and return its path"""
+    mock = {"provider": "mock", "model_id": "mock", "latency_ms": latency_ms, "max_retries": 0, "retry_delay": 0.0}
+    config = {
+        "default_single": "mock",
+        "default_ensemble": ["mock", "mock-first"],
+        "extraction_model": "mock",
+        "models": {
+            "mock": {**mock, "model_name": "Local Mock", "answer_strategy": "hash"},
+            "mock-first": {**mock, "model_name": "Local Mock (first option)", "answer_strategy": "first"}
+        }
+    }
+    fd, path = tempfile.mkstemp(prefix="mock_models_", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return path
+
+
+def load_checkpoint(path: str, question_key) -> Tuple[Set[int], Dict[str, Dict[str, Any]]]:
+    """Input lines already written to the output, plus their answers by question key
+
+    A line cut short by a crash is dropped from the file so appending can resume.
+    """
+    done: Set[int] = set()
+    answers: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return done, answers
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for raw in data[:end].splitlines():
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            continue
+        done.add(record["line"])
+        answers[question_key(record["question"], record["options"])] = {field: record.get(field) for field in ANSWER_FIELDS}
+    return done, answers
+
+
+class Progress:
+    """Throughput over a sliding window and ETA, redrawn on one stderr line"""
+
+    def __init__(self, total: int, done: int, window: float = 30.0):
+        self.total = total
+        self.done = done
+        self.solved = self.reused = self.failed = 0
+        self.window = window
+        self.started = time.perf_counter()
+        self._completions: Deque[float] = collections.deque()
+        self._last_draw = 0.0
+
+    def complete(self, outcome: str) -> None:
+        now = time.perf_counter()
+        setattr(self, outcome, getattr(self, outcome) + 1)
+        if outcome != "failed":
+            self.done += 1
+        self._completions.append(now)
+        while self._completions and self._completions[0] < now - self.window:
+            self._completions.popleft()
+        if now - self._last_draw >= 0.2:
+            self.draw()
+
+    @property
+    def rate(self) -> float:
+        elapsed = min(self.window, time.perf_counter() - self.started)
+        return len(self._completions) / elapsed if elapsed > 0 else 0.0
+
+    def draw(self, cost: float = None, end: str = "") -> None:
+        self._last_draw = time.perf_counter()
+        rate = self.rate
+        remaining = max(self.total - self.done - self.failed, 0)
+        eta = time.strftime("%H:%M:%S", time.gmtime(remaining / rate)) if rate > 0 else "--:--:--"
+        line = (
+            f"\r{self.done}/{self.total} done  {self.solved} solved  {self.reused} reused  {self.failed} failed  "
+            f"{rate:.1f} q/s  ETA {eta}"
+        )
+        if cost is not None:
+            line += f"  ${cost:.4f}"
+        sys.stderr.write(line + end)
+        sys.stderr.flush()
+
+
+async def solve_bank(args) -> int:
+    # App modules read their configuration on import, after --mock has set it
+    from app.services.ai_service import AIService
+    from app.services.answer_key import match_option, question_key, read_entries
+    from app.services.usage import start_usage_tracking
+
+    ai_service = AIService()
+    models = ai_service.resolve_models(args.models, args.multi)
+    done, answers = load_checkpoint(args.output, question_key)
+    total = sum(1 for _ in read_entries(args.input))
+    progress = Progress(total, len(done))
+    usage = start_usage_tracking(url=f"file://{os.path.abspath(args.input)}", client_id="solve_bank")
+    print(f"{total} questions, {len(done)} already solved, models: {', '.join(models)}", file=sys.stderr)
+
+    pending: Dict[str, asyncio.Future] = {}
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    output = open(args.output, "a", encoding="utf-8")
+
+    async def solve(question: str, options: list) -> Optional[Dict[str, Any]]:
+        if len(models) > 1:
+            result = await ai_service.answer_mcq_multi_model(question, options, models, fast=args.fast)
+        else:
+            result = await ai_service.answer_mcq_single_model(question, options, models[0], fast=args.fast)
+            result["consensus"] = True
+        if result.get("correct_option", -1) < 0:
+            return None
+        return {
+            "correct_option": result["correct_option"],
+            "answer": options[result["correct_option"]],
+            "confidence": result.get("confidence", 0),
+            "reasoning": result.get("reasoning", ""),
+            "models": [response["model"] for response in result.get("model_responses") or []] or models,
+            "consensus": result.get("consensus", False)
+        }
+
+    async def answer(key: str, question: str, options: list) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """(answer, reused) for a question, solving each distinct question once"""
+        known = answers.get(key)
+        # Join the duplicate being solved; after a failure the first waiter retries and the rest join it
+        while known is None and key in pending:
+            known = await pending[key]
+        if known is not None:
+            index = match_option(known["answer"], options)
+            if index is not None:
+                return {**known, "correct_option": index, "answer": options[index]}, True
+        future = pending[key] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await solve(question, options)
+        finally:
+            # Duplicates waiting on a failed question go on to solve it themselves
+            future.set_result(result)
+            if pending.get(key) is future:
+                del pending[key]
+        if result is not None:
+            answers[key] = result
+        return result, False
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            line, entry = item
+            question, options = entry["question"], entry["options"]
+            try:
+                result, reused = await answer(question_key(question, options), question, options)
+            except Exception as e:
+                logging.getLogger("solve_bank").warning("Question failed", extra={"line": line, "error": str(e)})
+                result, reused = None, False
+            if result is None:
+                progress.complete("failed")
+                continue
+            record = {"line": line, "id": entry.get("id"), "question": question, "options": options, **result}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            progress.complete("reused" if reused else "solved")
+
+    async def feed():
+        for line, entry in enumerate(read_entries(args.input), 1):
+            if line in done:
+                continue
+            if not entry.get("question") or not isinstance(entry.get("options"), list) or len(entry["options"]) < 2:
+                progress.complete("failed")
+                continue
+            await queue.put((line, entry))
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    try:
+        await asyncio.gather(feed(), *(worker() for _ in range(args.concurrency)))
+    finally:
+        output.close()
+        progress.draw(cost=usage.totals["cost_usd"], end="\n")
+        print(
+            f"{usage.totals['calls']} provider calls, {usage.totals['total_tokens']} tokens, "
+            f"est. ${usage.totals['cost_usd']:.4f}; results in {args.output}",
+            file=sys.stderr
+        )
+    if progress.failed:
+        print(f"{progress.failed} questions failed or were invalid; rerun to retry them", file=sys.stderr)
+    return 1 if progress.failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Question bank (.jsonl or .csv)")
+    parser.add_argument("output", help="Results file (.jsonl), appended to and resumed from")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions solved at once (default: 8)")
+    parser.add_argument("--multi", action="store_true", help="Use the default ensemble instead of the single default model")
+    parser.add_argument("--models", nargs="+", help="Model keys to use; more than one runs the consensus flow")
+    parser.add_argument("--fast", action="store_true", help="Answers and confidence only, no reasoning")
+    parser.add_argument("--mock", action="store_true", help="Use the offline mock provider (no API keys or cost)")
+    parser.add_argument("--mock-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    mock_config = None
+    if args.mock:
+        mock_config = os.environ["MODELS_CONFIG"] = mock_models_config(args.mock_latency_ms)
+        # Mock answers are not worth reviewing
+        os.environ["ANSWER_KEY_RECORD"] = "false"
+    logging.basicConfig(level=logging.WARNING, format="\n%(levelname)s %(name)s: %(message)s")
+
+    try:
+        return asyncio.run(solve_bank(args))
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    except ValueError as e:
+        print(f"\nError: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if mock_config:
+            os.remove(mock_config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
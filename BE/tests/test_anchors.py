@@ -0,0 +1,91 @@
+"""Tests for mapping solved questions back to the page's DOM anchors.
+
+Run from BE/ with `python -m pytest tests`.
+"""
+
+from app.services.anchors import match_anchors
+
+
+def anchors(*texts):
+    return [{"id": f"a{i}", "text": text} for i, text in enumerate(texts)]
+
+
+def test_matches_questions_and_options_in_document_order():
+    page = anchors(
+        "Practice Quiz",
+        "1. What is 2 + 2?", "A. 3", "B. 4",
+        "2. What is 3 + 3?", "A. 6", "B. 7",
+    )
+    questions = [
+        {"question": "What is 2 + 2?", "options": ["3", "4"]},
+        {"question": "What is 3 + 3?", "options": ["6", "7"]},
+    ]
+    assert match_anchors(questions, page) == [
+        {"anchor": "a1", "option_anchors": ["a2", "a3"]},
+        {"anchor": "a4", "option_anchors": ["a5", "a6"]},
+    ]
+
+
+def test_identical_options_resolve_within_their_own_question():
+    # "Yes"/"No" appear under both questions; each must map to its own block
+    page = anchors("Is water wet?", "Yes", "No", "Is fire cold?", "Yes", "No")
+    questions = [
+        {"question": "Is water wet?", "options": ["Yes", "No"]},
+        {"question": "Is fire cold?", "options": ["Yes", "No"]},
+    ]
+    matches = match_anchors(questions, page)
+    assert [m["option_anchors"] for m in matches] == [["a1", "a2"], ["a4", "a5"]]
+
+
+def test_repeated_question_text_matches_the_next_occurrence():
+    page = anchors("Pick the prime number", "4", "5", "Pick the prime number", "9", "11")
+    questions = [
+        {"question": "Pick the prime number", "options": ["4", "5"]},
+        {"question": "Pick the prime number", "options": ["9", "11"]},
+    ]
+    assert [m["anchor"] for m in match_anchors(questions, page)] == ["a0", "a3"]
+
+
+def test_missing_question_searches_options_after_previous_match():
+    page = anchors("1. First question text here?", "Alpha", "Beta", "Gamma", "Delta")
+    questions = [
+        {"question": "First question text here?", "options": ["Alpha", "Beta"]},
+        {"question": "Not on the page at all?", "options": ["Gamma", "Delta"]},
+    ]
+    matches = match_anchors(questions, page)
+    assert matches[1] == {"anchor": None, "option_anchors": ["a3", "a4"]}
+
+
+def test_option_prefers_exact_block_over_longer_one():
+    page = anchors("Which is a colour?", "Red wine (correct)", "Red", "Blue")
+    questions = [{"question": "Which is a colour?", "options": ["Red", "Blue"]}]
+    assert match_anchors(questions, page)[0]["option_anchors"] == ["a2", "a3"]
+
+
+def test_option_tolerates_short_markers_but_not_long_blocks():
+    page = anchors(
+        "Which planet is largest?",
+        "Jupiter (correct)",
+        "Saturn is the planet with the most famous rings in the solar system",
+    )
+    questions = [{"question": "Which planet is largest?", "options": ["Jupiter", "Saturn"]}]
+    assert match_anchors(questions, page)[0]["option_anchors"] == ["a1", None]
+
+
+def test_one_anchor_is_never_used_for_two_options():
+    page = anchors("Which are even?", "2 and 4")
+    questions = [{"question": "Which are even?", "options": ["2 and 4", "2 and 4"]}]
+    assert match_anchors(questions, page)[0]["option_anchors"] == ["a1", None]
+
+
+def test_long_question_split_across_blocks_matches_by_prefix():
+    long_question = "Read the following statement carefully and decide which of the options below best describes it"
+    page = anchors(long_question[:60], "True", "False")
+    questions = [{"question": long_question, "options": ["True", "False"]}]
+    assert match_anchors(questions, page)[0] == {"anchor": "a0", "option_anchors": ["a1", "a2"]}
+
+
+def test_no_anchors_or_malformed_anchors():
+    questions = [{"question": "Q?", "options": ["a"]}]
+    assert match_anchors(questions, None) == []
+    assert match_anchors(questions, [{"id": "", "text": "Q?"}, {"text": "a"}, "junk"]) == []
@@ -0,0 +1,130 @@
+"""Tests for answer key normalization, answer resolution and the SQLite store.
+
+Run from BE/ with `python -m pytest tests`.
+"""
+
+import json
+
+import pytest
+
+from app.services.answer_key import (
+    AnswerKeyStore,
+    match_option,
+    normalize_option,
+    normalize_text,
+    question_key,
+    read_entries,
+    resolve_answer,
+)
+
+OPTIONS = ["Paris", "London", "Berlin", "Madrid"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AnswerKeyStore(str(tmp_path / "answer_key.db"))
+    yield store
+    store.close()
+
+
+def test_normalize_text_ignores_numbering_case_width_and_punctuation():
+    assert normalize_text("Q3. What is the  CAPITAL of France?") == "what is the capital of france"
+    assert normalize_text("3) what is the capital of france") == "what is the capital of france"
+    # Full-width characters fold to ASCII
+    assert normalize_text("ＷＨＡＴ is 2+2?") == "what is 2+2"
+
+
+def test_normalize_option_strips_labels_but_keeps_values():
+    assert normalize_option("B. London") == "london"
+    assert normalize_option("(c) Berlin") == "berlin"
+    assert normalize_option("$4.50") == "$4.50"
+    assert normalize_option("25%") == "25%"
+
+
+def test_question_key_ignores_option_order_and_labels():
+    shuffled = ["D. Madrid", "a) Paris", "Berlin", "London"]
+    assert question_key("1. Capital of France?", OPTIONS) == question_key("capital of france", shuffled)
+    assert question_key("Capital of France?", OPTIONS) != question_key("Capital of Spain?", OPTIONS)
+
+
+def test_match_option_finds_normalized_text_only():
+    assert match_option("  berlin ", OPTIONS) == 2
+    assert match_option("Rome", OPTIONS) is None
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("London", 1),
+    ("b", 1),
+    ("D", 3),
+    (0, 0),
+    ("2", 2),
+    ("E", None),
+    (7, None),
+    (True, None),
+    (None, None),
+])
+def test_resolve_answer_accepts_text_letters_and_indexes(answer, expected):
+    assert resolve_answer(answer, OPTIONS) == expected
+
+
+def test_resolve_answer_prefers_option_text_over_index():
+    assert resolve_answer("4", ["2", "3", "4", "5"]) == 2
+
+
+def test_lookup_maps_stored_answer_to_presented_order(store):
+    imported, skipped = store.import_entries([{"question": "Capital of France?", "options": OPTIONS, "answer": "A"}])
+    assert (imported, skipped) == (1, 0)
+
+    entry = store.lookup("1. capital of france", ["Madrid", "Berlin", "Paris", "London"])
+    assert entry["correct_option"] == 2
+    assert entry["source"] == "import"
+    assert store.lookup("Capital of Spain?", OPTIONS) is None
+
+
+def test_lookup_misses_when_options_differ(store):
+    store.import_entries([{"question": "Capital of France?", "options": OPTIONS, "answer": "Paris"}])
+    assert store.lookup("Capital of France?", ["Paris", "London", "Berlin", "Rome"]) is None
+
+
+def test_import_skips_entries_without_a_resolvable_answer(store):
+    entries = [
+        {"question": "Capital of France?", "options": OPTIONS, "answer": "Rome"},
+        {"question": "", "options": OPTIONS, "answer": "A"},
+        {"question": "No options", "options": [], "answer": "A"},
+        {"question": "Capital of Germany?", "options": OPTIONS, "correct_option": 2},
+    ]
+    assert store.import_entries(entries, batch_size=1) == (1, 3)
+    assert store.count() == 1
+
+
+def test_candidates_skip_verified_questions_and_promote(store):
+    store.import_entries([{"question": "Capital of France?", "options": OPTIONS, "answer": "Paris"}])
+    store.record_candidate("Capital of France?", OPTIONS, 1, 90, ["mock"], True)
+    store.record_candidate("Capital of Spain?", OPTIONS, 3, 95, ["mock"], True)
+    store.record_candidate("Capital of Spain?", OPTIONS, 3, 95, ["mock"], True)
+
+    candidates = list(store.export_candidates())
+    assert [(c["question"], c["answer"], c["seen"]) for c in candidates] == [("Capital of Spain?", "Madrid", 2)]
+
+    assert store.promote(candidates) == (1, 0)
+    assert list(store.export_candidates()) == []
+    assert store.lookup("Capital of Spain?", OPTIONS)["correct_option"] == 3
+
+
+def test_read_entries_parses_csv_option_columns(tmp_path):
+    path = tmp_path / "key.csv"
+    path.write_text("Question,Option_A,Option_B,Answer\nCapital of France?,Paris,London,A\n", encoding="utf-8")
+    assert list(read_entries(str(path))) == [{
+        "question": "Capital of France?", "options": ["Paris", "London"], "answer": "A",
+        "explanation": None, "source": None
+    }]
+
+
+def test_read_entries_parses_csv_options_column_and_jsonl(tmp_path):
+    csv_path = tmp_path / "key.csv"
+    csv_path.write_text('question,options,answer\nQ?,Paris|London,London\n', encoding="utf-8")
+    assert next(read_entries(str(csv_path)))["options"] == ["Paris", "London"]
+
+    jsonl_path = tmp_path / "key.jsonl"
+    jsonl_path.write_text(json.dumps({"question": "Q?", "options": ["a", "b"], "answer": 1}) + "\n\n", encoding="utf-8")
+    assert list(read_entries(str(jsonl_path))) == [{"question": "Q?", "options": ["a", "b"], "answer": 1}]
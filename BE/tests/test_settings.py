@@ -0,0 +1,169 @@
+"""Tests for runtime settings and the resizable request limiter.
+
+Run from BE/ with `python -m pytest tests`.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.models.schemas import RuntimeSettingsUpdate
+from app.services import providers
+from app.services.settings import (
+    ResizableSemaphore,
+    _validated_snapshot,
+    default_settings,
+    merge_settings,
+)
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """Default settings for a models config with two mock models, one disabled"""
+    config = {
+        "default_single": "mock",
+        "default_ensemble": ["mock"],
+        "extraction_model": "mock",
+        "models": {
+            "mock": {"provider": "mock", "model_id": "mock", "temperature": 0.1, "max_retries": 0},
+            "spare": {"provider": "mock", "model_id": "mock", "enabled": False}
+        }
+    }
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    monkeypatch.setenv("MODELS_CONFIG", str(path))
+    monkeypatch.setattr(providers, "_model_registry", None)
+    return default_settings()
+
+
+def update(**changes) -> RuntimeSettingsUpdate:
+    return RuntimeSettingsUpdate(**changes)
+
+
+def test_semaphore_queues_beyond_limit_and_admits_on_release():
+    async def scenario():
+        limiter = ResizableSemaphore(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.snapshot() == {"limit": 1, "active": 1, "waiting": 1}
+
+        limiter.release()
+        await waiter
+        assert limiter.snapshot() == {"limit": 1, "active": 1, "waiting": 0}
+
+    asyncio.run(scenario())
+
+
+def test_semaphore_resize_admits_waiters_and_drains_holders():
+    async def scenario():
+        limiter = ResizableSemaphore(1)
+        await limiter.acquire()
+        waiters = [asyncio.create_task(limiter.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        limiter.set_limit(3)
+        await asyncio.gather(*waiters)
+        assert limiter.active == 3
+
+        limiter.set_limit(1)
+        limiter.release()
+        late = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not late.done()
+        limiter.release()
+        limiter.release()
+        await late
+        assert limiter.active == 1
+
+    asyncio.run(scenario())
+
+
+def test_semaphore_cancelled_waiter_popped_by_release_raises_cancelled():
+    async def scenario():
+        limiter = ResizableSemaphore(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        # The waiter is cancelled, then popped by release() before it can clean up
+        waiter.cancel()
+        limiter.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.snapshot() == {"limit": 1, "active": 0, "waiting": 0}
+
+    asyncio.run(scenario())
+
+
+def test_semaphore_cancelled_waiter_leaves_queue():
+    async def scenario():
+        limiter = ResizableSemaphore(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.snapshot() == {"limit": 1, "active": 1, "waiting": 0}
+
+    asyncio.run(scenario())
+
+
+def test_defaults_come_from_the_models_config(settings):
+    assert settings.models["mock"].temperature == 0.1
+    assert settings.models["mock"].max_retries == 0
+    assert not settings.models["spare"].enabled
+    snapshot = _validated_snapshot(settings)
+    assert list(snapshot.models) == ["mock"]
+
+
+def test_merge_keeps_omitted_fields_and_merges_model_fields(settings):
+    merged = merge_settings(settings, update(request_timeout=60, models={"mock": {"max_retries": 2}}))
+    assert merged.request_timeout == 60
+    assert merged.max_concurrent_requests == settings.max_concurrent_requests
+    assert merged.models["mock"].max_retries == 2
+    assert merged.models["mock"].temperature == 0.1
+
+
+def test_merge_updates_dict_fields_key_by_key(settings):
+    merged = merge_settings(settings, update(task_temperatures={"answer": None}))
+    assert merged.task_temperatures["answer"] is None
+    assert merged.task_temperatures["extract"] == settings.task_temperatures["extract"]
+
+
+def test_merge_rejects_unknown_models_and_fields(settings):
+    with pytest.raises(ValueError, match="Unknown model: ghost"):
+        merge_settings(settings, update(models={"ghost": {"enabled": True}}))
+    with pytest.raises(ValueError, match="temprature"):
+        merge_settings(settings, update(models={"mock": {"temprature": 1}}))
+    with pytest.raises(ValueError, match="max_concurrent_requests"):
+        merge_settings(settings, update(max_concurrent_requests=0))
+
+
+def test_validation_rejects_broken_references(settings):
+    with pytest.raises(ValueError, match="At least one model"):
+        _validated_snapshot(merge_settings(settings, update(models={"mock": {"enabled": False}})))
+    with pytest.raises(ValueError, match="default_single 'spare'"):
+        _validated_snapshot(merge_settings(settings, update(default_single="spare")))
+    with pytest.raises(ValueError, match="default_ensemble"):
+        _validated_snapshot(merge_settings(settings, update(default_ensemble=[])))
+    with pytest.raises(ValueError, match="Unknown providers: openai"):
+        _validated_snapshot(merge_settings(settings, update(provider_rate_limits={"openai": 60})))
+    with pytest.raises(ValueError, match="Unknown tasks"):
+        _validated_snapshot(merge_settings(settings, update(task_temperatures={"summarize": 0.5})))
+    with pytest.raises(ValueError, match="between 0 and 2"):
+        _validated_snapshot(merge_settings(settings, update(task_temperatures={"answer": 5})))
+
+
+def test_enabling_a_model_makes_it_usable(settings):
+    merged = merge_settings(settings, update(models={"spare": {"enabled": True}}, default_ensemble=["mock", "spare"]))
+    snapshot = _validated_snapshot(merged)
+    assert list(snapshot.models) == ["mock", "spare"]
+
+
+def test_null_model_temperature_defers_to_the_task(settings):
+    snapshot = _validated_snapshot(merge_settings(settings, update(models={"mock": {"temperature": None}})))
+    assert snapshot.models["mock"]["temperature"] is None
@@ -0,0 +1,151 @@
+"""Tests for the shared state backends and single_flight.
+
+Run from BE/ with `python -m pytest tests`. The Redis tests use fakeredis
+(with lupa for the Lua scripts) as a local stand-in for a Redis server.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.services import shared_state
+from app.services.shared_state import (
+    MemoryStateBackend,
+    RedisStateBackend,
+    SQLiteStateBackend,
+    single_flight,
+)
+
+
+@pytest.fixture
+def redis_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    backend = RedisStateBackend("redis://localhost:6379/0")
+    backend._client = fakeredis.aioredis.FakeRedis()
+    return backend
+
+
+@pytest.fixture
+def memory_state(monkeypatch):
+    backend = MemoryStateBackend()
+    monkeypatch.setattr(shared_state, "_state_backend", backend)
+    return backend
+
+
+def test_redis_lock_is_exclusive_and_released_by_owner_only(redis_backend):
+    async def scenario():
+        token = await redis_backend.acquire_lock("page", 10)
+        assert token is not None
+        assert await redis_backend.acquire_lock("page", 10) is None
+
+        await redis_backend.release_lock("page", "not-the-owner")
+        assert await redis_backend.acquire_lock("page", 10) is None
+
+        await redis_backend.release_lock("page", token)
+        assert await redis_backend.acquire_lock("page", 10) is not None
+
+    asyncio.run(scenario())
+
+
+def test_redis_take_token_refills_at_rate(redis_backend):
+    async def scenario():
+        assert await redis_backend.take_token("openai", rate=1, capacity=2) == 0
+        assert await redis_backend.take_token("openai", rate=1, capacity=2) == 0
+        wait = await redis_backend.take_token("openai", rate=1, capacity=2)
+        assert 0 < wait <= 1
+
+        await asyncio.sleep(wait + 0.05)
+        assert await redis_backend.take_token("openai", rate=1, capacity=2) == 0
+
+    asyncio.run(scenario())
+
+
+def test_redis_incr_accumulates_and_expires(redis_backend):
+    async def scenario():
+        assert await redis_backend.incr("calls") == 1
+        assert await redis_backend.incr("calls", 2.5) == 3.5
+
+        await redis_backend.incr("recent", ttl=0.1)
+        await asyncio.sleep(0.2)
+        assert await redis_backend.incr("recent") == 1
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_evicts_oldest_beyond_cap():
+    async def scenario():
+        backend = MemoryStateBackend(max_entries=2)
+        for key in ("a", "b", "c"):
+            await backend.set(key, key.encode(), ttl=60)
+        assert await backend.get("a") is None
+        assert await backend.get("c") == b"c"
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_sweeps_expired_entries_on_write(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(shared_state, "EXPIRY_SWEEP_INTERVAL", 0)
+        backend = MemoryStateBackend()
+        await backend.set("old", b"x", ttl=0.05)
+        await asyncio.sleep(0.1)
+        await backend.set("new", b"y", ttl=60)
+        assert "old" not in backend._values
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_backend_sweeps_expired_rows(tmp_path, monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(shared_state, "EXPIRY_SWEEP_INTERVAL", 0)
+        backend = SQLiteStateBackend(str(tmp_path / "state.db"))
+        await backend.set("old", b"x", ttl=0.05)
+        await backend.acquire_lock("stale", 0.05)
+        await asyncio.sleep(0.1)
+        await backend.set("new", b"y", ttl=60)
+
+        assert backend._conn.execute("SELECT key FROM kv").fetchall() == [("new",)]
+        assert backend._conn.execute("SELECT name FROM locks").fetchall() == []
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_hands_uncached_result_to_waiters(memory_state):
+    calls = []
+
+    async def producer():
+        calls.append(time.time())
+        await asyncio.sleep(0.2)
+        return b"failed"
+
+    async def scenario():
+        return await asyncio.gather(*(
+            single_flight("page", producer, ttl=60, lock_ttl=10, cache_if=lambda _: False)
+            for _ in range(3)
+        ))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [value for value, _ in results] == [b"failed"] * 3
+    assert memory_state._live_value("page") is None
+
+
+def test_single_flight_does_not_hand_uncached_result_to_later_callers(memory_state):
+    calls = []
+
+    async def producer():
+        calls.append(time.time())
+        return b"failed"
+
+    async def scenario():
+        first = await single_flight("page", producer, ttl=60, lock_ttl=10, cache_if=lambda _: False)
+        second = await single_flight("page", producer, ttl=60, lock_ttl=10, cache_if=lambda _: False)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == (b"failed", False)
+    assert second == (b"failed", False)
+    assert len(calls) == 2
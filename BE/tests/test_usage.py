@@ -0,0 +1,104 @@
+"""Tests for per-request usage tracking, usage metrics and cost estimates.
+
+Run from BE/ with `python -m pytest tests`.
+"""
+
+import asyncio
+import contextvars
+
+import pytest
+
+from app.services import usage
+from app.services.providers import MockProvider
+from app.services.usage import UsageMetrics, UsageTracker, record_usage, start_usage_tracking
+
+PRICED_MODEL = {"input_cost_per_1m": 2.0, "cached_input_cost_per_1m": 0.5, "output_cost_per_1m": 8.0}
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = UsageMetrics()
+    monkeypatch.setattr(usage, "usage_metrics", metrics)
+    return metrics
+
+
+def test_cost_prices_cached_prompt_tokens_separately():
+    adapter = MockProvider()
+    # 1M prompt tokens of which 400k cached, plus 100k completion tokens
+    cost = adapter.cost(PRICED_MODEL, 1_000_000, 100_000, cached_tokens=400_000)
+    assert cost == pytest.approx(600_000 * 2.0 / 1e6 + 400_000 * 0.5 / 1e6 + 100_000 * 8.0 / 1e6)
+
+
+def test_cost_without_cached_price_uses_the_input_price():
+    adapter = MockProvider()
+    config = {"input_cost_per_1m": 2.0, "output_cost_per_1m": 8.0}
+    assert adapter.cost(config, 1000, 0, cached_tokens=500) == pytest.approx(1000 * 2.0 / 1e6)
+    assert adapter.cost({}, 1000, 1000) == 0.0
+
+
+def test_tracker_totals_and_per_model_breakdown():
+    tracker = UsageTracker()
+    tracker.record("a", {"prompt_tokens": 100, "completion_tokens": 20, "thinking_tokens": 5, "cached_tokens": 40}, 0.001)
+    tracker.record("a", {"prompt_tokens": 50, "completion_tokens": 10}, 0.0005)
+    tracker.record("b", {"prompt_tokens": 10}, 0.0)
+
+    summary = tracker.summary()
+    assert summary["calls"] == 3
+    assert summary["prompt_tokens"] == 160
+    assert summary["cached_tokens"] == 40
+    # Cached tokens are part of the prompt tokens, not counted again
+    assert summary["total_tokens"] == 160 + 30 + 5
+    assert summary["per_model"]["a"]["calls"] == 2
+    assert summary["per_model"]["b"]["total_tokens"] == 10
+
+
+def test_summary_rounds_cost_to_micro_dollars_without_drifting():
+    tracker = UsageTracker()
+    for _ in range(10):
+        tracker.record("a", {"prompt_tokens": 1}, 0.0000001234)
+    summary = tracker.summary()
+    assert summary["cost_usd"] == 0.000001
+    assert summary["per_model"]["a"]["cost_usd"] == 0.000001
+    # Rounding is applied to the reported total only; the running sum keeps full precision
+    assert tracker.totals["cost_usd"] == pytest.approx(0.000001234)
+
+
+def test_record_usage_attributes_calls_to_the_current_request_and_host(metrics):
+    async def request(url: str, tokens: int) -> UsageTracker:
+        tracker = start_usage_tracking(url=url)
+        # Work spawned by the request, in tasks or threads, inherits its tracker
+        await asyncio.gather(*(
+            asyncio.to_thread(record_usage, "mock", {"prompt_tokens": tokens}, 0.0)
+            for _ in range(2)
+        ))
+        return tracker
+
+    async def scenario():
+        return await asyncio.gather(
+            asyncio.create_task(request("https://quiz.example.com/a", 10)),
+            asyncio.create_task(request("https://other.example.org/b", 7))
+        )
+
+    first, second = asyncio.run(scenario())
+    assert first.summary()["prompt_tokens"] == 20
+    assert second.summary()["prompt_tokens"] == 14
+    snapshot = metrics.snapshot()
+    assert snapshot["per_model"]["mock"]["calls"] == 4
+    assert snapshot["per_host"]["quiz.example.com"]["total_tokens"] == 20
+    assert snapshot["per_host"]["other.example.org"]["total_tokens"] == 14
+
+
+def test_record_usage_outside_a_request_counts_as_unknown_host(metrics):
+    contextvars.Context().run(record_usage, "mock", {"prompt_tokens": 3}, 0.0)
+    assert metrics.snapshot()["per_host"]["unknown"]["calls"] == 1
+
+
+def test_prometheus_export_lists_every_series(metrics):
+    metrics.record("mock", "quiz.example.com", {"prompt_tokens": 10, "completion_tokens": 2, "cached_tokens": 4}, 0.0123456789)
+    text = metrics.prometheus()
+    assert 'quiz_solver_model_calls_total{model="mock"} 1' in text
+    assert 'quiz_solver_tokens_total{model="mock",kind="prompt"} 10' in text
+    assert 'quiz_solver_tokens_total{model="mock",kind="cached"} 4' in text
+    assert 'quiz_solver_cost_usd_total{model="mock"} 0.012346' in text
+    assert 'quiz_solver_host_tokens_total{host="quiz.example.com"} 12' in text
+    assert text.endswith("\n")
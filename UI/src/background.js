@@ -1,6 +1,12 @@
 // Chrome Extension Service Worker for AI Quiz Solver
+import { RequestManager } from './utils/requestManager';
+import { getCachedResult, pageFingerprint, sameOptions, storeResult } from './utils/resultCache';
+
 console.log('🚀 AI Quiz Solver background script loaded');
 
+const BACKEND_URL = 'http://localhost:8000';
+const requests = new RequestManager();
+
 // Handle extension icon click
 chrome.action.onClicked.addListener(async (tab) => {
   console.log('🎯 Extension icon clicked, tab:', tab.id);
@@ -12,9 +18,14 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
   console.log('📨 Received message:', request.action);
   
   if (request.action === 'detectMCQs') {
-    handleDetectMCQs(request, sendResponse);
+    handleDetectMCQs(request, sender, sendResponse);
     return true; // Keep message channel open for async response
   }
+
+  if (request.action === 'getCachedResults') {
+    handleGetCachedResults(request, sender, sendResponse);
+    return true;
+  }
   
   if (request.action === 'closeWindow') {
     // Handle popup close request
@@ -396,6 +407,19 @@ function createOverlayPopup() {
   // Setup event listeners and draggable functionality
   setupOverlayFeatures();
   console.log('✅ Overlay setup complete');
+  restoreCachedResults();
+
+  // One listener per page, whichever overlay instance is showing
+  if (!window.__aiQuizOverlayListening) {
+    window.__aiQuizOverlayListening = true;
+    chrome.runtime.onMessage.addListener((message) => {
+      const current = document.getElementById(OVERLAY_ID);
+      if (message.action === 'resultsUpdated' && message.data && current?.dataset.fingerprint === message.fingerprint) {
+        current.refreshResults?.(message.data, message.fingerprint);
+      }
+    });
+  }
+  overlay.refreshResults = showResults;
 
   function setupOverlayFeatures() {
     console.log('🎧 Setting up overlay features...');
@@ -410,6 +434,8 @@ function createOverlayPopup() {
       });
     }
     
+    const container = document.getElementById('ai-quiz-solver-overlay');
+
     // Prevent closing when clicking inside the overlay
     if (container) {
       container.addEventListener('mousedown', (e) => {
@@ -423,7 +449,6 @@ function createOverlayPopup() {
     
     // Make draggable
     const titleBar = document.getElementById('ai-quiz-title-bar');
-    const container = document.getElementById('ai-quiz-solver-overlay');
     
     if (titleBar && container) {
       let isDragging = false;
@@ -522,21 +547,12 @@ function createOverlayPopup() {
         buttonText.innerHTML = '<span class="spinner"></span> Detecting MCQs...';
         
         try {
-          const content = document.body.innerText;
-          const layout = {
-            html: document.documentElement.outerHTML,
-            title: document.title,
-            url: window.location.href
-          };
-          
           console.log('📤 Sending message to background script...');
           
+          // The background script extracts the page through the content script
           const response = await new Promise((resolve, reject) => {
             chrome.runtime.sendMessage({
               action: 'detectMCQs',
-              content: content,
-              layout: layout,
-              url: window.location.href,
               useMultiModel: useMultiModel
             }, (response) => {
               console.log('📥 Received response from background:', response);
@@ -549,12 +565,16 @@ function createOverlayPopup() {
             });
           });
 
+          if (response?.superseded) {
+            console.log('✋ Detection superseded by a newer one');
+            return;
+          }
           if (!response || !response.success) {
             throw new Error(response?.error || 'Failed to communicate with extension background');
           }
 
-          console.log('✅ Showing results...');
-          showResults(response.data);
+          console.log('✅ Showing results...', { cached: response.cached, stale: response.stale });
+          showResults(response.data, response.fingerprint);
           
         } catch (error) {
           console.error('❌ Error detecting MCQs:', error);
@@ -567,7 +587,18 @@ function createOverlayPopup() {
     }
   }
 
-  function showResults(data) {
+  // Show the last results for this page right away; the background script
+  // revalidates stale ones and sends the fresh results when they arrive
+  function restoreCachedResults() {
+    chrome.runtime.sendMessage({ action: 'getCachedResults' }, (response) => {
+      if (chrome.runtime.lastError || !response?.data) return;
+      console.log('📦 Showing cached results', { stale: response.stale });
+      showResults(response.data, response.fingerprint);
+    });
+  }
+
+  function showResults(data, fingerprint) {
+    overlay.dataset.fingerprint = fingerprint || '';
     const content = document.getElementById('ai-quiz-content');
     const results = document.getElementById('ai-quiz-results');
     
@@ -595,44 +626,134 @@ function createOverlayPopup() {
   }
 }
 
-async function handleDetectMCQs(request, sendResponse) {
+// The page to solve: sent by the popup, or extracted here for the overlay
+async function pageFromRequest(request, sender) {
+  if (request.content != null) {
+    return { content: request.content, layout: request.layout, url: request.url };
+  }
+  const page = await chrome.tabs.sendMessage(sender.tab.id, { action: 'extractContent' }, { frameId: 0 });
+  if (!page || page.error) {
+    throw new Error(page?.error || 'Could not read the page');
+  }
+  return { content: page.content, layout: page.layout, url: sender.tab.url };
+}
+
+// One request per tab at a time; tabs on the same page share it
+function fetchDetection(fingerprint, page, options, owner) {
+  console.log('🌐 Making request to:', `${BACKEND_URL}/api/detect-mcqs`);
+  const key = `${fingerprint}:${options.useMultiModel ? 'multi' : 'single'}:${options.fastMode ? 'fast' : 'full'}`;
+  return requests.request(key, owner, `${BACKEND_URL}/api/detect-mcqs`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({
+      content: page.content,
+      layout: page.layout,
+      url: page.url,
+      useMultiModel: options.useMultiModel,
+      fastMode: options.fastMode
+    })
+  });
+}
+
+// The tab a request is for: the overlay's own tab, or the one the popup names
+const requestOwner = (request, sender) => request.tabId ?? sender.tab?.id ?? 'popup';
+
+// Stale-while-revalidate: the cached results have already been shown, fetch
+// fresh ones once per page and pass them to whoever is showing that page
+const revalidating = new Map();
+
+function revalidate(fingerprint, page, options, sender) {
+  if (revalidating.has(fingerprint)) return;
+  console.log('🔄 Revalidating cached results:', fingerprint.slice(0, 12));
+
+  const task = fetchDetection(fingerprint, page, options, `revalidate:${fingerprint}`)
+    .then(async (data) => {
+      await storeResult(fingerprint, { url: page.url, options, data });
+      return { data };
+    })
+    .catch((error) => {
+      console.error('❌ Revalidation failed:', error);
+      return { error: error.message };
+    })
+    .then((result) => {
+      revalidating.delete(fingerprint);
+      const message = { action: 'resultsUpdated', fingerprint, ...result };
+      // Nobody may be listening any more; the cache is updated either way
+      chrome.runtime.sendMessage(message).catch(() => {});
+      if (sender.tab) {
+        chrome.tabs.sendMessage(sender.tab.id, message).catch(() => {});
+      }
+    });
+  revalidating.set(fingerprint, task);
+}
+
+async function handleDetectMCQs(request, sender, sendResponse) {
   try {
     console.log('🔍 Processing detectMCQs request');
-    
-    const backendUrl = 'http://localhost:8000';
-    const endpoint = request.useMultiModel ? '/detect-multi-model' : '/detect';
-    
-    console.log('🌐 Making request to:', `${backendUrl}${endpoint}`);
-    
-    const response = await fetch(`${backendUrl}${endpoint}`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        content: request.content,
-        layout: request.layout,
-        url: request.url
-      })
-    });
+    const page = await pageFromRequest(request, sender);
+    const options = { useMultiModel: !!request.useMultiModel, fastMode: !!request.fastMode };
+    const fingerprint = await pageFingerprint(page.url, page.content);
 
-    if (!response.ok) {
-      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    const cached = await getCachedResult(fingerprint);
+    if (cached && sameOptions(cached.options, options)) {
+      console.log('📦 Cached results', { ageMs: cached.age, stale: cached.stale });
+      sendResponse({ success: true, data: cached.data, fingerprint, cached: true, stale: cached.stale, storedAt: cached.storedAt });
+      if (cached.stale) {
+        revalidate(fingerprint, page, options, sender);
+      }
+      return;
     }
 
-    const data = await response.json();
+    const data = await fetchDetection(fingerprint, page, options, requestOwner(request, sender));
     console.log('✅ Backend response received:', data);
-    
+    await storeResult(fingerprint, { url: page.url, options, data });
     sendResponse({
       success: true,
-      data: data
+      data: data,
+      fingerprint,
+      cached: false
     });
     
   } catch (error) {
-    console.error('❌ Error in handleDetectMCQs:', error);
+    if (error.reason === 'superseded') {
+      console.log('✋ Detection superseded by a newer one from the same tab');
+    } else {
+      console.error('❌ Error in handleDetectMCQs:', error);
+    }
     sendResponse({
       success: false,
+      superseded: error.reason === 'superseded',
       error: error.message
     });
   }
-}
\ No newline at end of file
+}
+
+// Last results for the page as it is now, whatever mode they were solved in
+async function handleGetCachedResults(request, sender, sendResponse) {
+  try {
+    const page = await pageFromRequest(request, sender);
+    const fingerprint = await pageFingerprint(page.url, page.content);
+    const cached = await getCachedResult(fingerprint);
+    if (!cached) {
+      sendResponse({ success: true, data: null, fingerprint });
+      return;
+    }
+    sendResponse({
+      success: true,
+      data: cached.data,
+      fingerprint,
+      options: cached.options,
+      cached: true,
+      stale: cached.stale,
+      storedAt: cached.storedAt
+    });
+    if (cached.stale) {
+      revalidate(fingerprint, page, cached.options, sender);
+    }
+  } catch (error) {
+    console.error('❌ Error in handleGetCachedResults:', error);
+    sendResponse({ success: false, error: error.message });
+  }
+}
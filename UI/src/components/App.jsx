@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import MainPage from '../pages/MainPage';
 import ResultsPage from '../pages/ResultsPage';
 import FloatingWindow from './FloatingWindow';
@@ -7,6 +7,14 @@ const App = () => {
   const [currentPage, setCurrentPage] = useState('main');
   const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(false);
+  // Where the results came from: { cached, storedAt, refreshing } for cached ones
+  const [cacheStatus, setCacheStatus] = useState(null);
+  // Explanations fetched on demand, keyed by question text
+  const explanationCache = useRef(new Map());
+  // Fingerprint of the page the results belong to
+  const fingerprintRef = useRef(null);
+  // Set once the user starts a detection, so a late cache restore cannot overwrite it
+  const userActed = useRef(false);
 
   // Helper function to get active tab from normal browser windows (excluding popup)
   const getActiveTab = async () => {
@@ -36,48 +44,105 @@ const App = () => {
     return activeTab;
   };
 
-  const handleDetectMCQs = async (useMultiModel) => {
-    console.log('🔍 Starting MCQ detection...', { useMultiModel });
+  // Message the top frame's content script, injecting it first into tabs that
+  // were open before the extension was installed
+  const sendToPage = async (tabId, message) => {
+    try {
+      return await chrome.tabs.sendMessage(tabId, message, { frameId: 0 });
+    } catch (error) {
+      console.log('💉 Content script not available, injecting it:', error.message);
+      await chrome.scripting.executeScript({
+        target: { tabId },
+        files: ['content.js']
+      });
+      return chrome.tabs.sendMessage(tabId, message, { frameId: 0 });
+    }
+  };
+
+  const showCachedOrFresh = (response) => {
+    fingerprintRef.current = response.fingerprint;
+    setResults(response.data);
+    setCacheStatus(response.cached ? { cached: true, storedAt: response.storedAt, refreshing: response.stale } : null);
+    setCurrentPage('results');
+  };
+
+  // On open, show the last results for this page while they are revalidated
+  useEffect(() => {
+    const restoreCachedResults = async () => {
+      try {
+        const activeTab = await getActiveTab();
+        const pageContent = await sendToPage(activeTab.id, { action: 'extractContent' });
+        if (pageContent.error) return;
+        const response = await chrome.runtime.sendMessage({
+          action: 'getCachedResults',
+          content: pageContent.content,
+          layout: pageContent.layout,
+          url: activeTab.url
+        });
+        if (response?.data && !userActed.current) {
+          console.log('📦 Showing cached results', { stale: response.stale });
+          showCachedOrFresh(response);
+        }
+      } catch (error) {
+        // Pages the content script cannot run on have nothing cached
+        console.log('📦 No cached results:', error.message);
+      }
+    };
+
+    const onMessage = (message) => {
+      if (message.action !== 'resultsUpdated' || message.fingerprint !== fingerprintRef.current) return;
+      if (message.data) {
+        console.log('🔄 Cached results revalidated');
+        setResults(message.data);
+        setCacheStatus(null);
+      } else {
+        setCacheStatus((status) => status && { ...status, refreshing: false });
+      }
+    };
+
+    chrome.runtime.onMessage.addListener(onMessage);
+    restoreCachedResults();
+    return () => chrome.runtime.onMessage.removeListener(onMessage);
+  }, []);
+
+  const handleDetectMCQs = async (useMultiModel, fastMode = false) => {
+    console.log('🔍 Starting MCQ detection...', { useMultiModel, fastMode });
+    userActed.current = true;
     setLoading(true);
     try {
       // Get the active tab from the most recently focused normal window
       const activeTab = await getActiveTab();
       console.log('📄 Active tab:', activeTab);
       
-      // Inject content script and get page content
-      const result = await chrome.scripting.executeScript({
-        target: { tabId: activeTab.id },
-        function: extractPageContent
-      });
-
-      const pageContent = result[0].result;
+      // Ask the content script for the page text and its anchor index
+      const pageContent = await sendToPage(activeTab.id, { action: 'extractContent' });
+      if (pageContent.error) {
+        throw new Error(pageContent.error);
+      }
       console.log('📝 Extracted content length:', pageContent.content.length);
       
-      // Send to BE API
-      console.log('🚀 Sending request to BE...');
-      const response = await fetch('http://localhost:8000/api/detect-mcqs', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          content: pageContent.content,
-          layout: pageContent.layout,
-          url: activeTab.url,
-          useMultiModel
-        })
+      // The background script answers from its result cache or the BE
+      console.log('🚀 Sending request to background...');
+      const response = await chrome.runtime.sendMessage({
+        action: 'detectMCQs',
+        content: pageContent.content,
+        layout: pageContent.layout,
+        url: activeTab.url,
+        tabId: activeTab.id,
+        useMultiModel,
+        fastMode
       });
 
-      console.log('📡 Response status:', response.status);
-      
-      if (!response.ok) {
-        throw new Error(`API request failed: ${response.status}`);
+      if (response?.superseded) {
+        console.log('✋ Detection superseded by a newer one');
+        return;
+      }
+      if (!response || !response.success) {
+        throw new Error(response?.error || 'Failed to communicate with extension background');
       }
 
-      const data = await response.json();
-      console.log('✅ Received data:', data);
-      setResults(data);
-      setCurrentPage('results');
+      console.log('✅ Received data:', { cached: response.cached, stale: response.stale });
+      showCachedOrFresh(response);
     } catch (error) {
       console.error('❌ Error detecting MCQs:', error);
       alert(`Error detecting MCQs: ${error.message}. Please check the console for details.`);
@@ -89,13 +154,26 @@ const App = () => {
   const handleBack = () => {
     setCurrentPage('main');
     setResults(null);
+    setCacheStatus(null);
+    fingerprintRef.current = null;
   };
 
-  const handleHighlightAnswer = async (questionIndex, optionIndex) => {
-    console.log('🎯 Highlighting answer:', { questionIndex, optionIndex });
-    
-    // Check if optionIndex is valid
-    if (optionIndex === -1) {
+  // Highlight the answers of the given questions (all of them when omitted) in one pass
+  const handleHighlightAnswers = async (questionIndexes) => {
+    const indexes = questionIndexes || results.questions.map((_, index) => index);
+    console.log('🎯 Highlighting answers:', indexes);
+
+    const answers = indexes
+      .map((questionIndex) => ({ questionIndex, question: results.questions[questionIndex] }))
+      .filter(({ question }) => question.correct_option >= 0)
+      .map(({ questionIndex, question }) => ({
+        questionIndex,
+        optionIndex: question.correct_option,
+        questionAnchor: question.anchor,
+        optionAnchors: question.option_anchors
+      }));
+
+    if (answers.length === 0) {
       console.warn('⚠️ Cannot highlight answer: Invalid option index (-1)');
       alert('Cannot highlight answer: No valid answer was determined due to processing errors.');
       return;
@@ -104,19 +182,48 @@ const App = () => {
     try {
       // Get the active tab from normal windows (excluding popup)
       const activeTab = await getActiveTab();
-      
-      await chrome.scripting.executeScript({
-        target: { tabId: activeTab.id },
-        function: highlightCorrectOption,
-        args: [questionIndex, optionIndex]
-      });
-      console.log('✅ Answer highlighted successfully');
+      const result = await sendToPage(activeTab.id, { action: 'highlightAnswers', answers });
+      if (result.error) {
+        throw new Error(result.error);
+      }
+      console.log('✅ Answers highlighted:', result);
+      if (result.highlighted === 0) {
+        alert('Could not find the answer on the page. It may have changed since it was scanned.');
+      }
     } catch (error) {
       console.error('❌ Error highlighting answer:', error);
       alert(`Error highlighting answer: ${error.message}`);
     }
   };
 
+  const handleExplain = async (questionObj) => {
+    const cacheKey = JSON.stringify([questionObj.question, questionObj.options, questionObj.correct_option]);
+    if (explanationCache.current.has(cacheKey)) {
+      return explanationCache.current.get(cacheKey);
+    }
+
+    console.log('💡 Fetching explanation for:', questionObj.question.substring(0, 50) + '...');
+    const response = await fetch('http://localhost:8000/api/explain', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        question: questionObj.question,
+        options: questionObj.options,
+        correct_option: questionObj.correct_option >= 0 ? questionObj.correct_option : null
+      })
+    });
+
+    if (!response.ok) {
+      throw new Error(`API request failed: ${response.status}`);
+    }
+
+    const data = await response.json();
+    explanationCache.current.set(cacheKey, data.reasoning);
+    return data.reasoning;
+  };
+
   const handleGoogleSearch = (questionObj) => {
     console.log('🔍 Opening Google search for:', questionObj.question.substring(0, 50) + '...');
     
@@ -147,58 +254,15 @@ const App = () => {
       ) : (
         <ResultsPage 
           results={results}
+          cacheStatus={cacheStatus}
           onBack={handleBack}
-          onHighlightAnswer={handleHighlightAnswer}
+          onHighlightAnswers={handleHighlightAnswers}
           onGoogleSearch={handleGoogleSearch}
+          onExplain={handleExplain}
         />
       )}
     </FloatingWindow>
   );
 };
 
-// Function to be injected into the page
-function extractPageContent() {
-  const content = document.body.innerText;
-  const layout = {
-    html: document.documentElement.outerHTML,
-    title: document.title,
-    url: window.location.href
-  };
-  
-  return { content, layout };
-}
-
-// Function to highlight correct option on the page
-function highlightCorrectOption(questionIndex, optionIndex) {
-  // Check if optionIndex is valid
-  if (optionIndex === -1) {
-    console.warn('⚠️ Cannot highlight answer: Invalid option index (-1)');
-    return;
-  }
-  
-  // This is a simplified implementation
-  // In a real scenario, you'd need more sophisticated DOM traversal
-  const style = document.createElement('style');
-  style.innerHTML = `
-    .ai-quiz-highlight {
-      background-color: #90EE90 !important;
-      border: 2px solid #32CD32 !important;
-      box-shadow: 0 0 10px rgba(50, 205, 50, 0.5) !important;
-    }
-  `;
-  document.head.appendChild(style);
-  
-  // Simple heuristic to find and highlight options
-  // This would need to be more sophisticated based on actual quiz layouts
-  const allElements = document.querySelectorAll('*');
-  allElements.forEach(el => {
-    if (el.textContent && el.textContent.includes('Option') || 
-        el.textContent.match(/^[A-D][\.\)]/)) {
-      if (el.textContent.includes(String.fromCharCode(65 + optionIndex))) {
-        el.classList.add('ai-quiz-highlight');
-      }
-    }
-  });
-}
-
-export default App;
\ No newline at end of file
+export default App;
@@ -1,91 +1,179 @@
 // Content script that runs on all pages
-console.log('🔧 AI Quiz Solver content script loaded on:', window.location.href);
-
-// Listen for messages from popup
-chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
-  console.log('📨 Content script received message:', request);
-  
-  if (request.action === 'extractContent') {
-    try {
-      const content = extractPageContent();
-      console.log('📄 Extracted content:', { 
-        contentLength: content.content.length,
-        textNodesCount: content.layout.textNodes.length,
-        formElementsCount: content.layout.formElements.length
-      });
-      sendResponse(content);
-    } catch (error) {
-      console.error('❌ Error extracting content:', error);
-      sendResponse({ error: error.message });
+// The popup may inject this file again into tabs opened before the extension
+// was installed; only the first copy registers the listener.
+if (!window.__aiQuizSolverLoaded) {
+  window.__aiQuizSolverLoaded = true;
+  console.log('🔧 AI Quiz Solver content script loaded on:', window.location.href);
+
+  // Listen for messages from popup
+  chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
+    console.log('📨 Content script received message:', request.action);
+
+    if (request.action === 'extractContent') {
+      try {
+        const content = extractPageContent();
+        console.log('📄 Extracted content:', {
+          contentLength: content.content.length,
+          anchorsCount: content.layout.anchors.length,
+          formElementsCount: content.layout.formElements.length
+        });
+        sendResponse(content);
+      } catch (error) {
+        console.error('❌ Error extracting content:', error);
+        sendResponse({ error: error.message });
+      }
     }
-  }
-  
-  if (request.action === 'highlightAnswer') {
-    try {
-      highlightCorrectOption(request.questionIndex, request.optionIndex);
-      console.log('✅ Answer highlighted successfully');
-      sendResponse({ success: true });
-    } catch (error) {
-      console.error('❌ Error highlighting answer:', error);
-      sendResponse({ error: error.message });
+
+    if (request.action === 'highlightAnswers' || request.action === 'highlightAnswer') {
+      const answers = request.answers || [{
+        questionIndex: request.questionIndex,
+        optionIndex: request.optionIndex,
+        questionAnchor: request.questionAnchor,
+        optionAnchors: request.optionAnchors
+      }];
+      highlightAnswers(answers)
+        .then((result) => {
+          console.log('✅ Answers highlighted:', result);
+          sendResponse({ success: true, ...result });
+        })
+        .catch((error) => {
+          console.error('❌ Error highlighting answers:', error);
+          sendResponse({ error: error.message });
+        });
+      return true; // respond asynchronously
     }
-  }
-});
+  });
+}
+
+// Elements whose text is grouped into one anchor with their inline children
+const INLINE_TAGS = new Set([
+  'A', 'ABBR', 'B', 'BDI', 'BDO', 'CITE', 'CODE', 'DFN', 'EM', 'FONT', 'I', 'KBD', 'MARK',
+  'Q', 'S', 'SAMP', 'SMALL', 'SPAN', 'STRONG', 'SUB', 'SUP', 'TIME', 'U', 'VAR'
+]);
+const SKIPPED_TAGS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'TEXTAREA']);
+const MAX_ANCHOR_TEXT = 500;
+
+// Anchor index of the last extraction: id -> { element, selector }
+let anchorIndex = new Map();
+// Elements highlighted by the last highlight pass
+let highlightedElements = [];
 
 function extractPageContent() {
   console.log('🔍 Starting content extraction...');
-  
+
   // Get all text content
   const content = document.body.innerText;
   console.log('📝 Text content length:', content.length);
-  
-  // Get structured HTML for layout analysis
+
+  const anchors = buildAnchorIndex();
   const layout = {
-    html: document.documentElement.outerHTML,
     title: document.title,
     url: window.location.href,
-    textNodes: getAllTextNodes(),
+    anchors,
     formElements: getFormElements()
   };
-  
+
   console.log('🏗️ Layout info:', {
     title: layout.title,
     url: layout.url,
-    textNodesCount: layout.textNodes.length,
+    anchorsCount: anchors.length,
     formElementsCount: layout.formElements.length
   });
-  
+
   return { content, layout };
 }
 
-function getAllTextNodes() {
-  const textNodes = [];
-  const walker = document.createTreeWalker(
-    document.body,
-    NodeFilter.SHOW_TEXT,
-    null,
-    false
-  );
-  
+// One pass over the page's text nodes: every block element holding text gets
+// an anchor id, a CSS selector (for when the page re-renders it) and its text.
+// The backend maps questions and options back to these ids.
+function buildAnchorIndex() {
+  const blocks = new Map();
+  const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
+    acceptNode: (node) => {
+      const parent = node.parentElement;
+      if (!parent || SKIPPED_TAGS.has(parent.tagName) || !node.nodeValue.trim()) {
+        return NodeFilter.FILTER_REJECT;
+      }
+      return NodeFilter.FILTER_ACCEPT;
+    }
+  });
+
   let node;
-  while (node = walker.nextNode()) {
-    if (node.textContent.trim()) {
-      textNodes.push({
-        text: node.textContent.trim(),
-        tagName: node.parentElement.tagName,
-        className: node.parentElement.className,
-        id: node.parentElement.id
-      });
+  while ((node = walker.nextNode())) {
+    const block = blockElementFor(node.parentElement);
+    let entry = blocks.get(block);
+    if (!entry) {
+      entry = { id: `a${blocks.size}`, parts: [], length: 0 };
+      blocks.set(block, entry);
+    }
+    if (entry.length < MAX_ANCHOR_TEXT) {
+      const text = node.nodeValue.replace(/\s+/g, ' ').trim();
+      entry.parts.push(text);
+      entry.length += text.length + 1;
+    }
+  }
+
+  anchorIndex = new Map();
+  const anchors = [];
+  blocks.forEach((entry, element) => {
+    anchorIndex.set(entry.id, { element, selector: cssPath(element) });
+    anchors.push({ id: entry.id, text: entry.parts.join(' ').slice(0, MAX_ANCHOR_TEXT) });
+  });
+  return anchors;
+}
+
+function blockElementFor(element) {
+  while (INLINE_TAGS.has(element.tagName) && element.parentElement && element.parentElement !== document.body) {
+    element = element.parentElement;
+  }
+  return element;
+}
+
+// Shortest path of tag:nth-of-type steps up to the nearest ancestor with an id
+function cssPath(element) {
+  const steps = [];
+  while (element && element !== document.body && element.nodeType === Node.ELEMENT_NODE) {
+    if (element.id) {
+      steps.unshift(`#${CSS.escape(element.id)}`);
+      return steps.join(' > ');
+    }
+    let nth = 1;
+    for (let sibling = element.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+      if (sibling.tagName === element.tagName) nth++;
+    }
+    steps.unshift(`${element.tagName.toLowerCase()}:nth-of-type(${nth})`);
+    element = element.parentElement;
+  }
+  steps.unshift('body');
+  return steps.join(' > ');
+}
+
+function resolveAnchor(id) {
+  const anchor = id && anchorIndex.get(id);
+  if (!anchor) return null;
+  if (!anchor.element.isConnected) {
+    anchor.element = document.querySelector(anchor.selector) || anchor.element;
+  }
+  return anchor.element.isConnected ? anchor.element : null;
+}
+
+// Without an option anchor, pick the option's input among the inputs near the question
+function optionInputNear(questionElement, optionIndex) {
+  let container = questionElement;
+  for (let depth = 0; container && depth < 4; depth++, container = container.parentElement) {
+    const inputs = container.querySelectorAll('input[type="radio"], input[type="checkbox"]');
+    if (inputs.length > optionIndex) {
+      const input = inputs[optionIndex];
+      return input.closest('label') || input.parentElement;
     }
   }
-  
-  return textNodes;
+  return null;
 }
 
 function getFormElements() {
   const formElements = [];
   const inputs = document.querySelectorAll('input[type="radio"], input[type="checkbox"], select, button');
-  
+
   inputs.forEach((element, index) => {
     formElements.push({
       type: element.type || element.tagName.toLowerCase(),
@@ -97,91 +185,78 @@ function getFormElements() {
       index: index
     });
   });
-  
+
   return formElements;
 }
 
-function highlightCorrectOption(questionIndex, optionIndex) {
-  console.log('🎯 Highlighting option:', { questionIndex, optionIndex });
-  
-  // Check if optionIndex is valid
-  if (optionIndex === -1) {
-    console.warn('⚠️ Cannot highlight answer: Invalid option index (-1)');
-    // Could show a user notification here
-    return;
-  }
-  
-  // Remove existing highlights
-  document.querySelectorAll('.ai-quiz-highlight').forEach(el => {
-    el.classList.remove('ai-quiz-highlight');
-  });
-  
-  // Add styles if not already present
-  if (!document.getElementById('ai-quiz-styles')) {
-    const style = document.createElement('style');
-    style.id = 'ai-quiz-styles';
-    style.innerHTML = `
-      .ai-quiz-highlight {
-        background-color: #90EE90 !important;
-        border: 2px solid #32CD32 !important;
-        box-shadow: 0 0 10px rgba(50, 205, 50, 0.5) !important;
-        border-radius: 4px !important;
-        padding: 4px !important;
-        animation: pulse 2s infinite;
+function ensureHighlightStyles() {
+  if (document.getElementById('ai-quiz-styles')) return;
+  const style = document.createElement('style');
+  style.id = 'ai-quiz-styles';
+  style.textContent = `
+    .ai-quiz-highlight {
+      background-color: #90EE90 !important;
+      border: 2px solid #32CD32 !important;
+      box-shadow: 0 0 10px rgba(50, 205, 50, 0.5) !important;
+      border-radius: 4px !important;
+      padding: 4px !important;
+      animation: pulse 2s infinite;
+    }
+
+    @keyframes pulse {
+      0% {
+        box-shadow: 0 0 10px rgba(50, 205, 50, 0.5);
       }
-      
-      @keyframes pulse {
-        0% {
-          box-shadow: 0 0 10px rgba(50, 205, 50, 0.5);
-        }
-        50% {
-          box-shadow: 0 0 20px rgba(50, 205, 50, 0.8);
-        }
-        100% {
-          box-shadow: 0 0 10px rgba(50, 205, 50, 0.5);
-        }
+      50% {
+        box-shadow: 0 0 20px rgba(50, 205, 50, 0.8);
       }
-    `;
-    document.head.appendChild(style);
-  }
-  
-  // Try to find and highlight the correct option
-  // This is a heuristic approach - in practice, you'd need more sophisticated detection
-  const optionLetters = ['A', 'B', 'C', 'D', 'E'];
-  const targetLetter = optionLetters[optionIndex];
-  
-  // Look for radio buttons, checkboxes, or text patterns
-  const radioButtons = document.querySelectorAll('input[type="radio"]');
-  const checkboxes = document.querySelectorAll('input[type="checkbox"]');
-  const allElements = document.querySelectorAll('*');
-  
-  // Try radio buttons first
-  if (radioButtons.length > 0) {
-    const questionRadios = Array.from(radioButtons).filter((radio, index) => {
-      return Math.floor(index / 4) === questionIndex; // Assuming 4 options per question
-    });
-    
-    if (questionRadios[optionIndex]) {
-      questionRadios[optionIndex].parentElement.classList.add('ai-quiz-highlight');
-      questionRadios[optionIndex].scrollIntoView({ behavior: 'smooth', block: 'center' });
+      100% {
+        box-shadow: 0 0 10px rgba(50, 205, 50, 0.5);
+      }
+    }
+  `;
+  document.head.appendChild(style);
+}
+
+// Highlight any number of answers at once: every target is resolved from the
+// anchor index first, then all class changes land in a single animation frame.
+// answers: [{ questionIndex, optionIndex, questionAnchor, optionAnchors }]
+function highlightAnswers(answers) {
+  const targets = [];
+  const missing = [];
+  answers.forEach((answer) => {
+    if (answer.optionIndex == null || answer.optionIndex < 0) {
+      missing.push(answer.questionIndex);
       return;
     }
+    let target = resolveAnchor(answer.optionAnchors?.[answer.optionIndex]);
+    if (!target) {
+      const questionElement = resolveAnchor(answer.questionAnchor);
+      target = questionElement && optionInputNear(questionElement, answer.optionIndex);
+    }
+    if (target) {
+      targets.push(target);
+    } else {
+      missing.push(answer.questionIndex);
+    }
+  });
+
+  if (missing.length > 0) {
+    console.warn('⚠️ No page anchor for questions:', missing);
   }
-  
-  // Fall back to text pattern matching
-  allElements.forEach(el => {
-    const text = el.textContent?.trim();
-    if (text && (
-      text.startsWith(`${targetLetter}.`) ||
-      text.startsWith(`${targetLetter})`) ||
-      text.startsWith(`(${targetLetter})`) ||
-      text.match(new RegExp(`^${targetLetter}\\s*[\\.):]`))
-    )) {
-      // Check if this is likely an option (not too long, reasonable parent structure)
-      if (text.length < 200 && text.length > 2) {
-        el.classList.add('ai-quiz-highlight');
-        el.scrollIntoView({ behavior: 'smooth', block: 'center' });
+
+  // Hidden tabs get no animation frames
+  const schedule = document.hidden ? (callback) => callback() : (callback) => requestAnimationFrame(callback);
+  return new Promise((resolve) => {
+    schedule(() => {
+      ensureHighlightStyles();
+      highlightedElements.forEach((element) => element.classList.remove('ai-quiz-highlight'));
+      targets.forEach((element) => element.classList.add('ai-quiz-highlight'));
+      highlightedElements = targets;
+      if (targets.length > 0) {
+        targets[0].scrollIntoView({ behavior: 'smooth', block: 'center' });
       }
-    }
+      resolve({ highlighted: targets.length, missing });
+    });
   });
-}
\ No newline at end of file
+}
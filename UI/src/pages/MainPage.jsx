@@ -2,9 +2,10 @@ import React, { useState } from 'react';
 
 const MainPage = ({ onDetectMCQs, loading }) => {
   const [useMultiModel, setUseMultiModel] = useState(true);
+  const [fastMode, setFastMode] = useState(false);
 
   const handleDetect = () => {
-    onDetectMCQs(useMultiModel);
+    onDetectMCQs(useMultiModel, fastMode);
   };
 
   return (
@@ -31,6 +32,22 @@ const MainPage = ({ onDetectMCQs, loading }) => {
           </label>
         </div>
 
+        <div className="model-toggle">
+          <label className="toggle-label">
+            <span>Full Reasoning</span>
+            <div className="toggle-switch">
+              <input
+                type="checkbox"
+                checked={fastMode}
+                onChange={(e) => setFastMode(e.target.checked)}
+                disabled={loading}
+              />
+              <span className="slider"></span>
+            </div>
+            <span>Answers Only</span>
+          </label>
+        </div>
+
         <div className="model-info">
           {useMultiModel ? (
             <div className="info-card multi-model">
@@ -1,8 +1,73 @@
-import React from 'react';
+import React, { useRef, useState } from 'react';
+
+// Fast-mode results carry no reasoning; it is fetched when the user expands a question
+const needsExplanation = (question) => {
+  if (question.model_responses && question.model_responses.length > 0) {
+    return question.model_responses.every((response) => !response.reasoning);
+  }
+  return !question.reasoning;
+};
+
+// Explanations follow the question, not its position, so a refreshed or
+// reordered result list keeps each one on the right question
+const explanationKey = (question) => `${question.anchor ?? ''}|${question.question}`;
+
+const minutesAgo = (timestamp) => {
+  const minutes = Math.round((Date.now() - timestamp) / 60000);
+  return minutes < 1 ? 'just now' : `${minutes} min ago`;
+};
+
+const ResultsPage = ({ results, cacheStatus, onBack, onHighlightAnswers, onGoogleSearch, onExplain }) => {
+  const [explanations, setExplanations] = useState({});
+  // Keys already fetched or being fetched; read synchronously so quick repeat clicks never fetch twice
+  const requested = useRef(new Set());
 
-const ResultsPage = ({ results, onBack, onHighlightAnswer, onGoogleSearch }) => {
   if (!results) return null;
 
+  const toggleExplanation = async (question) => {
+    const key = explanationKey(question);
+    if (requested.current.has(key)) {
+      setExplanations((prev) => {
+        const current = prev[key];
+        if (!current || current.loading) return prev;
+        return { ...prev, [key]: { ...current, expanded: !current.expanded } };
+      });
+      return;
+    }
+
+    requested.current.add(key);
+    setExplanations((prev) => ({ ...prev, [key]: { loading: true, expanded: true, text: '' } }));
+    try {
+      const text = await onExplain(question);
+      setExplanations((prev) => ({ ...prev, [key]: { loading: false, expanded: true, text } }));
+    } catch (error) {
+      console.error('❌ Error fetching explanation:', error);
+      // Show the error, and fetch again on the next click
+      requested.current.delete(key);
+      setExplanations((prev) => ({ ...prev, [key]: { loading: false, expanded: true, failed: true, text: `Could not load reasoning: ${error.message}` } }));
+    }
+  };
+
+  const renderExplanation = (question) => {
+    const explanation = explanations[explanationKey(question)];
+    return (
+      <div className="single-reasoning">
+        <button
+          className="explain-button"
+          onClick={() => toggleExplanation(question)}
+          disabled={explanation?.loading}
+        >
+          {explanation?.loading ? 'Loading reasoning...' : explanation?.failed ? 'Retry Reasoning' : explanation?.expanded ? 'Hide Reasoning' : 'Show Reasoning'}
+        </button>
+        {explanation?.expanded && !explanation.loading && (
+          <div className="reasoning-text">
+            {explanation.text}
+          </div>
+        )}
+      </div>
+    );
+  };
+
   const { questions, consensus, processing_mode } = results;
 
   return (
@@ -17,6 +82,25 @@ const ResultsPage = ({ results, onBack, onHighlightAnswer, onGoogleSearch }) =>
         </div>
       </div>
 
+      {cacheStatus?.cached && (
+        <div className="cache-status">
+          Saved results from {minutesAgo(cacheStatus.storedAt)}
+          {cacheStatus.refreshing && ' · refreshing…'}
+        </div>
+      )}
+
+      {questions.some((question) => question.correct_option >= 0) && (
+        <div className="results-actions">
+          <button
+            className="highlight-button highlight-all-button"
+            onClick={() => onHighlightAnswers()}
+            title="Highlight every answer on the page"
+          >
+            Highlight All Answers
+          </button>
+        </div>
+      )}
+
       <div className="content">
         {questions.map((question, qIndex) => (
           <div key={qIndex} className="question-card">
@@ -56,7 +140,7 @@ const ResultsPage = ({ results, onBack, onHighlightAnswer, onGoogleSearch }) =>
             <div className="actions">
               <button 
                 className="highlight-button"
-                onClick={() => onHighlightAnswer(qIndex, question.correct_option)}
+                onClick={() => onHighlightAnswers([qIndex])}
                 disabled={question.correct_option === -1}
                 title={question.correct_option === -1 ? "Cannot highlight - no valid answer available" : "Highlight the correct answer"}
               >
@@ -70,6 +154,8 @@ const ResultsPage = ({ results, onBack, onHighlightAnswer, onGoogleSearch }) =>
               </button>
             </div>
 
+            {needsExplanation(question) && renderExplanation(question)}
+
             {processing_mode === 'multi' ? (
               <div className="model-reasoning">
                 <h4>Model Responses</h4>
@@ -82,18 +168,22 @@ const ResultsPage = ({ results, onBack, onHighlightAnswer, onGoogleSearch }) =>
                     <div className="model-confidence">
                       Confidence: {response.confidence}%
                     </div>
-                    <div className="model-reasoning-text">
-                      {response.reasoning}
-                    </div>
+                    {response.reasoning && (
+                      <div className="model-reasoning-text">
+                        {response.reasoning}
+                      </div>
+                    )}
                   </div>
                 ))}
               </div>
             ) : (
               <div className="single-reasoning">
                 <h4>AI Reasoning</h4>
-                <div className="reasoning-text">
-                  {question.reasoning}
-                </div>
+                {question.reasoning && (
+                  <div className="reasoning-text">
+                    {question.reasoning}
+                  </div>
+                )}
                 <div className="confidence">
                   Confidence: {question.confidence}%
                 </div>
@@ -0,0 +1,134 @@
+// Backend requests made by the service worker.
+//
+// - Identical requests (same key) share one fetch, whichever tabs sent them
+// - A new request from a tab supersedes that tab's previous one; a fetch
+//   nobody waits for any more is aborted, which closes the connection so the
+//   backend stops working on it
+// - Every fetch has one deadline covering all of its attempts
+// - Network errors and gateway errors are retried with exponential backoff
+//   and full jitter. Detection is idempotent: a retried page joins the
+//   backend's in-flight solve or its result cache instead of solving again
+
+export const REQUEST_LIMITS = {
+  timeoutMs: 180 * 1000,
+  retries: 2,
+  baseDelayMs: 500,
+  maxDelayMs: 4000
+};
+
+const RETRY_STATUSES = new Set([502, 503, 504]);
+
+// reason: 'superseded', 'timeout', 'http' or 'network'
+export class RequestError extends Error {
+  constructor(message, reason) {
+    super(message);
+    this.name = 'RequestError';
+    this.reason = reason;
+  }
+}
+
+const sleep = (ms, signal) => new Promise((resolve, reject) => {
+  const onAbort = () => {
+    clearTimeout(timer);
+    reject(signal.reason);
+  };
+  const timer = setTimeout(() => {
+    signal.removeEventListener('abort', onAbort);
+    resolve();
+  }, ms);
+  signal.addEventListener('abort', onAbort, { once: true });
+});
+
+export class RequestManager {
+  constructor(limits = REQUEST_LIMITS) {
+    this.limits = limits;
+    // key -> { controller, waiters: Set<{ owner, resolve, reject }> }
+    this.inFlight = new Map();
+    // owner -> key of the request it waits for
+    this.owners = new Map();
+  }
+
+  // JSON body of `fetch(url, init)`, shared by every owner asking for `key`
+  request(key, owner, url, init) {
+    this.supersede(owner, key);
+    let entry = this.inFlight.get(key);
+    if (entry) {
+      console.log('🔗 Joining in-flight request:', key.slice(0, 12));
+    } else {
+      entry = this.start(key, url, init);
+    }
+    this.owners.set(owner, key);
+    return new Promise((resolve, reject) => {
+      entry.waiters.add({ owner, resolve, reject });
+    });
+  }
+
+  // Stop waiting for the owner's previous request, aborting it if nobody else is
+  supersede(owner, key) {
+    const previous = this.owners.get(owner);
+    const entry = previous !== key && this.inFlight.get(previous);
+    if (!entry) return;
+
+    entry.waiters.forEach((waiter) => {
+      if (waiter.owner === owner) {
+        entry.waiters.delete(waiter);
+        waiter.reject(new RequestError('Superseded by a newer request', 'superseded'));
+      }
+    });
+    if (entry.waiters.size === 0) {
+      console.log('✋ Aborting superseded request:', previous.slice(0, 12));
+      entry.controller.abort(new RequestError('Superseded by a newer request', 'superseded'));
+    }
+  }
+
+  start(key, url, init) {
+    const controller = new AbortController();
+    const entry = { controller, waiters: new Set() };
+    const seconds = Math.round(this.limits.timeoutMs / 1000);
+    const timer = setTimeout(
+      () => controller.abort(new RequestError(`No response from the backend within ${seconds}s`, 'timeout')),
+      this.limits.timeoutMs
+    );
+    this.inFlight.set(key, entry);
+
+    this.fetchWithRetry(url, init, controller.signal)
+      .then(
+        (data) => entry.waiters.forEach((waiter) => waiter.resolve(data)),
+        (error) => entry.waiters.forEach((waiter) => waiter.reject(error))
+      )
+      .finally(() => {
+        clearTimeout(timer);
+        this.inFlight.delete(key);
+        entry.waiters.forEach((waiter) => {
+          if (this.owners.get(waiter.owner) === key) {
+            this.owners.delete(waiter.owner);
+          }
+        });
+      });
+    return entry;
+  }
+
+  async fetchWithRetry(url, init, signal) {
+    for (let attempt = 0; ; attempt++) {
+      let error;
+      let retryable;
+      try {
+        const response = await fetch(url, { ...init, signal });
+        if (response.ok) {
+          return await response.json();
+        }
+        error = new RequestError(`HTTP ${response.status}: ${response.statusText}`, 'http');
+        retryable = RETRY_STATUSES.has(response.status);
+      } catch (fetchError) {
+        if (signal.aborted) throw signal.reason;
+        error = new RequestError(fetchError.message, 'network');
+        retryable = true;
+      }
+
+      if (!retryable || attempt >= this.limits.retries) throw error;
+      const delay = Math.random() * Math.min(this.limits.maxDelayMs, this.limits.baseDelayMs * 2 ** attempt);
+      console.warn(`⚠️ ${error.message}, retrying in ${Math.round(delay)}ms`);
+      await sleep(delay, signal);
+    }
+  }
+}
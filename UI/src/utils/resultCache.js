@@ -0,0 +1,90 @@
+// Detection results per page, kept in chrome.storage.session so reopening the
+// popup or overlay, or reloading the tab, shows the last answers at once.
+// Session storage is cleared when the browser closes and is only reachable
+// from the popup and the service worker.
+//
+// Layout: one entry per page fingerprint under ENTRY_PREFIX, plus an index of
+// { storedAt, size, url } per fingerprint used for expiry and eviction.
+
+const INDEX_KEY = 'resultCache:index';
+const ENTRY_PREFIX = 'resultCache:entry:';
+
+export const CACHE_LIMITS = {
+  maxEntries: 30,
+  // chrome.storage.session allows 10 MB in total
+  maxBytes: 4 * 1024 * 1024,
+  // Older entries are still shown, but revalidated against the backend
+  staleAfterMs: 2 * 60 * 1000,
+  // Older entries are dropped
+  expireAfterMs: 60 * 60 * 1000
+};
+
+// Index updates are read-modify-write; run them one at a time
+let indexQueue = Promise.resolve();
+const withIndex = (update) => {
+  const run = indexQueue.then(async () => {
+    const { [INDEX_KEY]: index } = await chrome.storage.session.get(INDEX_KEY);
+    return update(index || {});
+  });
+  indexQueue = run.catch(() => {});
+  return run;
+};
+
+// The same URL (ignoring the fragment) with the same text gives the same fingerprint
+export const pageFingerprint = async (url, content) => {
+  const pageUrl = (url || '').split('#')[0];
+  const bytes = new TextEncoder().encode(`${pageUrl}\n${content || ''}`);
+  const digest = await crypto.subtle.digest('SHA-256', bytes);
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+};
+
+export const sameOptions = (a, b) =>
+  !!a && !!b && a.useMultiModel === b.useMultiModel && a.fastMode === b.fastMode;
+
+// { url, options, data, storedAt, age, stale } or null when missing or expired
+export const getCachedResult = (fingerprint) => withIndex(async (index) => {
+  const meta = index[fingerprint];
+  if (!meta) return null;
+
+  const key = ENTRY_PREFIX + fingerprint;
+  const age = Date.now() - meta.storedAt;
+  const { [key]: entry } = age <= CACHE_LIMITS.expireAfterMs ? await chrome.storage.session.get(key) : {};
+  if (!entry) {
+    delete index[fingerprint];
+    await chrome.storage.session.set({ [INDEX_KEY]: index });
+    await chrome.storage.session.remove(key);
+    return null;
+  }
+  return { ...entry, age, stale: age > CACHE_LIMITS.staleAfterMs };
+});
+
+// entry: { url, options, data }. Expired entries go first, then the oldest
+// ones until the cache is back within its entry and size limits.
+export const storeResult = (fingerprint, entry) => withIndex(async (index) => {
+  const value = { ...entry, storedAt: Date.now() };
+  const size = JSON.stringify(value).length;
+  if (size > CACHE_LIMITS.maxBytes) {
+    console.warn('⚠️ Result too large to cache:', size);
+    return;
+  }
+  index[fingerprint] = { storedAt: value.storedAt, size, url: entry.url };
+
+  const byAge = Object.entries(index).sort(([, a], [, b]) => a.storedAt - b.storedAt);
+  let count = byAge.length;
+  let total = byAge.reduce((sum, [, meta]) => sum + meta.size, 0);
+  const evicted = [];
+  for (const [key, meta] of byAge) {
+    if (key === fingerprint) continue;
+    const expired = value.storedAt - meta.storedAt > CACHE_LIMITS.expireAfterMs;
+    if (!expired && count <= CACHE_LIMITS.maxEntries && total <= CACHE_LIMITS.maxBytes) break;
+    evicted.push(ENTRY_PREFIX + key);
+    delete index[key];
+    count -= 1;
+    total -= meta.size;
+  }
+
+  await chrome.storage.session.set({ [ENTRY_PREFIX + fingerprint]: value, [INDEX_KEY]: index });
+  if (evicted.length > 0) {
+    await chrome.storage.session.remove(evicted);
+  }
+});